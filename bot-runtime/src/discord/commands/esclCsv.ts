@@ -5,7 +5,7 @@ import {
 } from "discord.js";
 
 import type { CommandExecuteContext, SlashCommandModule } from "./types";
-import { runEsclCsv } from "../../utils/esclCli";
+import { runEsclCsv, type EsclRawFormat } from "../../utils/esclCli";
 import { logger } from "../../utils/logger";
 
 const data = new SlashCommandBuilder();
@@ -24,6 +24,17 @@ data.addStringOption((option) =>
     .setDescription("任意のグループ名（例: G5, G8）")
     .setRequired(false)
 );
+data.addStringOption((option) =>
+  option
+    .setName("format")
+    .setDescription("出力形式（既定: CSV）")
+    .addChoices(
+      { name: "CSV", value: "csv" },
+      { name: "Parquet", value: "parquet" },
+      { name: "Arrow IPC", value: "arrow" }
+    )
+    .setRequired(false)
+);
 
 const execute = async (
   interaction: ChatInputCommandInteraction,
@@ -31,17 +42,18 @@ const execute = async (
 ) => {
   const parentUrl = interaction.options.getString("parent_url", true);
   const group = interaction.options.getString("group");
+  const format = (interaction.options.getString("format") ?? "csv") as EsclRawFormat;
 
   await interaction.deferReply();
 
   try {
-    const result = await runEsclCsv(parentUrl, group);
+    const result = await runEsclCsv(parentUrl, group, format);
     const file = new AttachmentBuilder(result.buffer, {
       name: result.filename,
     });
 
     await interaction.editReply({
-      content: "API直叩きでCSVを生成しました。（生データALL_GAMES相当）",
+      content: `API直叩きで${format.toUpperCase()}を生成しました。（生データALL_GAMES相当）`,
       files: [file],
     });
   } catch (error) {
@@ -0,0 +1,98 @@
+import {
+  AttachmentBuilder,
+  SlashCommandBuilder,
+  type ChatInputCommandInteraction,
+} from "discord.js";
+
+import type { CommandExecuteContext, SlashCommandModule } from "./types";
+import { runEsclScrim, type EsclScrimFormat } from "../../utils/esclCli";
+import { logger } from "../../utils/logger";
+
+const MAX_CONTENT_LENGTH = 1900;
+
+const data = new SlashCommandBuilder();
+data
+  .setName("escl_scrim_xlsx")
+  .setDescription(
+    "同じスクラムの複数グループをまとめてExcel化します（グループ別シート / ALL_GAMES / TEAM_TOTALS）"
+  );
+data.addStringOption((option) =>
+  option
+    .setName("group_urls")
+    .setDescription(
+      "ESCLグループページのURL（/scrims/<scrim>/<group>）を空白・改行・カンマ区切りで複数指定"
+    )
+    .setRequired(true)
+);
+data.addIntegerOption((option) =>
+  option
+    .setName("concurrency")
+    .setDescription("同時に取得するグループ数の上限（既定: 4）")
+    .setMinValue(1)
+    .setMaxValue(10)
+    .setRequired(false)
+);
+data.addStringOption((option) =>
+  option
+    .setName("format")
+    .setDescription("出力形式（既定: Excel）")
+    .addChoices(
+      { name: "Excel", value: "xlsx" },
+      { name: "Parquet（全グループの生データ）", value: "parquet" },
+      { name: "Arrow IPC（全グループの生データ）", value: "arrow" }
+    )
+    .setRequired(false)
+);
+
+const splitUrls = (raw: string): string[] =>
+  raw
+    .split(/[\s,]+/)
+    .map((part) => part.trim())
+    .filter((part) => part.length > 0);
+
+const execute = async (
+  interaction: ChatInputCommandInteraction,
+  _context: CommandExecuteContext
+) => {
+  const groupUrls = splitUrls(interaction.options.getString("group_urls", true));
+  const concurrency = interaction.options.getInteger("concurrency");
+  const format = (interaction.options.getString("format") ?? "xlsx") as EsclScrimFormat;
+
+  await interaction.deferReply();
+
+  try {
+    const result = await runEsclScrim(groupUrls, concurrency, format);
+    const file = new AttachmentBuilder(result.buffer, {
+      name: result.filename,
+    });
+
+    const summary =
+      format === "xlsx"
+        ? `Excelを生成しました。（${result.groups.join(", ")} / ALL_GAMES=全グループのプレイヤー合計 / TEAM_TOTALS=全グループのチーム合計）`
+        : `${format.toUpperCase()}を生成しました。（${result.groups.join(", ")} / 全グループの生データ・group 列で区別）`;
+    const lines = [
+      summary,
+      ...result.warnings.map((warning) => `⚠ ${warning}`),
+    ];
+
+    await interaction.editReply({
+      content: lines.join("\n").slice(0, MAX_CONTENT_LENGTH),
+      files: [file],
+    });
+  } catch (error) {
+    const message = error instanceof Error ? error.message : String(error);
+
+    logger.error("escl_scrim_xlsx コマンドでエラーが発生しました", {
+      message,
+    });
+
+    await interaction.editReply({
+      content: `取得に失敗しました: ${message}`,
+    });
+  }
+};
+
+export const esclScrimXlsxCommand: SlashCommandModule = {
+  data,
+  execute,
+};
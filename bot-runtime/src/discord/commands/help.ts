@@ -39,6 +39,7 @@ const helpCategoryConfigs = [
     lines: [
       "- `/escl_from_parent_csv` と `/escl_from_parent_xlsx` は ESCL グループページの URL から 6 試合分のデータを直接取得します。",
       "- 生成されたファイルは Slash Command の返信としてアップロードされ、ALL_GAMES や TEAM_TOTALS を含みます。",
+      "- `/escl_scrim_xlsx` は同じスクラムの複数グループ URL をまとめて取得し、グループ別シートと全グループ通算の集計を 1 冊の Excel にします。",
       "- `/escl account register|list|remove|set-default` で JWT と teamId を安全に管理し、ESCL 応募コマンドからアカウントを切り替えられます。",
       "- `/set-team` `/list-active` `/entry` `/entry-now` で ESCL 応募の登録や即時送信を行えます。予約は前日0:00(JST)が既定で最大3回リトライします。",
       "- `/version` で Python コレクタと Node ランタイムのバージョンを確認し、依存関係の更新判断に活用してください。",
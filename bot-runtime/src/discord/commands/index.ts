@@ -9,6 +9,7 @@ import { verifyCommand } from "./verify";
 import { versionCommand } from "./version";
 import { esclFromParentCsvCommand } from "./esclCsv";
 import { esclFromParentXlsxCommand } from "./esclXlsx";
+import { esclScrimXlsxCommand } from "./esclScrim";
 import { feedbackCommand } from "./feedback";
 import { taskCommand } from "./task";
 import { workCommand } from "./work";
@@ -26,6 +27,7 @@ export const commandModules: SlashCommandModule[] = [
   versionCommand,
   esclFromParentCsvCommand,
   esclFromParentXlsxCommand,
+  esclScrimXlsxCommand,
   setTeamCommand,
   esclAccountCommand,
   listActiveCommand,
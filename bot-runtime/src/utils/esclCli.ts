@@ -1,5 +1,10 @@
-import { spawn } from "child_process";
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process";
+import { promises as fs } from "fs";
+import os from "node:os";
 import path from "node:path";
+import readline from "node:readline";
+
+import { logger } from "./logger";
 
 const PYTHON_BIN =
   process.env.ESCL_PYTHON_BIN ??
@@ -9,8 +14,20 @@ const PYTHON_BIN =
 
 const PROJECT_ROOT = path.resolve(__dirname, "../../..");
 
+// ESCL_CLI_WORKER=0 で常駐ワーカーを使わず、コマンドごとに CLI を起動する
+const USE_WORKER = process.env.ESCL_CLI_WORKER !== "0";
+
 type CliPayload =
-  | { ok: true; filename: string; content: string }
+  | {
+      ok: true;
+      filename: string;
+      // --output-dir 指定時はファイルの場所だけが返り、未指定時は base64 の本体が返る
+      content?: string;
+      path?: string;
+      size?: number;
+      groups?: string[];
+      warnings?: string[];
+    }
   | { ok: true; version: string }
   | { ok: false; error: string };
 
@@ -24,7 +41,7 @@ const parsePayload = (raw: string): CliPayload => {
   }
 };
 
-const runCli = async (args: string[]) => {
+const spawnCli = async (args: string[]) => {
   return await new Promise<CliPayload>((resolve, reject) => {
     const child = spawn(PYTHON_BIN, ["-m", "src.esclbot.cli", ...args], {
       cwd: PROJECT_ROOT,
@@ -76,48 +93,201 @@ const runCli = async (args: string[]) => {
   });
 };
 
+type PendingRequest = {
+  resolve: (payload: CliPayload) => void;
+  reject: (error: Error) => void;
+};
+
+/**
+ * `python -m src.esclbot.cli serve` を 1 つ常駐させ、JSON Lines でコマンドを送る。
+ * インタプリタ起動と pandas などの import はプロセスあたり 1 回で済み、
+ * ESCL への接続プールとキャッシュもリクエスト間で使い回される。
+ * ワーカーが落ちた場合は処理中の要求をエラーにし、次の要求で起動し直す。
+ */
+class EsclWorker {
+  private child: ChildProcessWithoutNullStreams | null = null;
+  private readonly pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+
+  request(args: string[]): Promise<CliPayload> {
+    const child = this.ensureStarted();
+    const id = this.nextId++;
+
+    return new Promise<CliPayload>((resolve, reject) => {
+      this.pending.set(id, { resolve, reject });
+      child.stdin.write(`${JSON.stringify({ id, argv: args })}\n`, (error) => {
+        if (error) {
+          this.pending.delete(id);
+          reject(new Error(`ESCL ワーカーへの送信に失敗しました: ${error.message}`));
+        }
+      });
+    });
+  }
+
+  private ensureStarted(): ChildProcessWithoutNullStreams {
+    if (this.child) {
+      return this.child;
+    }
+
+    const child = spawn(PYTHON_BIN, ["-m", "src.esclbot.cli", "serve"], {
+      cwd: PROJECT_ROOT,
+      env: process.env,
+    });
+    this.child = child;
+
+    readline.createInterface({ input: child.stdout }).on("line", (line) => {
+      this.onLine(line);
+    });
+    readline.createInterface({ input: child.stderr }).on("line", (line) => {
+      logger.debug("[escl-worker] " + line);
+    });
+
+    child.on("error", (error) => {
+      this.fail(child, `ESCL ワーカーの起動に失敗しました (${error.message})`);
+    });
+    // 終了したワーカーへの書き込み（EPIPE）は exit 側で処理中の要求ごと失敗させる
+    child.stdin.on("error", (error) => {
+      logger.warn("ESCL ワーカーへの書き込みに失敗しました", { message: error.message });
+    });
+    child.on("exit", (code, signal) => {
+      this.fail(child, `ESCL ワーカーが終了しました (code=${code}, signal=${signal})`);
+    });
+
+    return child;
+  }
+
+  private onLine(line: string) {
+    let message: CliPayload & { id?: number | null };
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      logger.warn("ESCL ワーカーの応答を解析できませんでした", {
+        line,
+        message: (error as Error).message,
+      });
+      return;
+    }
+
+    const pending = message.id == null ? undefined : this.pending.get(message.id);
+    if (!pending || message.id == null) {
+      logger.warn("ESCL ワーカーから対応する要求のない応答を受け取りました", { line });
+      return;
+    }
+    this.pending.delete(message.id);
+    if (!message.ok) {
+      pending.reject(new Error(message.error));
+      return;
+    }
+    pending.resolve(message);
+  }
+
+  private fail(child: ChildProcessWithoutNullStreams, reason: string) {
+    if (this.child !== child) {
+      return;
+    }
+    this.child = null;
+    const pending = [...this.pending.values()];
+    this.pending.clear();
+    for (const request of pending) {
+      request.reject(new Error(reason));
+    }
+  }
+
+  stop() {
+    this.child?.kill();
+    this.child = null;
+  }
+}
+
+const worker = new EsclWorker();
+process.once("exit", () => worker.stop());
+
+const runCli = async (args: string[]) =>
+  USE_WORKER ? await worker.request(args) : await spawnCli(args);
+
 export type EsclFileResult = {
   filename: string;
   buffer: Buffer;
 };
 
+type FilePayload = Extract<CliPayload, { filename: string }>;
+
+// 生成物は一時ディレクトリ経由で受け取る（base64 JSON を組み立て・解析するコピーを避ける）
+const runFileCli = async (
+  args: string[]
+): Promise<{ payload: FilePayload; buffer: Buffer }> => {
+  const outputDir = await fs.mkdtemp(path.join(os.tmpdir(), "escl-cli-"));
+  try {
+    const payload = await runCli([...args, "--output-dir", outputDir]);
+    if (!("filename" in payload)) {
+      throw new Error("ESCL CLIから期待した応答が得られませんでした。");
+    }
+    if (payload.path) {
+      return { payload, buffer: await fs.readFile(payload.path) };
+    }
+    if (payload.content !== undefined) {
+      return { payload, buffer: Buffer.from(payload.content, "base64") };
+    }
+    throw new Error("ESCL CLIから期待した応答が得られませんでした。");
+  } finally {
+    await fs.rm(outputDir, { recursive: true, force: true });
+  }
+};
+
+// parquet / arrow は型付きの列のまま出力する（Python 側に pyarrow が必要）
+export type EsclRawFormat = "csv" | "parquet" | "arrow";
+export type EsclScrimFormat = "xlsx" | "parquet" | "arrow";
+
 export const runEsclCsv = async (
   parentUrl: string,
-  group?: string | null
+  group?: string | null,
+  format?: EsclRawFormat | null
 ): Promise<EsclFileResult> => {
-  const payload = await runCli([
+  const { payload, buffer } = await runFileCli([
     "csv",
     parentUrl,
     ...(group ? ["--group", group] : []),
+    ...(format ? ["--format", format] : []),
   ]);
 
-  if (!("filename" in payload) || !("content" in payload)) {
-    throw new Error("ESCL CLIから期待した応答が得られませんでした。");
-  }
-
-  return {
-    filename: payload.filename,
-    buffer: Buffer.from(payload.content, "base64"),
-  };
+  return { filename: payload.filename, buffer };
 };
 
 export const runEsclXlsx = async (
   parentUrl: string,
   group?: string | null
 ): Promise<EsclFileResult> => {
-  const payload = await runCli([
+  const { payload, buffer } = await runFileCli([
     "xlsx",
     parentUrl,
     ...(group ? ["--group", group] : []),
   ]);
 
-  if (!("filename" in payload) || !("content" in payload)) {
-    throw new Error("ESCL CLIから期待した応答が得られませんでした。");
-  }
+  return { filename: payload.filename, buffer };
+};
+
+export type EsclScrimResult = EsclFileResult & {
+  groups: string[];
+  warnings: string[];
+};
+
+export const runEsclScrim = async (
+  parentUrls: string[],
+  concurrency?: number | null,
+  format?: EsclScrimFormat | null
+): Promise<EsclScrimResult> => {
+  const { payload, buffer } = await runFileCli([
+    "scrim",
+    ...parentUrls,
+    ...(concurrency ? ["--concurrency", String(concurrency)] : []),
+    ...(format ? ["--format", format] : []),
+  ]);
 
   return {
     filename: payload.filename,
-    buffer: Buffer.from(payload.content, "base64"),
+    buffer,
+    groups: payload.groups ?? [],
+    warnings: payload.warnings ?? [],
   };
 };
 
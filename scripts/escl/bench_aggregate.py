@@ -0,0 +1,150 @@
+# bench_aggregate.py
+"""
+ALL_GAMES / TEAM_TOTALS 集計のベンチマーク。
+
+旧実装（aggregate_player_totals と aggregate_team_totals を別々に呼び、それぞれが型そろえと groupby を行い、
+使用キャラはプレイヤーごとの Python 関数で連結する）と、aggregate_totals で 1 回の grouped pass から
+両方のテーブルを作る現行実装を比較する。両者の出力が一致することも確認する。
+
+既定値は 1 シーズン分（40 スクリム × 5 グループ × 6 試合 × 20 チーム × 3 人 = 72,000 行）。
+
+使い方:
+  python scripts/escl/bench_aggregate.py
+  python scripts/escl/bench_aggregate.py --scrims 10 --groups 5 --repeat 3
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd  # noqa: E402
+
+from bench_extract import make_bucket  # noqa: E402
+from src.esclbot.api_scraper import extract_dataframe_from_bucket  # noqa: E402
+from src.esclbot.frame_builder import apply_raw_dtypes  # noqa: E402
+from src.esclbot.reports import (  # noqa: E402
+    COUNT_COLUMNS,
+    PLAYER_TOTAL_COLUMNS,
+    TEAM_TOTAL_COLUMNS,
+    _decategorize,
+    _ensure_numeric_columns,
+    _team_num_keys,
+    _to_int_or_none,
+    _to_plain_numeric,
+    aggregate_totals,
+)
+
+
+# ---------- 合成データ ----------
+def make_season(scrims: int, groups: int, games: int, teams: int, players: int) -> pd.DataFrame:
+    """グループごとに別のチーム・プレイヤーが出場し、スクリムをまたいで同じ顔ぶれが続くシーズンを作る。"""
+    frames = []
+    for s in range(scrims):
+        for g in range(1, groups + 1):
+            bucket = make_bucket(games, teams, players, nested=False, seed=s * groups + g)
+            df = extract_dataframe_from_bucket(bucket, f"scrim-{s:03d}", f"G{g}", max_games=games)
+            df = df.assign(
+                team_name=f"G{g}-" + df["team_name"].astype(str),
+                player_name=f"G{g}-" + df["player_name"].astype(str),
+            )
+            frames.append(df)
+    return apply_raw_dtypes(pd.concat(frames, ignore_index=True))
+
+
+# ---------- 旧実装（比較用にそのまま残す） ----------
+def _sort_legacy(grouped: pd.DataFrame, by: list, ordered_columns: list) -> pd.DataFrame:
+    grouped["_team_num_sort"] = grouped["team_num"].apply(lambda value: value if isinstance(value, int) else 10**9)
+    grouped = grouped.sort_values(by=["_team_num_sort", *by], na_position="last").drop(columns="_team_num_sort")
+    return grouped.reset_index(drop=True)[ordered_columns]
+
+
+def legacy_team_totals(df_all: pd.DataFrame) -> pd.DataFrame:
+    df = _ensure_numeric_columns(df_all, COUNT_COLUMNS)
+    df = df.assign(team_num=_team_num_keys(df))
+    grouped = df.groupby(["team_num", "team_name"], dropna=False, observed=True)[COUNT_COLUMNS].sum().reset_index()
+    for column in COUNT_COLUMNS:
+        grouped[column] = _to_plain_numeric(grouped[column])
+    grouped["team_num"] = grouped["team_num"].apply(_to_int_or_none)
+    grouped["team_name"] = _decategorize(grouped["team_name"])
+    grouped["accuracy"] = ((grouped["hits"] / grouped["shots"]).where(grouped["shots"] > 0, 0) * 100.0).round(2)
+    grouped["headshots_accuracy"] = (
+        (grouped["headshots"] / grouped["hits"]).where(grouped["hits"] > 0, 0) * 100.0
+    ).round(2)
+    return _sort_legacy(grouped, ["team_name"], TEAM_TOTAL_COLUMNS)
+
+
+def legacy_player_totals(df_all: pd.DataFrame) -> pd.DataFrame:
+    df = _ensure_numeric_columns(df_all, COUNT_COLUMNS).assign(_games_played=1)
+    keys = ["player_name", "team_name", "team_num"]
+    spec = {column: "sum" for column in ["_games_played", *COUNT_COLUMNS]}
+    spec["placement"] = "mean"
+    grouped = df.groupby(keys, dropna=False, observed=True).agg(spec).reset_index()
+    grouped = grouped.rename(columns={"_games_played": "games_played", "placement": "placement_avg"})
+    grouped["placement_avg"] = grouped["placement_avg"].astype("float64").round(2)
+
+    def unique_join(series: pd.Series) -> Optional[str]:
+        values = [str(value) for value in series if pd.notna(value) and str(value).strip()]
+        return ", ".join(dict.fromkeys(values)) if values else None
+
+    characters = _decategorize(df["character"]).astype(object)
+    chars = characters.groupby([df[key] for key in keys], dropna=False, observed=True).agg(unique_join)
+    grouped = grouped.merge(chars.rename("characters").reset_index(), on=keys, how="left")
+
+    grouped["games_played"] = grouped["games_played"].astype(int)
+    for column in COUNT_COLUMNS:
+        grouped[column] = _to_plain_numeric(grouped[column]).fillna(0).round(0).astype(int)
+    grouped["accuracy"] = ((grouped["hits"] / grouped["shots"]).where(grouped["shots"] > 0, 0) * 100.0).round(2)
+    grouped["headshots_accuracy"] = (
+        (grouped["headshots"] / grouped["hits"]).where(grouped["hits"] > 0, 0) * 100.0
+    ).round(2)
+    grouped["team_num"] = grouped["team_num"].apply(_to_int_or_none)
+    grouped["team_name"] = _decategorize(grouped["team_name"])
+    return _sort_legacy(grouped, ["team_name", "player_name"], PLAYER_TOTAL_COLUMNS)
+
+
+def legacy_totals(df: pd.DataFrame) -> Any:
+    return legacy_player_totals(df), legacy_team_totals(df)
+
+
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scrims", type=int, default=40)
+    ap.add_argument("--groups", type=int, default=5)
+    ap.add_argument("--games", type=int, default=6)
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    df = make_season(args.scrims, args.groups, args.games, args.teams, args.players)
+    print(f"rows={len(df):,} players={df['player_name'].nunique():,} teams={df['team_name'].nunique():,}")
+
+    legacy_players, legacy_teams = legacy_totals(df)
+    totals = aggregate_totals(df)
+    pd.testing.assert_frame_equal(legacy_players, totals.players)
+    pd.testing.assert_frame_equal(legacy_teams, totals.teams)
+
+    legacy_t = timeit(lambda: legacy_totals(df), args.repeat)
+    current_t = timeit(lambda: aggregate_totals(df), args.repeat)
+    print(f"legacy   {legacy_t * 1000:9.2f} ms  (aggregate_player_totals + aggregate_team_totals)")
+    print(f"current  {current_t * 1000:9.2f} ms  (aggregate_totals)")
+    print(f"speedup x{legacy_t / current_t:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_bucket_decode.py
+"""
+GetBucket 応答のデコードのベンチマーク。
+
+旧経路（response.json() で応答全体を dict にし、value 文字列をもう一度 json.loads してから抽出）と、
+decode_bucket_payload で value を 1 回の走査で取り出し、試合を 1 つずつデコードして抽出する現行経路を比較する。
+ピークメモリ（tracemalloc）と処理時間を出し、両者の DataFrame が一致することも確認する。
+
+使い方:
+  python scripts/escl/bench_bucket_decode.py --games 6 --teams 20 --players 3 --repeat 5
+  python scripts/escl/bench_bucket_decode.py --games 60 --max-games 6   # 試合数の多い bucket
+  python scripts/escl/bench_bucket_decode.py --archive-dir data/escl/archive   # 実際に取得した bucket で計測
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd  # noqa: E402
+
+from bench_extract import make_bucket  # noqa: E402
+from src.esclbot.api_scraper import BUCKET_ENDPOINT, decode_bucket_value, extract_dataframe_from_bucket  # noqa: E402
+from src.esclbot.bucket_archive import BucketArchive  # noqa: E402
+from src.esclbot.bucket_stream import decode_bucket_payload  # noqa: E402
+
+
+def legacy_decode(raw: bytes, max_games: int) -> pd.DataFrame:
+    bucket = decode_bucket_value(json.loads(raw))
+    return extract_dataframe_from_bucket(bucket, "scrim", "G1", max_games=max_games)
+
+
+def stream_decode(raw: bytes, max_games: int) -> pd.DataFrame:
+    payload = decode_bucket_payload(raw)
+    return extract_dataframe_from_bucket(payload, "scrim", "G1", max_games=max_games)
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--games", type=int, default=6)
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--max-games", type=int, default=6)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--archive-dir", type=Path, default=None, help="合成データの代わりにアーカイブ済みの GetBucket 応答を使う")
+    args = ap.parse_args()
+
+    if args.archive_dir is not None:
+        for raw in archived_bodies(args.archive_dir):
+            print(f"archived bucket: body={len(raw) / 1024:.1f} KiB")
+            run(raw, args)
+        return
+
+    bucket = make_bucket(args.games, args.teams, args.players, nested=False)
+    raw = json.dumps({"value": json.dumps(bucket, ensure_ascii=False)}, ensure_ascii=False).encode("utf-8")
+    del bucket
+    print(f"bucket: games={args.games} teams={args.teams} players={args.players} body={len(raw) / 1024:.1f} KiB")
+    run(raw, args)
+
+
+def archived_bodies(root: Path):
+    archive = BucketArchive(root)
+    seen = set()
+    for entry in archive.entries():
+        if entry.endpoint == BUCKET_ENDPOINT and entry.hash not in seen:
+            seen.add(entry.hash)
+            yield archive.read(entry.hash)
+
+
+def run(raw: bytes, args: argparse.Namespace) -> None:
+    pd.testing.assert_frame_equal(legacy_decode(raw, args.max_games), stream_decode(raw, args.max_games))
+
+    legacy_t, legacy_peak = measure(lambda: legacy_decode(raw, args.max_games), args.repeat)
+    stream_t, stream_peak = measure(lambda: stream_decode(raw, args.max_games), args.repeat)
+    print(f"legacy  {legacy_t * 1000:9.2f} ms  peak={legacy_peak / 1024:9.1f} KiB")
+    print(f"stream  {stream_t * 1000:9.2f} ms  peak={stream_peak / 1024:9.1f} KiB")
+    print(f"speedup x{legacy_t / stream_t:5.2f}  peak x{legacy_peak / stream_peak:5.2f} smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# bench_extract.py
+"""
+game→team→player 抽出のベンチマーク。
+
+合成した大きめの bucket に対して、旧実装（プレイヤーごとに pick_first を14回呼ぶ /
+候補リストごとに DataFrame を作る）と、shape ごとのキー解決プランを使う現行実装を比較する。
+両者の出力が（型付き列の dtype 差を除いて）一致することと、DataFrame のメモリ量も確認する。
+
+使い方:
+  python scripts/escl/bench_extract.py --games 6 --teams 20 --players 3 --repeat 5
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+import pandas as pd  # noqa: E402
+
+from src.esclbot import api_scraper as scraper  # noqa: E402
+from src.esclbot.api_scraper import (  # noqa: E402
+    CAND,
+    REQUIRED_HEADERS,
+    ensure_num,
+    first_key,
+    normalize_df,
+    pick_first,
+    pick_key,
+    walk,
+)
+
+LEGENDS = ["Alter", "Newcastle", "Wattson", "Bangalore", "Horizon", "Wraith", "Pathfinder", "Catalyst"]
+
+
+# ---------- 合成データ ----------
+def make_player(rng: random.Random, team_num: int, idx: int, placement: int) -> Dict[str, Any]:
+    shots = rng.randint(50, 400)
+    hits = rng.randint(0, shots)
+    return {
+        "team_num": team_num,
+        "player_name": f"player-{team_num}-{idx}",
+        "character": rng.choice(LEGENDS),
+        "kills": rng.randint(0, 10),
+        "assists": rng.randint(0, 8),
+        "damage": rng.randint(0, 3000),
+        "shots": shots,
+        "hits": hits,
+        "headshots": rng.randint(0, hits) if hits else 0,
+        "survival_time": rng.randint(60, 1500),
+        "revives_given": rng.randint(0, 3),
+        "respawns_given": rng.randint(0, 2),
+        "placement": placement,
+        "knockdowns": rng.randint(0, 10),
+    }
+
+
+def make_bucket(games: int, teams: int, players: int, *, nested: bool, seed: int = 0) -> Dict[str, Any]:
+    """nested=True のときは players を未知キーの下に隠し、walk() による探索を通す。"""
+    rng = random.Random(seed)
+    out_games = []
+    for g in range(1, games + 1):
+        order = list(range(1, teams + 1))
+        rng.shuffle(order)
+        team_objs = []
+        for placement, team_num in enumerate(order, start=1):
+            members = [make_player(rng, team_num, i, placement) for i in range(players)]
+            team: Dict[str, Any] = {
+                "team_name": f"team-{team_num:02d}",
+                "team_num": team_num,
+                "team_id": 1000 + team_num,
+                "placement": placement,
+                "kills": sum(p["kills"] for p in members),
+            }
+            if nested:
+                team["detail"] = {"lineup_stats": members}
+            else:
+                team["players"] = members
+            team_objs.append(team)
+        out_games.append({"game_id": 3000 + g, "game_num": g, "map": "World's Edge", "teams": team_objs})
+    return {"scrim_id": 1, "group_num": 1, "games": out_games}
+
+
+# ---------- 旧実装（比較用の参照実装） ----------
+def legacy_extract_rows(bucket: Dict[str, Any], group_label: str, scrim_uuid: str, max_games: int = 6) -> pd.DataFrame:
+    games = bucket[pick_key(bucket, ["games", "matches", "rounds"])]
+
+    def find_teams(game):
+        tkey = pick_key(game, ["teams", "squads", "teamResults", "team_results", "results"])
+        if tkey and isinstance(game.get(tkey), list) and all(isinstance(x, dict) for x in game[tkey]):
+            return game[tkey]
+        best, best_score = None, -1
+        for v in walk(game):
+            if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
+                score = sum(
+                    bool(first_key(i, CAND["team_name"])) + bool(first_key(i, CAND["placement"])) + bool(first_key(i, CAND["team_num"]))
+                    for i in v
+                )
+                if score > best_score and score > 0:
+                    best_score, best = score, v
+        return best
+
+    def find_players(team):
+        pkey = pick_key(team, ["players", "members", "playerStats", "player_stats", "roster", "lineup", "participants", "memberResults", "player_results"])
+        if pkey and isinstance(team.get(pkey), list) and all(isinstance(x, dict) for x in team[pkey]):
+            return team[pkey]
+        best, best_score = None, -1
+        feats = ["player_name", "character", "kills", "assists", "damage", "shots", "hits", "headshots"]
+        for v in walk(team):
+            if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
+                score = sum(1 for i in v for f in feats if first_key(i, CAND.get(f, [])))
+                if score > best_score and score > 0:
+                    best_score, best = score, v
+        return best
+
+    rows: List[Dict[str, Any]] = []
+    game_count = 0
+    for gi, game in enumerate(games, start=1):
+        if game_count >= max_games:
+            break
+        teams = find_teams(game)
+        if not isinstance(teams, list):
+            continue
+        game_no_key = pick_key(game, CAND["game_no"])
+        try:
+            game_no_val = int(game.get(game_no_key)) if game_no_key else gi
+        except Exception:
+            game_no_val = gi
+        for t in teams:
+            _, team_name = pick_first(t, CAND["team_name"])
+            _, team_num = pick_first(t, CAND["team_num"])
+            _, placement = pick_first(t, CAND["placement"])
+            players = find_players(t)
+            if not isinstance(players, list):
+                continue
+            for p in players:
+                _, player_name = pick_first(p, CAND["player_name"])
+                _, character = pick_first(p, CAND["character"])
+                _, kills = pick_first(p, CAND["kills"])
+                _, assists = pick_first(p, CAND["assists"])
+                _, damage = pick_first(p, CAND["damage"])
+                _, shots = pick_first(p, CAND["shots"])
+                _, hits = pick_first(p, CAND["hits"])
+                _, hs = pick_first(p, CAND["headshots"])
+                _, acc = pick_first(p, CAND["accuracy"])
+                _, hs_acc = pick_first(p, CAND["headshots_accuracy"])
+                _, surv = pick_first(p, CAND["survival_time"])
+                if surv is None:
+                    surv = p.get("timeAlive") or p.get("time_survived") or p.get("timeAliveMs")
+                shots_n, hits_n, acc_n, hs_n = ensure_num(shots), ensure_num(hits), ensure_num(acc), ensure_num(hs)
+                if acc_n is None and shots_n is not None and hits_n is not None:
+                    acc_n = (hits_n / shots_n * 100.0) if shots_n > 0 else 0.0
+                hs_acc_n = ensure_num(hs_acc)
+                # headshots_accuracy の補完は型付き列の実装で足したもの（比較のため同じ規則で埋める）
+                if hs_acc_n is None and hs_n is not None and hits_n is not None:
+                    hs_acc_n = (hs_n / hits_n * 100.0) if hits_n > 0 else 0.0
+                rows.append({
+                    "group": group_label, "scrim_id": scrim_uuid, "game": game_no_val,
+                    "team_name": team_name, "team_num": team_num, "player_name": player_name,
+                    "character": character, "placement": placement, "kills": kills,
+                    "assists": assists, "damage": damage,
+                    "shots": shots_n if shots_n is not None else shots,
+                    "hits": hits_n if hits_n is not None else hits,
+                    "accuracy": acc_n if acc_n is not None else acc,
+                    "headshots": hs_n if hs_n is not None else hs,
+                    "headshots_accuracy": hs_acc_n if hs_acc_n is not None else hs_acc,
+                    "survival_time": surv,
+                })
+        game_count += 1
+
+    df = pd.DataFrame(rows)
+    for col in REQUIRED_HEADERS:
+        if col not in df.columns:
+            df[col] = None
+    df = df[["group", "scrim_id", "game"] + REQUIRED_HEADERS]
+    return df.sort_values(["game", "placement", "team_name", "player_name"], na_position="last").reset_index(drop=True)
+
+
+def legacy_table_like(inner: Any) -> Optional[pd.DataFrame]:
+    def to_row(d):
+        row = {}
+        for col, cands in CAND.items():
+            if col == "game_no":
+                continue
+            k = first_key(d, cands)
+            if k is not None:
+                row[col] = d.get(k)
+        scraper.compute_accuracy(row)
+        return row
+
+    best_df, best_score = None, -1
+    for v in walk(inner):
+        if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
+            rows, score_sum = [], 0
+            for item in v:
+                row = to_row(item)
+                filled = sum(1 for k in ["player_name", "team_name", "damage", "kills", "assists", "placement"] if row.get(k) not in (None, ""))
+                if filled >= 2:
+                    rows.append(row)
+                    score_sum += filled
+            if rows:
+                df = pd.DataFrame(rows)
+                score = len(df) + score_sum
+                if score > best_score:
+                    best_score, best_df = score, df
+    if best_df is not None and not best_df.empty:
+        return normalize_df(best_df)
+    return None
+
+
+# ---------- 計測 ----------
+def timeit(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def assert_same_values(legacy: pd.DataFrame, typed: pd.DataFrame) -> None:
+    """旧実装（object / float64）と型付き列（Int32 / float64 / category）の値を比較する。"""
+    assert list(legacy.columns) == list(typed.columns)
+    for column in legacy.columns:
+        old, new = legacy[column], typed[column]
+        if new.dtype.kind == "f":
+            pd.testing.assert_series_equal(
+                pd.to_numeric(old, errors="coerce").astype("float64"), new.astype("float64"),
+                check_names=False, rtol=1e-5,
+            )
+        elif isinstance(new.dtype, pd.CategoricalDtype):
+            # team_num などのラベル列は API の値を文字列にして持つ
+            assert [None if pd.isna(v) else str(v) for v in old] == \
+                new.astype(object).where(new.notna(), None).tolist(), column
+        else:
+            assert old.astype(object).where(old.notna(), None).tolist() == \
+                new.astype(object).where(new.notna(), None).tolist(), column
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def report(label: str, legacy: float, current: float) -> None:
+    print(f"{label:<28} legacy={legacy * 1000:9.2f} ms  plan={current * 1000:9.2f} ms  speedup x{legacy / current:5.2f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--games", type=int, default=6)
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--buckets", type=int, default=10, help="1 回の計測で処理する bucket 数")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"bucket: games={args.games} teams={args.teams} players={args.players} x {args.buckets} buckets")
+    for nested in (False, True):
+        buckets = [make_bucket(args.games, args.teams, args.players, nested=nested, seed=i) for i in range(args.buckets)]
+        legacy_df = legacy_extract_rows(buckets[0], "G1", "scrim", args.games)
+        typed_df = scraper.extract_rows_games_teams_players(buckets[0], "G1", "scrim", args.games)
+        assert_same_values(legacy_df, typed_df)
+        print(f"  frame memory: legacy={frame_bytes(legacy_df) / 1024:.1f} KiB  typed={frame_bytes(typed_df) / 1024:.1f} KiB")
+        legacy = timeit(lambda: [legacy_extract_rows(b, "G1", "scrim", args.games) for b in buckets], args.repeat)
+        current = timeit(lambda: [scraper.extract_rows_games_teams_players(b, "G1", "scrim", args.games) for b in buckets], args.repeat)
+        report("games_teams_players" + (" (nested)" if nested else ""), legacy, current)
+
+    games = [make_bucket(1, args.teams, args.players, nested=False, seed=i)["games"][0] for i in range(args.buckets * args.games)]
+    pd.testing.assert_frame_equal(legacy_table_like(games[0]), scraper.extract_table_like_from_inner(games[0]))
+    legacy = timeit(lambda: [legacy_table_like(g) for g in games], args.repeat)
+    current = timeit(lambda: [scraper.extract_table_like_from_inner(g) for g in games], args.repeat)
+    report("table_like_from_inner", legacy, current)
+
+
+if __name__ == "__main__":
+    main()
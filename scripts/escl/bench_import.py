@@ -0,0 +1,95 @@
+# bench_import.py
+"""
+esclbot の各エントリーポイントの import 時間（コールドスタート）を `python -X importtime` で測る。
+
+エントリーポイントごとに新しいインタプリタで --repeat 回 import し、そのモジュール自身の累積時間
+（importtime の cumulative）の最小値を予算と比べる。ついでに読み込まれてしまった重いモジュール
+（pandas / httpx / discord など）も表示する。どれか 1 つでも予算を超えたら終了コード 1 を返す。
+
+  - cli: src.esclbot.cli（TS ランタイムから毎回起動される。`version` は pandas も httpx も要らない）
+  - bot: src.esclbot.bot（discord.py は必要。pandas などはコマンド実行時 / setup_hook の先読みで読む）
+  - scheduler: src.esclbot.entry_scheduler（httpx はクライアント生成時に読む）
+
+使い方:
+  python scripts/escl/bench_import.py --repeat 5
+  python scripts/escl/bench_import.py --budget cli=100 --budget bot=500
+"""
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# エントリーポイント名 -> (モジュール, 予算 ms)
+ENTRY_POINTS: Dict[str, Tuple[str, float]] = {
+    "cli": ("src.esclbot.cli", 150.0),
+    "bot": ("src.esclbot.bot", 600.0),
+    "scheduler": ("src.esclbot.entry_scheduler", 150.0),
+}
+HEAVY_MODULES = ("pandas", "numpy", "httpx", "discord", "dotenv", "requests", "xlsxwriter", "pyarrow")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """module を新しいインタプリタで import し、(累積 ms, 読み込まれた重いモジュール) を返す。"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = None
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        if name == module:
+            cumulative_us = int(match.group(2))
+        top = name.split(".")[0]
+        if top in HEAVY_MODULES:
+            loaded.add(top)
+    if cumulative_us is None:
+        raise RuntimeError(f"{module} の importtime 行が見つかりません")
+    return cumulative_us / 1000.0, sorted(loaded)
+
+
+def parse_budgets(items: List[str]) -> Dict[str, float]:
+    budgets = {name: budget for name, (_, budget) in ENTRY_POINTS.items()}
+    for item in items:
+        name, _, value = item.partition("=")
+        if name not in ENTRY_POINTS or not value:
+            raise SystemExit(f"--budget は {'/'.join(ENTRY_POINTS)}=ミリ秒 で指定してください: {item}")
+        budgets[name] = float(value)
+    return budgets
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget", action="append", default=[], metavar="NAME=MS", help="予算の上書き（例: cli=100）")
+    args = ap.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    over = False
+    print(f"{'entry':<10} {'module':<30} {'min ms':>8} {'budget':>8}  heavy modules")
+    for name, (module, _) in ENTRY_POINTS.items():
+        runs = [measure(module) for _ in range(max(args.repeat, 1))]
+        best = min(ms for ms, _ in runs)
+        heavy = runs[0][1]
+        status = "ok" if best <= budgets[name] else "OVER"
+        over = over or status == "OVER"
+        print(f"{name:<10} {module:<30} {best:8.1f} {budgets[name]:8.0f}  {', '.join(heavy) or '-'}  [{status}]")
+
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
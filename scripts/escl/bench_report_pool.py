@@ -0,0 +1,99 @@
+# bench_report_pool.py
+"""
+レポート生成中のイベントループの遅れ（jitter）を、既定のスレッドプールと ReportPool（別プロセス）で比べる。
+
+--jobs 件のグループ出力（抽出 + Excel 書き出し、artifact_cache.build_group_report）を同時に投げ、
+その間 --tick ms ごとに起きるタイマーが予定からどれだけ遅れたかを記録する。Bot では同じループで
+Gateway の heartbeat や EntryScheduler の発火が動くので、この遅れがそのまま上乗せされる。
+
+  - thread: loop.run_in_executor(None, ...)（従来の asyncio.to_thread と同じ）
+  - process: ReportPool(--workers)（ワーカーの起動は計測前に済ませる）
+
+使い方:
+  python scripts/escl/bench_report_pool.py --jobs 8 --workers 2
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_extract import make_bucket  # noqa: E402
+from src.esclbot.artifact_cache import build_group_report  # noqa: E402
+from src.esclbot.report_pool import ReportPool  # noqa: E402
+
+
+async def run_jobs(executor: Optional[Executor], buckets: List[Dict[str, Any]], tick: float) -> Tuple[float, List[float]]:
+    """(全ジョブの所要秒, タイマーの遅れ ms の一覧) を返す。"""
+    loop = asyncio.get_running_loop()
+    lags: List[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        expected = loop.time() + tick
+        while not done.is_set():
+            await asyncio.sleep(max(expected - loop.time(), 0))
+            lags.append(max(loop.time() - expected, 0) * 1000)
+            expected += tick
+
+    ticking = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            loop.run_in_executor(executor, build_group_report, bucket, "bench", f"G{i}", "xlsx", 6)
+            for i, bucket in enumerate(buckets, start=1)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticking
+    return elapsed, lags
+
+
+def report(label: str, elapsed: float, lags: List[float]) -> None:
+    lags = sorted(lags) or [0.0]
+    p99 = lags[min(int(len(lags) * 0.99), len(lags) - 1)]
+    print(
+        f"  {label:<8} total {elapsed * 1000:8.1f} ms  lag median {statistics.median(lags):6.1f} ms"
+        f"  p99 {p99:6.1f} ms  max {lags[-1]:6.1f} ms"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    buckets = [make_bucket(6, args.teams, args.players, nested=False, seed=i) for i in range(args.jobs)]
+    tick = args.tick / 1000.0
+    print(f"jobs={args.jobs} teams={args.teams} players={args.players} tick={args.tick} ms")
+
+    # 1 回目は import などの初期化が入るので捨てる
+    await run_jobs(None, buckets[:1], tick)
+    report("thread", *await run_jobs(None, buckets, tick))
+
+    pool = ReportPool(args.workers, max_queue=args.jobs)
+    try:
+        await run_jobs(pool, buckets[: args.workers], tick)
+        report("process", *await run_jobs(pool, buckets, tick))
+        print(f"  pool     {pool.snapshot()}")
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jobs", type=int, default=8)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--tick", type=float, default=5.0, help="タイマーの間隔（ms）")
+    asyncio.run(main_async(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
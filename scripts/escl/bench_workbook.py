@@ -0,0 +1,161 @@
+# bench_workbook.py
+"""
+スクリム Excel 書き出しのベンチマーク。
+
+旧実装（pd.ExcelWriter + DataFrame.to_excel、試合ごとに df_all[df_all["game"] == g] で切り出す）と、
+workbook.WorkbookWriter（xlsxwriter の constant_memory モードで列バッファから行を直接書く）を比較する。
+処理時間とピークメモリ（tracemalloc）を出し、両者のセルの値が一致することも確認する。
+
+  - group: 1 グループ分のブック（GAME1..n / ALL_GAMES / TEAM_TOTALS）を --scrims × --groups 冊
+  - scrim: 複数グループをまとめたブック（グループ別シート + 全体集計）を --scrims 冊
+
+使い方:
+  python scripts/escl/bench_workbook.py --scrims 4 --groups 5 --repeat 3
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import pandas as pd  # noqa: E402
+
+from bench_extract import make_bucket  # noqa: E402
+from src.esclbot.api_scraper import extract_dataframe_from_bucket  # noqa: E402
+from src.esclbot.reports import aggregate_player_totals, aggregate_team_totals, aggregate_totals  # noqa: E402
+from src.esclbot.scrim_export import GroupExport, ScrimExport, build_scrim_xlsx  # noqa: E402
+from src.esclbot.workbook import build_group_xlsx  # noqa: E402
+
+
+def make_scrims(scrims: int, groups: int, games: int, teams: int, players: int) -> List[ScrimExport]:
+    out = []
+    for s in range(scrims):
+        export = ScrimExport(scrim_uuid=f"scrim-{s:03d}", title=f"scrim-{s:03d}")
+        for g in range(1, groups + 1):
+            bucket = make_bucket(games, teams, players, nested=False, seed=s * groups + g)
+            df = extract_dataframe_from_bucket(bucket, export.scrim_uuid, f"G{g}", max_games=games)
+            export.groups.append(GroupExport(group_uuid=f"group-{g}", label=f"G{g}", df=df))
+        out.append(export)
+    return out
+
+
+# ---------- 旧実装（比較用にそのまま残す） ----------
+def legacy_group_xlsx(df_all: pd.DataFrame) -> bytes:
+    mem = io.BytesIO()
+    with pd.ExcelWriter(mem, engine="xlsxwriter") as writer:
+        for g in sorted(set(df_all["game"].dropna().astype(int))):
+            dfg = df_all[df_all["game"] == g]
+            dfg.to_excel(writer, sheet_name=f"GAME{g}", index=False)
+        totals = aggregate_totals(df_all)
+        totals.players.to_excel(writer, sheet_name="ALL_GAMES", index=False)
+        totals.teams.to_excel(writer, sheet_name="TEAM_TOTALS", index=False)
+    return mem.getvalue()
+
+
+def legacy_scrim_xlsx(export: ScrimExport) -> bytes:
+    team_frames = []
+    mem = io.BytesIO()
+    with pd.ExcelWriter(mem, engine="xlsxwriter") as writer:
+        for group in export.groups:
+            group.df.to_excel(writer, sheet_name=group.label, index=False)
+            team_totals = aggregate_team_totals(group.df)
+            team_totals.insert(0, "group", group.label)
+            team_frames.append(team_totals)
+        df_all = pd.concat([group.df for group in export.groups], ignore_index=True)
+        aggregate_player_totals(df_all).to_excel(writer, sheet_name="ALL_GAMES", index=False)
+        pd.concat(team_frames, ignore_index=True).to_excel(writer, sheet_name="TEAM_TOTALS", index=False)
+    return mem.getvalue()
+
+
+# ---------- セル値の比較（openpyxl なしで読む） ----------
+def sheet_values(data: bytes) -> Dict[str, List[Tuple[str, str]]]:
+    """シート名 → [(セル番地, 値)]。共有文字列とインライン文字列の違いは吸収する。"""
+    import re
+    from xml.etree import ElementTree as ET
+
+    ns = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    with zipfile.ZipFile(io.BytesIO(data)) as book:
+        shared: List[str] = []
+        if "xl/sharedStrings.xml" in book.namelist():
+            for si in ET.fromstring(book.read("xl/sharedStrings.xml")).iter(f"{ns}si"):
+                shared.append("".join(t.text or "" for t in si.iter(f"{ns}t")))
+        names = re.findall(r'<sheet name="([^"]+)"', book.read("xl/workbook.xml").decode("utf-8"))
+        out = {}
+        for index, name in enumerate(names, start=1):
+            cells = []
+            for c in ET.fromstring(book.read(f"xl/worksheets/sheet{index}.xml")).iter(f"{ns}c"):
+                v = c.find(f"{ns}v")
+                if c.get("t") == "s":
+                    value = shared[int(v.text)]
+                elif c.get("t") == "inlineStr":
+                    value = "".join(t.text or "" for t in c.iter(f"{ns}t"))
+                elif v is None:
+                    continue
+                else:
+                    value = v.text
+                cells.append((c.get("r"), value))
+            out[name] = cells
+    return out
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def report(label: str, legacy: Tuple[float, int], current: Tuple[float, int]) -> None:
+    (legacy_t, legacy_peak), (current_t, current_peak) = legacy, current
+    print(f"[{label}]")
+    print(f"  legacy   {legacy_t * 1000:9.1f} ms  peak={legacy_peak / 1024:9.1f} KiB")
+    print(f"  current  {current_t * 1000:9.1f} ms  peak={current_peak / 1024:9.1f} KiB")
+    print(f"  speedup x{legacy_t / current_t:5.2f}  peak x{legacy_peak / current_peak:5.2f} smaller")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scrims", type=int, default=4)
+    ap.add_argument("--groups", type=int, default=5)
+    ap.add_argument("--games", type=int, default=6)
+    ap.add_argument("--teams", type=int, default=20)
+    ap.add_argument("--players", type=int, default=3)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    exports = make_scrims(args.scrims, args.groups, args.games, args.teams, args.players)
+    frames = [group.df for export in exports for group in export.groups]
+    rows = sum(len(df) for df in frames)
+    print(f"scrims={args.scrims} groups/scrim={args.groups} rows={rows:,}")
+
+    assert sheet_values(legacy_group_xlsx(frames[0])) == sheet_values(build_group_xlsx(frames[0]))
+    assert sheet_values(legacy_scrim_xlsx(exports[0])) == sheet_values(build_scrim_xlsx(exports[0]))
+
+    report(
+        f"group x{len(frames)}",
+        measure(lambda: [legacy_group_xlsx(df) for df in frames], args.repeat),
+        measure(lambda: [build_group_xlsx(df) for df in frames], args.repeat),
+    )
+    report(
+        f"scrim x{len(exports)}",
+        measure(lambda: [legacy_scrim_xlsx(export) for export in exports], args.repeat),
+        measure(lambda: [build_scrim_xlsx(export) for export in exports], args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 # src/esclbot/api_scraper.py  —— ESCL API 直叩き（metaのキーに確定）
 from __future__ import annotations
 import json, re
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 import requests
 import pandas as pd
 import re as _re 
 
+from .bucket_stream import GAMES_KEYS, BucketPayload, decode_bucket_payload
+from .frame_builder import ScrimFrameBuilder, apply_raw_dtypes
+
 UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
 
 API_BASE = "https://core-api-prod.escl.workers.dev"
@@ -85,12 +90,52 @@ def compute_accuracy(row: Dict[str, Any]):
         h = coerce_number(row["hits"]) or 0.0
         row["accuracy"] = (h / s * 100.0) if s > 0 else 0.0
 
+# ====== キー解決プラン（dict の shape ごとに一度だけ解決） ======
+# 行ごとに {k.lower(): k} を作り直す代わりに、キー集合(frozenset)→実キーの対応をキャッシュする。
+KeySpec = Tuple[Tuple[str, ...], ...]
+
+
+def key_spec(*candidate_lists: List[str]) -> KeySpec:
+    return tuple(tuple(cands) for cands in candidate_lists)
+
+
+@lru_cache(maxsize=4096)
+def compile_key_plan(shape: FrozenSet[str], spec: KeySpec) -> Tuple[Optional[str], ...]:
+    """
+    キー集合 shape に対して、spec の各候補リストに一致する実キーを解決する。
+    一致判定は first_key と同じく大文字小文字を無視し、候補の並び順を優先する。
+    """
+    lower_map: Dict[str, str] = {}
+    for k in sorted(shape):
+        lower_map.setdefault(k.lower(), k)
+    resolved: List[Optional[str]] = []
+    for cands in spec:
+        hit = None
+        for c in cands:
+            if c in shape:
+                hit = c
+                break
+            k = lower_map.get(c.lower())
+            if k is not None:
+                hit = k
+                break
+        resolved.append(hit)
+    return tuple(resolved)
+
+
+def key_plan(d: Dict[str, Any], spec: KeySpec) -> Tuple[Optional[str], ...]:
+    return compile_key_plan(frozenset(d), spec)
+
+
+ROW_COLUMNS = tuple(col for col in CAND if col != "game_no")
+ROW_SPEC = key_spec(*(CAND[col] for col in ROW_COLUMNS))
+GAME_NO_SPEC = key_spec(CAND["game_no"])
+_SCORE_COLUMNS = ("player_name", "team_name", "damage", "kills", "assists", "placement")
+
+
 def to_row(d: Dict[str, Any]) -> Dict[str, Any]:
     row: Dict[str, Any] = {}
-    for col, cands in CAND.items():
-        if col == "game_no":
-            continue
-        k = first_key(d, cands)
+    for col, k in zip(ROW_COLUMNS, key_plan(d, ROW_SPEC)):
         if k is not None:
             row[col] = d.get(k)
     compute_accuracy(row)
@@ -104,31 +149,31 @@ def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
 
 def extract_table_like_from_inner(inner: Any) -> Optional[pd.DataFrame]:
     """1つのゲーム相当のJSONから、プレイヤー行の配列を抽出してDFに整形"""
-    best_df: Optional[pd.DataFrame] = None
+    # 候補リストは行 dict のまま採点し、DataFrame は最良の1件だけ作る
+    best_rows: Optional[List[Dict[str, Any]]] = None
     best_score = -1
     for v in walk(inner):
         if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
             rows, score_sum = [], 0
             for item in v:
                 row = to_row(item)
-                filled = sum(1 for k in ["player_name","team_name","damage","kills","assists","placement"] if row.get(k) not in (None, ""))
+                filled = sum(1 for k in _SCORE_COLUMNS if row.get(k) not in (None, ""))
                 if filled >= 2:
                     rows.append(row)
                     score_sum += filled
             if rows:
-                df = pd.DataFrame(rows)
-                score = len(df) + score_sum
+                score = len(rows) + score_sum
                 if score > best_score:
                     best_score = score
-                    best_df = df
-    if best_df is not None and not best_df.empty:
-        return normalize_df(best_df)
+                    best_rows = rows
+    if best_rows:
+        return normalize_df(pd.DataFrame(best_rows))
     return None
 
 def guess_game_no_from_json(j: Any, fallback: int) -> int:
     for v in walk(j):
         if isinstance(v, dict):
-            k = first_key(v, CAND["game_no"])
+            (k,) = key_plan(v, GAME_NO_SPEC)
             if k and isinstance(v.get(k), (int, float, str)):
                 try:
                     g = int(v[k])
@@ -157,6 +202,10 @@ def parse_scrim_group_from_url(parent_url: str) -> Tuple[str, str]:
     raise ValueError(f"unexpected URL (UUIDが2つ見つからない): {parent_url}")
 
 def post_json(endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return _post(endpoint, payload).json()
+
+
+def _post(endpoint: str, payload: Dict[str, Any]) -> requests.Response:
     url = f"{API_BASE}/{endpoint}"
     headers = {
         "content-type": "application/json",
@@ -176,46 +225,109 @@ def post_json(endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         except Exception:
             pass
         raise requests.HTTPError(msg) from e
-    return r.json()
+    return r
+
+BUCKET_ENDPOINT = "public.v1.PublicBucketService/GetBucket"
+
+
+def normalize_uuid(value: str) -> str:
+    """余分な文字が混ざっていても UUID 部分だけを取り出す（見つからなければそのまま）。"""
+    m = UUID_RE.search(value)
+    return m.group(0) if m else value
+
+
+def decode_bucket_value(data: Any) -> Any:
+    """GetBucket の応答から value（JSON 文字列 or dict）を取り出してデコードする。"""
+    val = data.get("value") if isinstance(data, dict) else None
+    return json.loads(val) if isinstance(val, str) else val
+
+
+def bucket_as_dict(bucket: Any) -> Any:
+    """BucketPayload なら従来どおりの dict にして返す（それ以外はそのまま）。"""
+    return bucket.to_dict() if isinstance(bucket, BucketPayload) else bucket
+
+
+# GetBucket のキー形式（meta で確認済みの順）
+KEY_FORMAT_UUID_JSON = "group_uuid.json"   # <scrim_uuid>/<group_uuid>.json
+KEY_FORMAT_UUID = "group_uuid"             # <scrim_uuid>/<group_uuid>（環境差の保険）
+KEY_FORMAT_GID_JSON = "group_id.json"      # <scrim_uuid>/<groupId>.json（数値 groupId）
+BUCKET_KEY_FORMATS = (KEY_FORMAT_UUID_JSON, KEY_FORMAT_UUID, KEY_FORMAT_GID_JSON)
+
+
+def build_bucket_key(key_format: str, scrim_uuid: str, group_ref: Any) -> str:
+    if key_format == KEY_FORMAT_UUID:
+        return f"{scrim_uuid}/{group_ref}"
+    return f"{scrim_uuid}/{group_ref}.json"
+
+
+class BucketKeyFormatMemory:
+    """
+    GetBucket で成功したキー形式を覚えておき、次回はそれを最初に試す。
+
+    Scrim 単位の記録を優先し、無ければデプロイ（API ベース URL）単位の記録を使う。
+    """
+
+    def __init__(self, *, max_scrims: int = 1024) -> None:
+        self._by_deployment: Dict[str, str] = {}
+        self._by_scrim: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._max_scrims = max_scrims
+
+    def preferred(self, deployment: str, scrim_uuid: str) -> Optional[str]:
+        return self._by_scrim.get((deployment, scrim_uuid)) or self._by_deployment.get(deployment)
+
+    def order(self, deployment: str, scrim_uuid: str) -> List[str]:
+        first = self.preferred(deployment, scrim_uuid)
+        if first is None:
+            return list(BUCKET_KEY_FORMATS)
+        return [first] + [fmt for fmt in BUCKET_KEY_FORMATS if fmt != first]
+
+    def remember(self, deployment: str, scrim_uuid: str, key_format: str) -> None:
+        self._by_deployment[deployment] = key_format
+        self._by_scrim[(deployment, scrim_uuid)] = key_format
+        self._by_scrim.move_to_end((deployment, scrim_uuid))
+        while len(self._by_scrim) > self._max_scrims:
+            self._by_scrim.popitem(last=False)
+
+
+_KEY_FORMATS = BucketKeyFormatMemory()
+
 
 def get_group_bucket(scrim_uuid: str, group_uuid: str) -> Any:
     """
     metaで確認済みのキー形式: {"key": "<scrim_uuid>/<group_uuid>.json"}
     渡ってきた値に余分が混ざっても UUID の形に正規化してから叩く。
+    前回成功したキー形式を先に試し、ダメなら残りの形式にフォールバックする。
     """
-    # 念のため UUID を正規化（万一の混入対策）
-    m1 = UUID_RE.search(scrim_uuid); m2 = UUID_RE.search(group_uuid)
-    if m1: scrim_uuid = m1.group(0)
-    if m2: group_uuid = m2.group(0)
+    return bucket_as_dict(get_group_bucket_payload(scrim_uuid, group_uuid))
 
-    key1 = f"{scrim_uuid}/{group_uuid}.json"
-    try:
-        print("[api] GetBucket key=", key1)
-        data = post_json("public.v1.PublicBucketService/GetBucket", {"key": key1})
-        val = data.get("value")
-        return json.loads(val) if isinstance(val, str) else val
-    except Exception:
-        # フォールバック1: .json なし（環境差の保険）
-        key2 = f"{scrim_uuid}/{group_uuid}"
+
+def get_group_bucket_payload(scrim_uuid: str, group_uuid: str) -> Optional[BucketPayload]:
+    """get_group_bucket と同じだが、value を BucketPayload のまま返す（試合ごとに遅延デコード）。"""
+    # 念のため UUID を正規化（万一の混入対策）
+    scrim_uuid = normalize_uuid(scrim_uuid)
+    group_uuid = normalize_uuid(group_uuid)
+
+    last_exc: Optional[Exception] = None
+    for key_format in _KEY_FORMATS.order(API_BASE, scrim_uuid):
+        group_ref: Any = group_uuid
+        if key_format == KEY_FORMAT_GID_JSON:
+            # 数値 groupId が必要な形式だけ追加で解決する
+            group_ref = get_group_id(group_uuid)
+            if group_ref is None:
+                continue
+        key = build_bucket_key(key_format, scrim_uuid, group_ref)
         try:
-            print("[api] GetBucket fallback key=", key2)
-            data = post_json("public.v1.PublicBucketService/GetBucket", {"key": key2})
-            val = data.get("value")
-            return json.loads(val) if isinstance(val, str) else val
-        except Exception:
-            # フォールバック2: 数値 groupId を使う
-            gid = get_group_id(group_uuid)
-            if gid is not None:
-                key3 = f"{scrim_uuid}/{gid}.json"
-                try:
-                    print("[api] GetBucket fallback key(groupId)=", key3)
-                    data = post_json("public.v1.PublicBucketService/GetBucket", {"key": key3})
-                    val = data.get("value")
-                    return json.loads(val) if isinstance(val, str) else val
-                except Exception:
-                    pass
-            # ここまでダメなら例外をそのまま返す
-            raise
+            print("[api] GetBucket key=", key)
+            bucket = decode_bucket_payload(_post(BUCKET_ENDPOINT, {"key": key}).content)
+        except Exception as exc:
+            last_exc = exc
+            continue
+        _KEY_FORMATS.remember(API_BASE, scrim_uuid, key_format)
+        return bucket
+    # ここまでダメなら例外をそのまま返す
+    if last_exc is not None:
+        raise last_exc
+    raise RuntimeError("GetBucket のキーを解決できませんでした。")
 
 
 def get_games_by_group_id(group_id: int) -> List[Dict[str, Any]]:
@@ -233,12 +345,128 @@ def get_group_id(group_uuid: str) -> Optional[int]:
     """
     try:
         data = post_json("public.v1.PublicGroupService/GetGroupByUUID", {"uuid": group_uuid})
-        grp = data.get("group") or {}
-        gid = grp.get("id") or grp.get("groupId")
-        return int(gid) if gid is not None else None
+        return group_id_from_payload(data)
     except Exception:
         return None
 
+
+def group_id_from_payload(data: Any) -> Optional[int]:
+    """GetGroupByUUID の応答から groupId(int) を取り出す。"""
+    grp = (data.get("group") if isinstance(data, dict) else None) or {}
+    gid = grp.get("id") or grp.get("groupId")
+    return int(gid) if gid is not None else None
+
+GAMES_SPEC = key_spec(list(GAMES_KEYS))
+GAME_SPEC = key_spec(["teams", "squads", "teamResults", "team_results", "results"], CAND["game_no"])
+TEAM_SPEC = key_spec(
+    CAND["team_name"],
+    CAND["team_num"],
+    CAND["placement"],
+    ["players", "members", "playerStats", "player_stats", "roster", "lineup", "participants", "memberResults", "player_results"],
+)
+# team 配列の自動検出で数える特徴（名前・順位・番号）
+TEAM_FEATURE_SPEC = key_spec(CAND["team_name"], CAND["placement"], CAND["team_num"])
+# player 配列の自動検出で数える特徴
+PLAYER_FEATURE_SPEC = key_spec(
+    *(CAND[feat] for feat in ["player_name","character","kills","assists","damage","shots","hits","headshots"])
+)
+PLAYER_SPEC = key_spec(
+    CAND["player_name"],
+    CAND["character"],
+    CAND["kills"],
+    CAND["assists"],
+    CAND["damage"],
+    CAND["shots"],
+    CAND["hits"],
+    CAND["headshots"],
+    CAND["accuracy"],
+    CAND["headshots_accuracy"],
+    CAND["survival_time"],
+)
+
+JsonPath = Tuple[Any, ...]
+
+
+def _walk_with_path(obj: Any, path: JsonPath = ()):
+    """walk() と同じ順序で (path, value) を返す。"""
+    yield path, obj
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from _walk_with_path(v, path + (k,))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            yield from _walk_with_path(v, path + (i,))
+
+
+def _follow_path(obj: Any, path: JsonPath) -> Any:
+    for step in path:
+        if isinstance(obj, dict) and not isinstance(step, int):
+            obj = obj.get(step)
+        elif isinstance(obj, list) and isinstance(step, int) and step < len(obj):
+            obj = obj[step]
+        else:
+            return None
+    return obj
+
+
+def _is_dict_list(v: Any) -> bool:
+    return isinstance(v, list) and bool(v) and all(isinstance(x, dict) for x in v)
+
+
+def _find_best_dict_list(root: Any, feature_spec: KeySpec) -> Tuple[Optional[JsonPath], Optional[List[Dict[str, Any]]]]:
+    """root 配下で、feature_spec の特徴キーを最も多く含む dict 配列とその path を返す。"""
+    best_path: Optional[JsonPath] = None
+    best = None
+    best_score = -1
+    for path, v in _walk_with_path(root):
+        if _is_dict_list(v):
+            score = 0
+            for item in v:
+                score += sum(1 for k in key_plan(item, feature_spec) if k is not None)
+            if score > best_score and score > 0:
+                best_score = score
+                best = v
+                best_path = path
+    return best_path, best
+
+
+class _ListLocator:
+    """
+    直接キーで見つからない配列を walk() で探し、見つかった path を親の shape ごとに覚える。
+    同じ shape の親には path を再利用し、path が当てはまらないときだけ探索し直す。
+    見つからなかったことは覚えない（空の配列を持つチームのあとに続く同じ shape のチームも探す）。
+    """
+
+    def __init__(self, feature_spec: KeySpec) -> None:
+        self._feature_spec = feature_spec
+        self._paths: Dict[FrozenSet[str], JsonPath] = {}
+
+    def locate(self, parent: Any, shape: FrozenSet[str]) -> Optional[List[Dict[str, Any]]]:
+        path = self._paths.get(shape)
+        if path is not None:
+            found = _follow_path(parent, path)
+            if _is_dict_list(found):
+                return found
+        path, found = _find_best_dict_list(parent, self._feature_spec)
+        if path is not None:
+            self._paths[shape] = path
+        return found
+
+
+def _iter_bucket_games(bucket: Any) -> Iterator[Any]:
+    """bucket（dict or BucketPayload）の games 配列を 1 試合ずつ返す。"""
+    if isinstance(bucket, BucketPayload):
+        return bucket.iter_games()
+    if not isinstance(bucket, dict):
+        raise RuntimeError("bucket が dict ではありません")
+
+    # games を取る（候補）
+    (games_key,) = key_plan(bucket, GAMES_SPEC)
+    if not games_key or not isinstance(bucket.get(games_key), list):
+        raise RuntimeError("bucket 内に games 配列が見つかりません")
+    return iter(bucket[games_key])
+
+
 def extract_rows_games_teams_players(bucket: Dict[str, Any], group_label: str, scrim_uuid: str, max_games: int = 6) -> pd.DataFrame:
     """
     期待構造:
@@ -251,73 +479,32 @@ def extract_rows_games_teams_players(bucket: Dict[str, Any], group_label: str, s
       - teams の候補キーを総当り
       - 見つからなければ game 全体から "teamsっぽい配列" を探索
       - 各 team の中を深く探索して "プレイヤー配列っぽいリスト" を自動検出
+
+    キー解決は dict の shape（キー集合）ごとに compile_key_plan で一度だけ行い、
+    探索で見つけた配列の位置も shape ごとに再利用する。
     """
-    if not isinstance(bucket, dict):
-        raise RuntimeError("bucket が dict ではありません")
+    games = _iter_bucket_games(bucket)
 
-    # games を取る（候補）
-    games_key = pick_key(bucket, ["games", "matches", "rounds"])
-    if not games_key or not isinstance(bucket.get(games_key), list):
-        raise RuntimeError("bucket 内に games 配列が見つかりません")
-    games = bucket[games_key]
-
-    def find_teams_list_from_game(game: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
-        # 1) 素直に候補キー
-        tkey = pick_key(game, ["teams", "squads", "teamResults", "team_results", "results"])
-        if tkey and isinstance(game.get(tkey), list) and all(isinstance(x, dict) for x in game[tkey]):
-            return game[tkey]
-        # 2) game 内を総当りして "team_name/placement" を多く含む dict 配列を拾う
-        best = None
-        best_score = -1
-        for v in walk(game):
-            if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
-                score = 0
-                for item in v:
-                    # teamっぽい特徴（名前や順位等のキー）を数える
-                    has_team = bool(first_key(item, CAND["team_name"]))
-                    has_place = bool(first_key(item, CAND["placement"]))
-                    has_teamnum = bool(first_key(item, CAND["team_num"]))
-                    score += (has_team + has_place + has_teamnum)
-                if score > best_score and score > 0:
-                    best_score = score
-                    best = v
-        return best
-
-    def find_players_list_from_team(team: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
-        # 1) 素直に候補キー
-        pkey = pick_key(team, ["players", "members", "playerStats", "player_stats", "roster", "lineup", "participants", "memberResults", "player_results"])
-        if pkey and isinstance(team.get(pkey), list) and all(isinstance(x, dict) for x in team[pkey]):
-            return team[pkey]
-        # 2) team 内を総当りして "player らしい dict 配列" を拾う
-        #    （player_name/character/kills/assists/damage などが多い配列を選ぶ）
-        best = None
-        best_score = -1
-        player_feature_keys = ["player_name","character","kills","assists","damage","shots","hits","headshots"]
-        for v in walk(team):
-            if isinstance(v, list) and v and all(isinstance(x, dict) for x in v):
-                score = 0
-                for item in v:
-                    for feat in player_feature_keys:
-                        if first_key(item, CAND.get(feat, [])):
-                            score += 1
-                if score > best_score and score > 0:
-                    best_score = score
-                    best = v
-        return best
+    teams_locator = _ListLocator(TEAM_FEATURE_SPEC)
+    players_locator = _ListLocator(PLAYER_FEATURE_SPEC)
 
-    rows: List[Dict[str, Any]] = []
+    builder = ScrimFrameBuilder(group_label, scrim_uuid)
     game_count = 0
 
     for gi, game in enumerate(games, start=1):
         if game_count >= max_games:
             break
 
-        teams = find_teams_list_from_game(game)
+        game_shape: FrozenSet[str] = frozenset(game) if isinstance(game, dict) else frozenset()
+        tkey, game_no_key = compile_key_plan(game_shape, GAME_SPEC)
+        teams = game.get(tkey) if tkey else None
+        if not (isinstance(teams, list) and all(isinstance(x, dict) for x in teams)):
+            # game 内を総当りして "team_name/placement" を多く含む dict 配列を拾う
+            teams = teams_locator.locate(game, game_shape)
         if not isinstance(teams, list):
             continue  # 次のゲームへ
 
         # game number を拾う
-        game_no_key = pick_key(game, CAND["game_no"])
         try:
             game_no_val = int(game.get(game_no_key)) if game_no_key else gi
         except Exception:
@@ -327,12 +514,16 @@ def extract_rows_games_teams_players(bucket: Dict[str, Any], group_label: str, s
             if not isinstance(t, dict):
                 continue
 
-            # チーム名/番号/順位
-            _, team_name = pick_first(t, CAND["team_name"])
-            _, team_num  = pick_first(t, CAND["team_num"])
-            _, placement = pick_first(t, CAND["placement"])
+            # チーム名/番号/順位 と players 配列のキー
+            team_shape = frozenset(t)
+            k_team_name, k_team_num, k_placement, pkey = compile_key_plan(team_shape, TEAM_SPEC)
+            team_name = t.get(k_team_name) if k_team_name else None
+            team_num = t.get(k_team_num) if k_team_num else None
+            placement = t.get(k_placement) if k_placement else None
 
-            players = find_players_list_from_team(t)
+            players = t.get(pkey) if pkey else None
+            if not (isinstance(players, list) and all(isinstance(x, dict) for x in players)):
+                players = players_locator.locate(t, team_shape)
             if not isinstance(players, list):
                 # プレイヤー配列が見つからないチームはスキップ（ここが超重要）
                 continue
@@ -340,66 +531,41 @@ def extract_rows_games_teams_players(bucket: Dict[str, Any], group_label: str, s
             for p in players:
                 if not isinstance(p, dict):
                     continue
-                # プレイヤー名・キャラ
-                _, player_name = pick_first(p, CAND["player_name"])
-                _, character   = pick_first(p, CAND["character"])
-                # スタッツ
-                _, kills   = pick_first(p, CAND["kills"])
-                _, assists = pick_first(p, CAND["assists"])
-                _, damage  = pick_first(p, CAND["damage"])
-                _, shots   = pick_first(p, CAND["shots"])
-                _, hits    = pick_first(p, CAND["hits"])
-                _, hs      = pick_first(p, CAND["headshots"])
-                # 命中率系・生存時間
-                _, acc     = pick_first(p, CAND["accuracy"])
-                _, hs_acc  = pick_first(p, CAND["headshots_accuracy"])
-                _, surv    = pick_first(p, CAND["survival_time"])
+                plan = compile_key_plan(frozenset(p), PLAYER_SPEC)
+                (player_name, character, kills, assists, damage,
+                 shots, hits, hs, acc, hs_acc, surv) = [p.get(k) if k else None for k in plan]
                 if surv is None:
                     surv = p.get("timeAlive") or p.get("time_survived") or p.get("timeAliveMs")
 
-                # 数値化＆自動計算
-                shots_n = ensure_num(shots)
-                hits_n  = ensure_num(hits)
-                acc_n   = ensure_num(acc)
-                hs_n    = ensure_num(hs)
-                if acc_n is None and shots_n is not None and hits_n is not None:
-                    acc_n = (hits_n / shots_n * 100.0) if shots_n > 0 else 0.0
-                hs_acc_n = ensure_num(hs_acc)
-
-                row = {
-                    "group": group_label,
-                    "scrim_id": scrim_uuid,
-                    "game": game_no_val,
-                    "team_name": team_name,
-                    "team_num": team_num,
-                    "player_name": player_name,
-                    "character": character,
-                    "placement": placement,
-                    "kills": kills,
-                    "assists": assists,
-                    "damage": damage,
-                    "shots": shots_n if shots_n is not None else shots,
-                    "hits": hits_n if hits_n is not None else hits,
-                    "accuracy": acc_n if acc_n is not None else acc,
-                    "headshots": hs_n if hs_n is not None else hs,
-                    "headshots_accuracy": hs_acc_n if hs_acc_n is not None else hs_acc,
-                    "survival_time": surv,
-                }
-                rows.append(row)
+                # 数値化は列バッファ側で行い、accuracy の補完は build() でまとめて計算する
+                builder.append(
+                    game=game_no_val,
+                    team_name=team_name,
+                    team_num=team_num,
+                    player_name=player_name,
+                    character=character,
+                    placement=placement,
+                    kills=kills,
+                    assists=assists,
+                    damage=damage,
+                    shots=shots,
+                    hits=hits,
+                    accuracy=acc,
+                    headshots=hs,
+                    headshots_accuracy=hs_acc,
+                    survival_time=surv,
+                )
 
         game_count += 1
+        if game_count >= max_games:
+            # games がストリームなら、ここで止めれば残りの試合はデコードされない
+            break
 
-    if not rows:
+    if not len(builder):
         raise RuntimeError("game→team→players 抽出で行が見つかりませんでした。")
 
-    df = pd.DataFrame(rows)
-    # 必須列揃え＆並び
-    for col in REQUIRED_HEADERS:
-        if col not in df.columns:
-            df[col] = None
-    df = df[["group","scrim_id","game"] + REQUIRED_HEADERS]
-    df = df.sort_values(["game","placement","team_name","player_name"], na_position="last").reset_index(drop=True)
-    return df
+    # 列の並び（group, scrim_id, game + REQUIRED_HEADERS）と並べ替えは builder 側で行う
+    return builder.build()
 
 def get_scrim_and_group_labels(parent_url: str) -> Tuple[str, str]:
     """
@@ -413,50 +579,84 @@ def get_scrim_and_group_labels(parent_url: str) -> Tuple[str, str]:
     scrim_title = ""
     try:
         data = post_json("public.v1.PublicScrimService/GetScrim", {"uuid": scrim_uuid})
-        scrim = data.get("scrim") or {}
-        scrim_title = scrim.get("title") or scrim.get("name") or ""
+        scrim_title = scrim_title_from_payload(data)
     except Exception:
         pass
 
     # 2) グループラベル
-    group_label = ""
     gnum = None
     try:
-        bucket = get_group_bucket(scrim_uuid, group_uuid)
-        if isinstance(bucket, dict):
-            gnum = bucket.get("group_num") or bucket.get("groupNumber") or bucket.get("groupNo")
+        gnum = group_num_from_bucket(get_group_bucket_payload(scrim_uuid, group_uuid))
     except Exception:
         pass
     if gnum is None:
         try:
-            g = post_json("public.v1.PublicGroupService/GetGroupByUUID", {"uuid": group_uuid}).get("group") or {}
-            gnum = g.get("num") or g.get("number") or g.get("id")  # idが数値なら暫定
+            gnum = group_num_from_payload(post_json("public.v1.PublicGroupService/GetGroupByUUID", {"uuid": group_uuid}))
         except Exception:
             pass
-    if gnum is not None:
-        try:
-            group_label = f"G{int(gnum)}"
-        except Exception:
-            group_label = str(gnum)
 
-    # 軽く整形（全角半角など気になるならここで）
-    if scrim_title:
-        scrim_title = str(scrim_title).strip()
-        # NG文字は '_' に置換（OS依存の禁止記号）
-        scrim_title = _re.sub(r'[\\/*?:"<>|]', "_", scrim_title)
+    return sanitize_scrim_title(scrim_title), format_group_label(gnum)
+
+
+def scrim_title_from_payload(data: Any) -> str:
+    """GetScrim の応答からタイトル（title 優先、なければ name）を取り出す。"""
+    scrim = (data.get("scrim") if isinstance(data, dict) else None) or {}
+    return scrim.get("title") or scrim.get("name") or ""
+
+
+def scrim_finished_from_payload(data: Any) -> bool:
+    """GetScrim の応答が終了済み Scrim（結果が確定して不変）かどうか。"""
+    scrim = (data.get("scrim") if isinstance(data, dict) else None) or {}
+    return scrim.get("finished") is True
+
+
+def group_num_from_bucket(bucket: Any) -> Any:
+    if isinstance(bucket, BucketPayload):
+        bucket = bucket.header
+    if isinstance(bucket, dict):
+        return bucket.get("group_num") or bucket.get("groupNumber") or bucket.get("groupNo")
+    return None
+
+
+def group_num_from_payload(data: Any) -> Any:
+    """GetGroupByUUID の応答からグループ番号を取り出す。"""
+    g = (data.get("group") if isinstance(data, dict) else None) or {}
+    return g.get("num") or g.get("number") or g.get("groupNum") or g.get("id")  # idが数値なら暫定
+
+
+def format_group_label(gnum: Any) -> str:
+    if gnum is None:
+        return ""
+    try:
+        return f"G{int(gnum)}"
+    except Exception:
+        return str(gnum)
+
 
-    return scrim_title, group_label
+def sanitize_scrim_title(scrim_title: Any) -> str:
+    # 軽く整形（全角半角など気になるならここで）
+    if not scrim_title:
+        return ""
+    scrim_title = str(scrim_title).strip()
+    # NG文字は '_' に置換（OS依存の禁止記号）
+    return _re.sub(r'[\\/*?:"<>|]', "_", scrim_title)
 
 
 def collect_csv_from_parent_url(parent_url: str, group_label: str = "", max_games: int = 6) -> pd.DataFrame:
     scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
 
-    # （必要なら）groupId を取得しておくが今回は未使用
-    _gid = get_group_id(group_uuid)
+    # グループ用バケットを一発取得（groupId は GetBucket のフォールバック時だけ解決する）
+    bucket = get_group_bucket_payload(scrim_uuid, group_uuid)
+    return extract_dataframe_from_bucket(bucket, scrim_uuid, group_label, max_games=max_games)
 
-    # グループ用バケットを一発取得
-    bucket = get_group_bucket(scrim_uuid, group_uuid)
-    if not bucket:
+
+def extract_dataframe_from_bucket(bucket: Any, scrim_uuid: str, group_label: str = "", max_games: int = 6) -> pd.DataFrame:
+    """
+    取得済みバケットから試合明細 DataFrame を作る（通信なし）。
+    同期版 / 非同期版（public_api）の collect_csv_from_parent_url で共通利用する。
+    bucket は dict でも BucketPayload でもよい（後者は試合を 1 つずつデコードして流し込む）。
+    """
+    if bucket is None or (not isinstance(bucket, BucketPayload) and not bucket):
         raise RuntimeError("GetBucket の結果が空でした。")
 
     # ★ まずは“ゲーム→チーム→プレイヤー”で構造的に抜く（推奨ルート）
@@ -467,6 +667,11 @@ def collect_csv_from_parent_url(parent_url: str, group_label: str = "", max_game
         # それでも失敗するときだけ従来のヒューリスティックにフォールバック
         pass
 
+    # 旧ヒューリスティックは bucket 全体を見るので、ここで初めて dict にする
+    bucket = bucket_as_dict(bucket)
+    if not bucket:
+        raise RuntimeError("GetBucket の結果が空でした。")
+
     # —— 旧ヒューリスティック（最終手段） ——
     candidates: List[Any] = []
     if isinstance(bucket, dict) and "games" in bucket and isinstance(bucket["games"], list):
@@ -485,7 +690,7 @@ def collect_csv_from_parent_url(parent_url: str, group_label: str = "", max_game
         df1.insert(0, "game", guess_game_no_from_json(bucket, 1))
         df1.insert(0, "scrim_id", scrim_uuid)
         df1.insert(0, "group", group_label or "")
-        return df1
+        return apply_raw_dtypes(df1)
 
     frames: List[pd.DataFrame] = []
     for i, game_obj in enumerate(candidates, start=1):
@@ -500,8 +705,8 @@ def collect_csv_from_parent_url(parent_url: str, group_label: str = "", max_game
 
     if not frames:
         raise RuntimeError("各試合オブジェクトから明細を抽出できませんでした。")
-    out = pd.concat(frames, ignore_index=True).sort_values(["game","team_name","player_name"]).reset_index(drop=True)
-    return out
+    out = pd.concat(frames, ignore_index=True)
+    return apply_raw_dtypes(out).sort_values(["game","team_name","player_name"]).reset_index(drop=True)
 
 def get_scrim_name(scrim_uuid: str, group_uuid: str) -> Optional[str]:
     """
@@ -511,11 +716,16 @@ def get_scrim_name(scrim_uuid: str, group_uuid: str) -> Optional[str]:
     """
     try:
         data = post_json("public.v1.PublicScrimService/GetScrim", {"uuid": scrim_uuid})
-        scrim = data.get("scrim") or {}
-        name = scrim.get("name") or scrim.get("title")
-        if isinstance(name, str) and name.strip():
-            return name.strip()
-        return None
+        return scrim_name_from_payload(data)
     except Exception:
         return None
 
+
+def scrim_name_from_payload(data: Any) -> Optional[str]:
+    """GetScrim の応答から Scrim 名（name/title）を取り出す。"""
+    scrim = (data.get("scrim") if isinstance(data, dict) else None) or {}
+    name = scrim.get("name") or scrim.get("title")
+    if isinstance(name, str) and name.strip():
+        return name.strip()
+    return None
+
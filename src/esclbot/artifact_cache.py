@@ -0,0 +1,372 @@
+"""Cache of generated export files keyed by the content hash of the source buckets."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .cache import TTLCache
+from .defaults import DEFAULT_MAX_CONCURRENCY
+from .version import __BOT_VERSION__
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .public_api import ESCLPublicApiClient
+    from .scrim_export import ScrimExport
+
+__all__ = [
+    "ARTIFACT_SCHEMA",
+    "ArtifactCache",
+    "GroupArtifact",
+    "ScrimArtifact",
+    "artifact_key",
+    "build_group_report",
+    "build_scrim_artifact",
+    "encode_group",
+    "encode_scrim",
+    "export_group_artifact",
+    "export_scrim_artifact",
+    "scrim_artifact_key",
+]
+
+logger = logging.getLogger(__name__)
+
+# 出力の中身（列・シート構成・集計方法）を変えたら上げる。Bot のバージョンと合わせてキーに入るので、
+# 古い成果物がディスク層に残っていても新しいコードからは当たらない。
+ARTIFACT_SCHEMA = 1
+REPORT_VERSION = f"{__BOT_VERSION__}/{ARTIFACT_SCHEMA}"
+
+
+def artifact_key(
+    *,
+    content_hashes: Sequence[str],
+    fmt: str,
+    labels: Sequence[str],
+    scrim_uuid: str,
+    version: str = REPORT_VERSION,
+) -> str:
+    """(bucket の content hash 群, 形式, グループ名, レポートのバージョン) から成果物のキーを作る。"""
+    material = json.dumps(
+        [version, fmt, scrim_uuid, list(labels), list(content_hashes)], ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def scrim_artifact_key(export: ScrimExport, fmt: str) -> Optional[str]:
+    """スクリム全体の成果物のキー。hash の分からないグループが 1 つでもあれば None（キャッシュしない）。"""
+    hashes = [group.content_hash for group in export.groups]
+    if not hashes or any(h is None for h in hashes):
+        return None
+    return artifact_key(
+        content_hashes=[h for h in hashes if h],
+        fmt=fmt,
+        labels=[group.label for group in export.groups],
+        scrim_uuid=export.scrim_uuid,
+    )
+
+
+class ArtifactCache:
+    """
+    生成済みファイル（CSV / Excel / Parquet など）のキャッシュ。
+
+    - メモリ層: TTLCache（期限なし）による LRU。件数とバイト数で上限を掛ける
+    - ディスク層（directory を渡したとき）: directory/ab/abcdef... に 1 ファイルずつ保存し、
+      合計が max_disk_bytes を超えたら最終アクセス（mtime）の古いものから消す
+
+    キーは bucket の content hash から作るので、内容が変わらない限り（終了済みのスクリムなど）
+    同じ成果物を作り直さずに返せる。複数スレッドから使ってよい。
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        *,
+        max_entries: int = 64,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._directory = Path(directory) if directory is not None else None
+        self._memory: TTLCache[bytes] = TTLCache(ttl=math.inf, max_entries=max_entries, max_bytes=max_bytes)
+        self._max_disk_bytes = max_disk_bytes
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.disk_hits = 0
+
+    @property
+    def directory(self) -> Optional[Path]:
+        return self._directory
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            return entry.value
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self._memory.put(key, data, size=len(data))
+                self.disk_hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        with self._lock:
+            self._memory.put(key, data, size=len(data))
+        self._write_disk(key, data)
+
+    def get_or_build(self, key: Optional[str], build: Callable[[], bytes]) -> bytes:
+        """key の成果物を返す。無ければ build() で作って保存する（key が None なら毎回作る）。"""
+        if key is None:
+            return build()
+        data = self.get(key)
+        if data is None:
+            data = build()
+            self.put(key, data)
+        return data
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = self._memory.snapshot()
+        return {**stats, "disk_hits": self.disk_hits, "disk_bytes": self._disk_bytes}
+
+    # ---------- ディスク層 ----------
+    def _path(self, key: str) -> Path:
+        assert self._directory is not None
+        return self._directory / key[:2] / key
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self._directory is None:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("成果物キャッシュの読み込みに失敗しました: %s (%s)", path, exc)
+            return None
+        with contextlib.suppress(OSError):
+            now = self._clock()
+            os.utime(path, (now, now))  # 最終アクセスを記録して、掃除で消されにくくする
+        return data
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        if self._directory is None:
+            return
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                now = self._clock()
+                os.utime(tmp, (now, now))
+                os.replace(tmp, path)
+            except BaseException:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp)
+                raise
+        except OSError as exc:
+            # 保存に失敗しても成果物自体は返せる
+            logger.warning("成果物キャッシュの保存に失敗しました: %s (%s)", path, exc)
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self._max_disk_bytes:
+                self._prune_disk()
+
+    def _disk_files(self) -> List[Tuple[Path, int, float]]:
+        assert self._directory is not None
+        files = []
+        for path in self._directory.glob("??/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _prune_disk(self) -> None:
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self._max_disk_bytes:
+                break
+            with contextlib.suppress(OSError):
+                path.unlink()
+                total -= size
+        self._disk_bytes = total
+
+
+def encode_group(df: pd.DataFrame, fmt: str) -> bytes:
+    """1 グループ分の成果物（xlsx はブック、それ以外は columnar.encode_frame の形式）。"""
+    if fmt == "xlsx":
+        from .workbook import build_group_xlsx
+
+        return build_group_xlsx(df)
+    from .columnar import encode_frame
+
+    return encode_frame(df, fmt)
+
+
+def encode_scrim(export: ScrimExport, fmt: str) -> bytes:
+    """スクリム全体の成果物（xlsx は 1 冊のブック、parquet / arrow は全グループの生データを 1 表に）。"""
+    if fmt == "xlsx":
+        from .scrim_export import build_scrim_xlsx
+
+        return build_scrim_xlsx(export)
+    from .columnar import encode_frame
+    from .frame_builder import concat_raw_frames
+
+    # group 列でグループを区別する
+    return encode_frame(concat_raw_frames([group.df for group in export.groups]), fmt)
+
+
+def build_group_report(
+    payload: Any, scrim_uuid: str, group_label: str, fmt: str, max_games: int = 6
+) -> Tuple[bytes, pd.DataFrame]:
+    """bucket から生データを抽出して成果物にする（ReportPool のワーカーで 1 回の往復で済ませる）。"""
+    from .api_scraper import extract_dataframe_from_bucket
+
+    df = extract_dataframe_from_bucket(payload, scrim_uuid, group_label, max_games=max_games)
+    return encode_group(df, fmt), df
+
+
+async def build_scrim_artifact(
+    cache: Optional[ArtifactCache], export: ScrimExport, fmt: str, *, executor: Optional[Executor] = None
+) -> bytes:
+    """スクリム全体の成果物。全グループの bucket が前回と同じなら、集計とブックの書き出しを省く。"""
+    loop = asyncio.get_running_loop()
+    key = scrim_artifact_key(export, fmt) if cache is not None else None
+    if cache is not None and key is not None:
+        data = await asyncio.to_thread(cache.get, key)
+        if data is not None:
+            return data
+    data = await loop.run_in_executor(executor, encode_scrim, export, fmt)
+    if cache is not None and key is not None:
+        await asyncio.to_thread(cache.put, key, data)
+    return data
+
+
+@dataclass(slots=True)
+class ScrimArtifact:
+    # 各グループの df は今回抽出したものだけ入る（キャッシュから返して抽出しなかったグループは None）
+    export: ScrimExport
+    data: bytes
+    cached: bool
+
+
+async def export_scrim_artifact(
+    client: ESCLPublicApiClient,
+    cache: Optional[ArtifactCache],
+    group_urls: Sequence[str],
+    fmt: str,
+    *,
+    need_frame: Optional[Callable[[str, str], Awaitable[bool]]] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_games: int = 6,
+    executor: Optional[Executor] = None,
+) -> ScrimArtifact:
+    """
+    スクリム全体の成果物を返す。
+
+    先に全グループの bucket を取得し、content hash とラベルから成果物を探す。当たればそのまま返し、
+    生データの抽出も集計もしない。ただし need_frame(scrim_uuid, group_uuid) が True のグループ
+    （シーズン集計に未取り込みなど）だけは抽出して df に載せる。外れたときは全グループを抽出して作る。
+    """
+    from .scrim_export import drop_failed_groups, extract_groups, fetch_scrim
+
+    export = await fetch_scrim(client, group_urls, max_concurrency=max_concurrency)
+    key = scrim_artifact_key(export, fmt) if cache is not None else None
+    if cache is not None and key is not None:
+        data = await asyncio.to_thread(cache.get, key)
+        if data is not None:
+            wanted = [
+                group for group in export.groups
+                if need_frame is not None and await need_frame(export.scrim_uuid, group.group_uuid)
+            ]
+            failures = await extract_groups(
+                export, wanted, max_concurrency=max_concurrency, max_games=max_games, executor=executor
+            )
+            for group_uuid, exc in failures.items():
+                # 成果物は返せるので、シーズン集計に入らないだけにする
+                logger.warning("グループの生データを抽出できませんでした: %s (%s)", group_uuid, exc)
+            for group in export.groups:
+                group.payload = None
+            return ScrimArtifact(export=export, data=data, cached=True)
+
+    failures = await extract_groups(export, max_concurrency=max_concurrency, max_games=max_games, executor=executor)
+    drop_failed_groups(export, failures)
+    data = await build_scrim_artifact(cache, export, fmt, executor=executor)
+    return ScrimArtifact(export=export, data=data, cached=False)
+
+
+@dataclass(slots=True)
+class GroupArtifact:
+    data: bytes
+    # 今回抽出した生データ（キャッシュから返したときは None）
+    frame: Optional[pd.DataFrame]
+    cached: bool
+
+
+async def export_group_artifact(
+    client: ESCLPublicApiClient,
+    cache: Optional[ArtifactCache],
+    *,
+    scrim_uuid: str,
+    group_uuid: str,
+    group_label: str,
+    fmt: str,
+    need_frame: bool = False,
+    max_games: int = 6,
+    executor: Optional[Executor] = None,
+) -> GroupArtifact:
+    """
+    1 グループ分の成果物を返す。
+
+    bucket を取得して（client のキャッシュに載っていれば通信もしない）content hash で成果物を探し、
+    当たればそのまま返す。生データの抽出も集計もしない。need_frame=True のとき（シーズン集計に
+    未取り込みなど）は、当たっても生データだけは抽出して frame に載せる。
+    抽出と書き出しは executor（None なら既定のスレッドプール。Bot では ReportPool）で実行する。
+    """
+    from .api_scraper import extract_dataframe_from_bucket
+
+    loop = asyncio.get_running_loop()
+    payload = await client.get_group_bucket_payload(scrim_uuid, group_uuid)
+    digest = client.bucket_content_hash(scrim_uuid, group_uuid)
+    key = None
+    data = None
+    if cache is not None and digest:
+        key = artifact_key(content_hashes=[digest], fmt=fmt, labels=[group_label], scrim_uuid=scrim_uuid)
+        data = await asyncio.to_thread(cache.get, key)
+        if data is not None and not need_frame:
+            return GroupArtifact(data=data, frame=None, cached=True)
+
+    if data is not None:
+        extract = partial(extract_dataframe_from_bucket, payload, scrim_uuid, group_label, max_games=max_games)
+        df = await loop.run_in_executor(executor, extract)
+        return GroupArtifact(data=data, frame=df, cached=True)
+    data, df = await loop.run_in_executor(
+        executor, build_group_report, payload, scrim_uuid, group_label, fmt, max_games
+    )
+    if cache is not None and key is not None:
+        await asyncio.to_thread(cache.put, key, data)
+    return GroupArtifact(data=data, frame=df, cached=False)
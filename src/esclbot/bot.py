@@ -1,43 +1,58 @@
 from __future__ import annotations
 
 import asyncio
+import importlib
 import io
 import logging
 import os
-from pathlib import Path
-from typing import Optional
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional
 
 import discord
 from discord import AllowedMentions, app_commands
 from discord.ext import commands
-from dotenv import load_dotenv
-import pandas as pd
 from zoneinfo import ZoneInfo
 
-from .api_scraper import (
-    collect_csv_from_parent_url,
-    get_scrim_name,
-    parse_scrim_group_from_url,
-)
-from .entry_scheduler import EntryScheduler
-from .escl_api import ESCLApiClient
-from .reports import (
-    aggregate_player_totals,
-    aggregate_team_totals,
-    safe_filename_component,
-)
+from .columnar import COLUMNAR_FORMATS, FILE_EXTENSIONS, columnar_available
+from .defaults import DATA_DIR, DEFAULT_ARCHIVE_DIR, DEFAULT_ARTIFACT_DIR, DEFAULT_ENTRY_JOURNAL, DEFAULT_SEASON_DB
+from .singleflight import SingleFlight
 from .team_store import TeamStore, TeamStoreError
-
-__BOT_VERSION__ = "ESCL-Bot v2.1-cli"
+from .version import __BOT_VERSION__
+
+# pandas / httpx を読み込むモジュールは使う場面（コマンド・クライアント生成）で import する。
+# 起動時は setup_hook から別スレッドで先読みし、最初のコマンドでも待たないようにする。
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .artifact_cache import ArtifactCache
+    from .entry_journal import EntryJournal
+    from .entry_scheduler import EntryScheduler
+    from .escl_api import ESCLApiClient
+    from .public_api import ESCLPublicApiClient
+    from .rate_limit import RateLimitGovernor
+    from .report_pool import ReportPool
+    from .scrim_export import ScrimExport
+    from .season_store import SeasonStore
 
 logger = logging.getLogger(__name__)
 
 # ===== Boot =====
-load_dotenv()
-
 JST = ZoneInfo("Asia/Tokyo")
-DATA_DIR = Path("data")
 TEAM_STORE_PATH = DATA_DIR / "team_ids.json"
+ARCHIVE_DIR = DEFAULT_ARCHIVE_DIR
+SEASON_DB_PATH = DEFAULT_SEASON_DB
+ENTRY_JOURNAL_PATH = DEFAULT_ENTRY_JOURNAL
+DEFAULT_ENTRY_WARMUP = 5.0
+
+# setup_hook で先読みするモジュール（コマンド実行時に import するもの）
+_PRELOAD_MODULES = (
+    "pandas",
+    ".artifact_cache",
+    ".public_api",
+    ".scrim_export",
+    ".season_store",
+    ".workbook",
+)
 
 
 def _parse_int_env(name: str) -> Optional[int]:
@@ -51,43 +66,247 @@ def _parse_int_env(name: str) -> Optional[int]:
         return None
 
 
-DEFAULT_TEAM_ID = _parse_int_env("DEFAULT_TEAM_ID")
+def _preload_modules() -> None:
+    for name in _PRELOAD_MODULES:
+        try:
+            importlib.import_module(name, __package__)
+        except ImportError as exc:  # 先読みの失敗はコマンド実行時に改めて報告される
+            logger.warning("%s の先読みに失敗しました: %s", name, exc)
 
 
 class ESCLDiscordBot(commands.Bot):
+    """
+    ESCL 用の Discord Bot。
+
+    ESCL クライアントやストアは最初に使われたときに作る（cached_property）。
+    モジュールの import だけでは通信クライアントも SQLite も開かない。
+    """
+
     def __init__(self) -> None:
         intents = discord.Intents.default()
         intents.message_content = False
         super().__init__(command_prefix="!", intents=intents)
         self.allowed_mentions = AllowedMentions.none()
         self.jst = JST
-        self.team_store = TeamStore(TEAM_STORE_PATH, default_team_id=DEFAULT_TEAM_ID)
-        self.escl_client = ESCLApiClient(lambda: os.getenv("ESCL_JWT"))
-        self.entry_scheduler = EntryScheduler(self.escl_client, timezone=JST)
+        self._preload: Optional[asyncio.Task[None]] = None
+        # 同じ URL の出力コマンドが同時に来たら（スクリム終了直後など）取得・生成は 1 回にまとめる
+        self.flights = SingleFlight()
+
+    @cached_property
+    def team_store(self) -> TeamStore:
+        return TeamStore(TEAM_STORE_PATH, default_team_id=_parse_int_env("DEFAULT_TEAM_ID"))
+
+    @cached_property
+    def escl_client(self) -> ESCLApiClient:
+        from .escl_api import ESCLApiClient
+
+        return ESCLApiClient(lambda: os.getenv("ESCL_JWT"), governor=self.rate_limiter)
+
+    @cached_property
+    def entry_scheduler(self) -> EntryScheduler:
+        from .entry_scheduler import EntryScheduler
+        from .rate_limit import RetryPolicy
+
+        # 予約は data/escl/entry_journal.sqlite3 に記録し、再起動しても失われないようにする。
+        # 送信の ESCL_ENTRY_WARMUP 秒前（既定 5）に接続を張り、サーバーの時計に合わせて送る（0 で無効）
+        warmup = _parse_int_env("ESCL_ENTRY_WARMUP")
+        # ESCL_ENTRY_HEDGE_MS を指定すると、その時間で答えの無い応募をもう 1 本送る（未指定なら送らない）
+        hedge_ms = _parse_int_env("ESCL_ENTRY_HEDGE_MS")
+        return EntryScheduler(
+            self.escl_client,
+            timezone=JST,
+            journal=self.entry_journal,
+            warmup_lead=float(max(warmup, 0)) if warmup is not None else DEFAULT_ENTRY_WARMUP,
+            retry_policy=RetryPolicy(),
+            governor=self.rate_limiter,
+            hedge_after=hedge_ms / 1000.0 if hedge_ms is not None and hedge_ms > 0 else None,
+        )
+
+    @cached_property
+    def rate_limiter(self) -> RateLimitGovernor:
+        from .rate_limit import RateLimitGovernor
+
+        # 応募と集計の取得は同じ ESCL に送るので 1 つで調停し、応募の前後は集計の取得を止める
+        return RateLimitGovernor()
+
+    @cached_property
+    def entry_journal(self) -> EntryJournal:
+        from .entry_journal import EntryJournal
+
+        return EntryJournal(ENTRY_JOURNAL_PATH)
+
+    @cached_property
+    def public_client(self) -> ESCLPublicApiClient:
+        from .bucket_archive import BucketArchive
+        from .public_api import ESCLPublicApiClient
+
+        # 取得した bucket は data/escl/archive に保存し、CLI の --offline で再生できるようにする
+        return ESCLPublicApiClient(archive=BucketArchive(ARCHIVE_DIR), governor=self.rate_limiter)
+
+    @cached_property
+    def season_store(self) -> SeasonStore:
+        from .season_store import SeasonStore
+
+        # 出力したグループはシーズン集計（data/escl/season.sqlite3）に取り込む
+        return SeasonStore(SEASON_DB_PATH)
+
+    @cached_property
+    def artifact_cache(self) -> ArtifactCache:
+        from .artifact_cache import ArtifactCache
+
+        # 生成済みファイルは bucket の content hash ごとに data/escl/artifacts に残し、再出力では作り直さない
+        return ArtifactCache(DEFAULT_ARTIFACT_DIR)
+
+    @cached_property
+    def report_pool(self) -> ReportPool:
+        from .report_pool import DEFAULT_REPORT_QUEUE, DEFAULT_REPORT_WORKERS, ReportPool
+
+        # 抽出・集計・ブックの書き出しは別プロセスで行い、heartbeat や応募予約の発火を遅らせない。
+        # ESCL_REPORT_WORKERS=0 のときは同じプロセスのスレッドで実行する
+        workers = _parse_int_env("ESCL_REPORT_WORKERS")
+        queue = _parse_int_env("ESCL_REPORT_QUEUE")
+        return ReportPool(
+            max(workers, 1) if workers is not None else DEFAULT_REPORT_WORKERS,
+            max_queue=max(queue, 0) if queue is not None else DEFAULT_REPORT_QUEUE,
+            processes=workers != 0,
+        )
+
+    def _created(self, name: str) -> bool:
+        return name in self.__dict__
 
     async def setup_hook(self) -> None:
+        self._preload = asyncio.create_task(asyncio.to_thread(_preload_modules))
         try:
             await self.team_store.load()
         except TeamStoreError as exc:
             logger.error("TeamStore のロードに失敗しました: %s", exc)
             raise
         logger.info("TeamStore を初期化しました。")
+        if ENTRY_JOURNAL_PATH.exists():
+            await self._restore_entry_jobs()
+
+    async def _restore_entry_jobs(self) -> None:
+        from .commands.entry_handler import RestoredEntryNotifier
+        from .entry_journal import EntryJournalError
+
+        try:
+            await self.entry_scheduler.rehydrate(lambda meta, context: RestoredEntryNotifier.hooks(self, meta, context))
+        except EntryJournalError as exc:
+            logger.error("応募予約の復元に失敗しました: %s", exc)
 
     async def close(self) -> None:
-        await self.entry_scheduler.shutdown()
-        await self.escl_client.aclose()
+        if self._created("entry_scheduler"):
+            # 各ジョブの進捗表示を送り切るまで待つ（super().close() の後では Discord に送れない）
+            await self.entry_scheduler.shutdown()
+        if self._created("entry_journal"):
+            self.entry_journal.close()
+        if self._created("escl_client"):
+            if self.escl_client.hedge_stats.requests:
+                logger.info("CreateApplication のヘッジ: %s", self.escl_client.hedge_stats)
+            await self.escl_client.aclose()
+        if self._created("public_client"):
+            await self.public_client.aclose()
+        if self._created("season_store"):
+            self.season_store.close()
+        if self._created("report_pool"):
+            self.report_pool.shutdown(wait=False, cancel_futures=True)
+        if self._created("rate_limiter"):
+            logger.info("ESCL への送信の調停: %s", self.rate_limiter.snapshot())
         await super().close()
 
 BOT = ESCLDiscordBot()
 
-GUILD_ID_STR = os.getenv("GUILD_ID")
-GUILD_OBJ = discord.Object(id=int(GUILD_ID_STR)) if (GUILD_ID_STR and GUILD_ID_STR.isdigit()) else None
 
-def _df_to_discord_file(df: pd.DataFrame, filename: str) -> discord.File:
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    data = io.BytesIO(buf.getvalue().encode("utf-8"))
-    return discord.File(data, filename=filename)
+def _guild_object() -> Optional[discord.Object]:
+    guild_id = os.getenv("GUILD_ID")
+    return discord.Object(id=int(guild_id)) if (guild_id and guild_id.isdigit()) else None
+
+
+async def _absorb_season(scrim_uuid: str, groups: list[tuple[str, pd.DataFrame]]) -> None:
+    """出力したグループをシーズン集計に取り込む。失敗しても出力自体は続ける。"""
+    from .season_store import SeasonStoreError
+
+    for group_uuid, df in groups:
+        try:
+            await asyncio.to_thread(BOT.season_store.ingest, df, scrim_uuid=scrim_uuid, group_uuid=group_uuid)
+        except SeasonStoreError as exc:
+            logger.warning("シーズン集計への取り込みに失敗しました: %s/%s (%s)", scrim_uuid, group_uuid, exc)
+
+
+async def _needs_season(scrim_uuid: str, group_uuid: str) -> bool:
+    """このグループがまだシーズン集計に入っていないか（成果物をキャッシュから返すときに生データが要るか）。"""
+    from .season_store import SeasonStoreError
+
+    try:
+        return not await asyncio.to_thread(BOT.season_store.has_ingest, scrim_uuid, group_uuid)
+    except SeasonStoreError:
+        return True
+
+
+async def _group_artifact(parent_url: str, group: str, fmt: str) -> tuple[str, bytes]:
+    """1 グループ分の成果物を作り（同じ内容の bucket から作ったものがあれば使い回し）、(ファイル名, 中身) を返す。"""
+    from .api_scraper import parse_scrim_group_from_url
+
+    scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
+    key = ("group", scrim_uuid, group_uuid, group, fmt)
+    return await BOT.flights.do(key, lambda: _build_group_artifact(scrim_uuid, group_uuid, group, fmt))
+
+
+async def _build_group_artifact(scrim_uuid: str, group_uuid: str, group: str, fmt: str) -> tuple[str, bytes]:
+    from .artifact_cache import export_group_artifact
+
+    artifact = await export_group_artifact(
+        BOT.public_client,
+        BOT.artifact_cache,
+        scrim_uuid=scrim_uuid,
+        group_uuid=group_uuid,
+        group_label=group,
+        fmt=fmt,
+        need_frame=await _needs_season(scrim_uuid, group_uuid),
+        executor=BOT.report_pool,
+    )
+    if artifact.frame is not None:
+        await _absorb_season(scrim_uuid, [(group_uuid, artifact.frame)])
+    scrim_name = await BOT.public_client.get_scrim_name(scrim_uuid, group_uuid) or "ESCL_Scrim"
+    return f"{_group_title(scrim_name, group)}{FILE_EXTENSIONS[fmt]}", artifact.data
+
+
+def _group_title(scrim_name: str, group: str) -> str:
+    from .reports import safe_filename_component
+
+    return f"{safe_filename_component(scrim_name)}_{safe_filename_component(group)}".rstrip("_")
+
+
+async def _build_scrim_artifact(urls: list[str], fmt: str) -> tuple[ScrimExport, bytes]:
+    from .artifact_cache import export_scrim_artifact
+
+    # 全グループの bucket が前回と同じなら、シーズン集計に未取り込みのグループ以外は抽出しない
+    artifact = await export_scrim_artifact(
+        BOT.public_client,
+        BOT.artifact_cache,
+        urls,
+        fmt,
+        need_frame=_needs_season,
+        executor=BOT.report_pool,
+    )
+    export = artifact.export
+    await _absorb_season(
+        export.scrim_uuid, [(group.group_uuid, group.df) for group in export.groups if group.df is not None]
+    )
+    return export, artifact.data
+
+
+# 出力形式の選択肢（parquet / arrow は型付きの列のまま出力。pyarrow が必要）
+_RAW_FORMAT_CHOICES = [
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="Parquet", value="parquet"),
+    app_commands.Choice(name="Arrow IPC", value="arrow"),
+]
+_SCRIM_FORMAT_CHOICES = [
+    app_commands.Choice(name="Excel", value="xlsx"),
+    app_commands.Choice(name="Parquet（全グループの生データ）", value="parquet"),
+    app_commands.Choice(name="Arrow IPC（全グループの生データ）", value="arrow"),
+]
 
 
 # ===== Commands =====
@@ -97,23 +316,32 @@ async def version(inter: discord.Interaction):
 
 
 @BOT.tree.command(name="escl_from_parent_csv", description="グループURL1本からAPI直叩きで6試合CSV（生データALL_GAMES相当）")
-@app_commands.describe(parent_url="グループページURL（/scrims/<scrim>/<group>）", group="例: G5, G8 など（任意）")
-async def escl_from_parent_csv(inter: discord.Interaction, parent_url: str, group: Optional[str] = None):
+@app_commands.describe(
+    parent_url="グループページURL（/scrims/<scrim>/<group>）",
+    group="例: G5, G8 など（任意）",
+    format="出力形式（既定: CSV）",
+)
+@app_commands.choices(format=_RAW_FORMAT_CHOICES)
+async def escl_from_parent_csv(
+    inter: discord.Interaction,
+    parent_url: str,
+    group: Optional[str] = None,
+    format: Optional[app_commands.Choice[str]] = None,
+):
+    fmt = format.value if format else "csv"
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        await inter.response.send_message(f"{fmt} 出力には pyarrow が必要です。", ephemeral=True)
+        return
     await inter.response.defer(thinking=True, ephemeral=False)
     try:
-        df_all = await asyncio.to_thread(collect_csv_from_parent_url, parent_url, (group or ""), 6)
+        fname, data = await _group_artifact(parent_url, group or "", fmt)
     except Exception as e:
         await inter.followup.send(f"取得に失敗しました: {e}")
         return
 
-    scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
-    scrim_name = get_scrim_name(scrim_uuid, group_uuid) or "ESCL_Scrim"
-    title = f"{safe_filename_component(scrim_name)}_{safe_filename_component(group or '')}".rstrip("_")
-    fname = f"{title}.csv"
-
     await inter.followup.send(
-        content="API直叩きでCSVを生成しました。（生データALL_GAMES相当）",
-        file=_df_to_discord_file(df_all, fname),
+        content=f"API直叩きで{fmt.upper()}を生成しました。（生データALL_GAMES相当）",
+        file=discord.File(fp=io.BytesIO(data), filename=fname),
     )
 
 @BOT.tree.command(name="escl_from_parent_xlsx", description="API直叩きでExcel（GAME1..6=生データ、ALL_GAMES=生データ、TEAM_TOTALS=チーム合計）")
@@ -121,48 +349,86 @@ async def escl_from_parent_csv(inter: discord.Interaction, parent_url: str, grou
 async def escl_from_parent_xlsx(inter: discord.Interaction, parent_url: str, group: Optional[str] = None):
     await inter.response.defer(thinking=True, ephemeral=False)
     try:
-        df_all = await asyncio.to_thread(collect_csv_from_parent_url, parent_url, (group or ""), 6)
+        # GAME1..6=生データ / ALL_GAMES=プレイヤー合計 / TEAM_TOTALS=チーム合計（CLI と同じブック）
+        fname, data = await _group_artifact(parent_url, group or "", "xlsx")
     except Exception as e:
         await inter.followup.send(f"取得に失敗しました: {e}")
         return
 
-    # 集計テーブル
-    team_totals = aggregate_team_totals(df_all)
+    await inter.followup.send(
+        content=f"Excelを生成しました。（{__BOT_VERSION__} / ALL_GAMES=生データ / TEAM_TOTALS=チーム合計）",
+        file=discord.File(fp=io.BytesIO(data), filename=fname),
+    )
+
+@BOT.tree.command(name="escl_scrim_xlsx", description="同じスクラムの複数グループURLを並行取得し、1冊のExcel（グループ別シート＋全体集計）にまとめる")
+@app_commands.describe(
+    group_urls="グループページURL（/scrims/<scrim>/<group>）を空白・改行・カンマ区切りで複数指定",
+    format="出力形式（既定: Excel）",
+)
+@app_commands.choices(format=_SCRIM_FORMAT_CHOICES)
+async def escl_scrim_xlsx(
+    inter: discord.Interaction,
+    group_urls: str,
+    format: Optional[app_commands.Choice[str]] = None,
+):
+    fmt = format.value if format else "xlsx"
+    if fmt in COLUMNAR_FORMATS and not columnar_available():
+        await inter.response.send_message(f"{fmt} 出力には pyarrow が必要です。", ephemeral=True)
+        return
+    from .scrim_export import scrim_export_filename, split_group_urls
 
-    mem = io.BytesIO()
-    with pd.ExcelWriter(mem, engine="xlsxwriter") as writer:
-        # 各試合シート（RAW）
-        for g in sorted(set(df_all["game"].dropna().astype(int))):
-            dfg = df_all[df_all["game"] == g]
-            dfg.to_excel(writer, sheet_name=f"GAME{g}", index=False)
+    await inter.response.defer(thinking=True, ephemeral=False)
+    try:
+        urls = split_group_urls(group_urls)
+        key = ("scrim", tuple(sorted(set(urls))), fmt)
+        export, data = await BOT.flights.do(key, lambda: _build_scrim_artifact(urls, fmt))
+    except Exception as e:
+        await inter.followup.send(f"取得に失敗しました: {e}")
+        return
 
-        # プレイヤー合計（6試合分）
-        player_totals = aggregate_player_totals(df_all)
-        player_totals.to_excel(writer, sheet_name="ALL_GAMES", index=False)
+    labels = ", ".join(group.label for group in export.groups)
+    if fmt == "xlsx":
+        content = f"Excelを生成しました。（{labels} / ALL_GAMES=全グループのプレイヤー合計 / TEAM_TOTALS=全グループのチーム合計）"
+    else:
+        content = f"{fmt.upper()}を生成しました。（{labels} / 全グループの生データ・group 列で区別）"
+    warnings = export.warnings()
+    if warnings:
+        content += "\n" + "\n".join(f"⚠ {w}" for w in warnings)
+    content = content[:1900]  # Discord のメッセージ上限（2000 文字）に収める
 
-        # 新要件：チーム合計
-        team_totals.to_excel(writer, sheet_name="TEAM_TOTALS", index=False)
+    await inter.followup.send(
+        content=content,
+        file=discord.File(fp=io.BytesIO(data), filename=scrim_export_filename(export, FILE_EXTENSIONS[fmt])),
+    )
 
-    mem.seek(0)
+@BOT.tree.command(name="escl_season_xlsx", description="これまでに出力したスクラムのシーズン通算集計をExcelで出力（SEASON_PLAYERS / SEASON_TEAMS）")
+async def escl_season_xlsx(inter: discord.Interaction):
+    from .season_store import build_season_xlsx
 
-    scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
-    scrim_name = get_scrim_name(scrim_uuid, group_uuid) or "ESCL_Scrim"
-    title = f"{safe_filename_component(scrim_name)}_{safe_filename_component(group or '')}".rstrip("_")
-    fname = f"{title}.xlsx"
+    await inter.response.defer(thinking=True, ephemeral=False)
+    try:
+        standings = await asyncio.to_thread(BOT.season_store.standings)
+        groups = len(await asyncio.to_thread(BOT.season_store.ingests))
+        loop = asyncio.get_running_loop()
+        xlsx_bytes = await loop.run_in_executor(BOT.report_pool, build_season_xlsx, standings)
+    except Exception as e:
+        await inter.followup.send(f"シーズン集計の出力に失敗しました: {e}")
+        return
 
     await inter.followup.send(
-        content=f"Excelを生成しました。（{__BOT_VERSION__} / ALL_GAMES=生データ / TEAM_TOTALS=チーム合計）",
-        file=discord.File(fp=mem, filename=fname),
+        content=f"シーズン通算集計を出力しました。（取り込み済み {groups} グループ）",
+        file=discord.File(fp=io.BytesIO(xlsx_bytes), filename="ESCL_Season.xlsx"),
     )
 
 # ===== Sync & Run =====
 @BOT.event
 async def on_ready():
     print(f"Booting {__BOT_VERSION__} ...")
-    if GUILD_OBJ is not None:
-        BOT.tree.copy_global_to(guild=GUILD_OBJ)
-        cmds = await BOT.tree.sync(guild=GUILD_OBJ)
-        print(f"Guild sync -> {GUILD_OBJ.id}, count={len(cmds)}")
+    guild = _guild_object()
+    if guild is not None:
+        BOT.tree.copy_global_to(guild=guild)
+        cmds = await BOT.tree.sync(guild=guild)
+        print(f"Guild sync -> {guild.id}, count={len(cmds)}")
         BOT.tree.clear_commands(guild=None)
         await BOT.tree.sync(guild=None)
         print("Global commands cleared.")
@@ -171,6 +437,9 @@ async def on_ready():
         print(f"Global sync (no GUILD_ID). count={len(cmds)}")
 
 def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
     token = os.getenv("DISCORD_TOKEN")
     if not token:
         raise SystemExit("DISCORD_TOKEN が設定されていません（.env を確認）")
@@ -0,0 +1,165 @@
+"""Content-addressed, compressed local archive of raw ESCL public API responses."""
+from __future__ import annotations
+
+import contextlib
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+
+from .cache import content_hash
+from .defaults import DEFAULT_ARCHIVE_DIR
+from .escl_api import ESCLAPIError
+
+__all__ = [
+    "ArchiveEntry",
+    "BucketArchive",
+    "BucketArchiveMiss",
+    "DEFAULT_ARCHIVE_DIR",
+]
+
+INDEX_FILENAME = "index.jsonl"
+
+
+class BucketArchiveMiss(ESCLAPIError):
+    """オフライン再生でアーカイブに該当する応答が無い。"""
+
+
+@dataclass(slots=True)
+class ArchiveEntry:
+    endpoint: str
+    scrim_uuid: str
+    group_uuid: str
+    fetched_at: float
+    hash: str
+    size: int
+    key: str = ""
+
+
+class BucketArchive:
+    """
+    取得した応答本文を sha256 で重複排除して gzip 保存し、index.jsonl に取得記録を追記する。
+
+    root/
+      index.jsonl                     1 行 1 取得（endpoint / scrim / group / fetched_at / hash）
+      objects/ab/abcdef....json.gz    応答本文（GetBucket なら value が JSON 文字列のまま）
+
+    同じ内容を何度取得しても本体は 1 つだけで、index に取得時刻だけが増える。
+    """
+
+    def __init__(
+        self,
+        root: Union[str, Path] = DEFAULT_ARCHIVE_DIR,
+        *,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._root = Path(root)
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[Tuple[str, str, str], ArchiveEntry]] = None
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def index_path(self) -> Path:
+        return self._root / INDEX_FILENAME
+
+    def object_path(self, digest: str) -> Path:
+        return self._root / "objects" / digest[:2] / f"{digest}.json.gz"
+
+    def put(
+        self,
+        endpoint: str,
+        body: bytes,
+        *,
+        scrim_uuid: str = "",
+        group_uuid: str = "",
+        key: str = "",
+        digest: Optional[str] = None,
+    ) -> ArchiveEntry:
+        digest = digest or content_hash(body)
+        entry = ArchiveEntry(
+            endpoint=endpoint,
+            scrim_uuid=scrim_uuid,
+            group_uuid=group_uuid,
+            fetched_at=self._clock(),
+            hash=digest,
+            size=len(body),
+            key=key,
+        )
+        with self._lock:
+            path = self.object_path(digest)
+            if not path.exists():
+                _atomic_write(path, gzip.compress(body, mtime=0))
+            self._root.mkdir(parents=True, exist_ok=True)
+            with self.index_path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+            if self._latest is not None:
+                self._latest[_coords(entry)] = entry
+        return entry
+
+    def read(self, digest: str) -> bytes:
+        try:
+            return gzip.decompress(self.object_path(digest).read_bytes())
+        except FileNotFoundError as exc:
+            raise BucketArchiveMiss(f"アーカイブに本体がありません: {digest}") from exc
+
+    def latest(self, endpoint: str, *, scrim_uuid: str = "", group_uuid: str = "") -> Optional[ArchiveEntry]:
+        with self._lock:
+            if self._latest is None:
+                self._latest = self._load_index()
+            return self._latest.get((endpoint, scrim_uuid, group_uuid))
+
+    def load(self, endpoint: str, *, scrim_uuid: str = "", group_uuid: str = "") -> bytes:
+        """最後に取得した応答本文を返す。無ければ BucketArchiveMiss。"""
+        entry = self.latest(endpoint, scrim_uuid=scrim_uuid, group_uuid=group_uuid)
+        if entry is None:
+            target = "/".join(part for part in (scrim_uuid, group_uuid) if part)
+            raise BucketArchiveMiss(f"アーカイブに未保存です: {endpoint} {target}")
+        return self.read(entry.hash)
+
+    def entries(self) -> Iterator[ArchiveEntry]:
+        """index の全記録（古い順）。"""
+        if not self.index_path.exists():
+            return
+        with self.index_path.open(encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield ArchiveEntry(**json.loads(line))
+                except (TypeError, ValueError):
+                    continue  # 書きかけの行などは読み飛ばす
+
+    def _load_index(self) -> Dict[Tuple[str, str, str], ArchiveEntry]:
+        latest: Dict[Tuple[str, str, str], ArchiveEntry] = {}
+        for entry in self.entries():
+            current = latest.get(_coords(entry))
+            if current is None or entry.fetched_at >= current.fetched_at:
+                latest[_coords(entry)] = entry
+        return latest
+
+
+def _coords(entry: ArchiveEntry) -> Tuple[str, str, str]:
+    return (entry.endpoint, entry.scrim_uuid, entry.group_uuid)
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
@@ -0,0 +1,227 @@
+"""Single-pass decoding of GetBucket payloads whose ``value`` is an embedded JSON string."""
+from __future__ import annotations
+
+import json
+import re
+from json.decoder import scanstring
+from typing import Any, Dict, Generator, Iterator, Optional, Tuple, Union
+
+__all__ = [
+    "GAMES_KEYS",
+    "BucketDecodeError",
+    "BucketPayload",
+    "decode_bucket_payload",
+]
+
+# bucket 直下で games 配列として扱うキー（api_scraper.GAMES_SPEC と共有）
+GAMES_KEYS = ("games", "matches", "rounds")
+_GAMES_KEYS_LOWER = frozenset(key.lower() for key in GAMES_KEYS)
+
+_WS = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class BucketDecodeError(ValueError):
+    """GetBucket の応答 / value 文字列が JSON として読めない。"""
+
+
+def _skip(s: str, idx: int) -> int:
+    return _WS.match(s, idx).end()  # type: ignore[union-attr]
+
+
+def _expect(s: str, idx: int, char: str) -> int:
+    if s[idx:idx + 1] != char:
+        raise BucketDecodeError(f"{char!r} が必要です (pos={idx})")
+    return idx + 1
+
+
+def _read_key(s: str, idx: int) -> Tuple[str, int]:
+    """object のキーと ':' を読み、値の開始位置を返す。"""
+    try:
+        key, idx = scanstring(s, _expect(s, idx, '"'))
+    except json.JSONDecodeError as exc:
+        raise BucketDecodeError(str(exc)) from exc
+    return key, _skip(s, _expect(s, _skip(s, idx), ":"))
+
+
+def _iter_array(s: str, idx: int) -> Generator[Any, None, int]:
+    """s[idx] の '[' から要素を 1 つずつデコードして返し、最後に ']' の直後の位置を返す。"""
+    idx = _skip(s, _expect(s, idx, "["))
+    if s[idx:idx + 1] == "]":
+        return idx + 1
+    while True:
+        try:
+            item, idx = _DECODER.raw_decode(s, idx)
+        except json.JSONDecodeError as exc:
+            raise BucketDecodeError(str(exc)) from exc
+        yield item
+        idx = _skip(s, idx)
+        char = s[idx:idx + 1]
+        if char == ",":
+            idx = _skip(s, idx + 1)
+        elif char == "]":
+            return idx + 1
+        else:
+            raise BucketDecodeError(f"配列の区切りが不正です (pos={idx})")
+
+
+def _scan_object(
+    s: str,
+    header: Dict[str, Any],
+    state: Dict[str, Any],
+) -> Generator[Any, None, None]:
+    """
+    トップレベル object を 1 回だけ走査する。
+
+    games 候補キーの配列に当たったら要素（= 1 試合）ごとに yield し、
+    それ以外のメンバーは header に入れる。全体を dict にまとめることはしない。
+    """
+    idx = _skip(s, 0)
+    idx = _skip(s, _expect(s, idx, "{"))
+    if s[idx:idx + 1] == "}":
+        return
+    while True:
+        key, idx = _read_key(s, idx)
+        if (
+            "games_key" not in state
+            and s[idx:idx + 1] == "["
+            and key.lower() in _GAMES_KEYS_LOWER
+        ):
+            state["games_key"] = key
+            idx = yield from _iter_array(s, idx)
+        else:
+            try:
+                header[key], idx = _DECODER.raw_decode(s, idx)
+            except json.JSONDecodeError as exc:
+                raise BucketDecodeError(str(exc)) from exc
+        idx = _skip(s, idx)
+        char = s[idx:idx + 1]
+        if char == ",":
+            idx = _skip(s, idx + 1)
+        elif char == "}":
+            return
+        else:
+            raise BucketDecodeError(f"object の区切りが不正です (pos={idx})")
+
+
+class BucketPayload:
+    """
+    GetBucket の value を文字列のまま保持し、必要な分だけデコードする。
+
+    - iter_games() は games 配列を 1 試合ずつデコードして返す（bucket 全体の dict は作らない）
+    - header は games 以外のトップレベル項目（group_num など）
+    - to_dict() は従来どおりの dict が必要な呼び出し元向け（初回だけ全体をパースして保持する）
+    """
+
+    __slots__ = ("_text", "_obj", "_header")
+
+    def __init__(self, text: Optional[str] = None, obj: Any = None) -> None:
+        self._text = text
+        self._obj = obj
+        self._header: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_object(cls, obj: Any) -> "BucketPayload":
+        return cls(obj=obj)
+
+    @property
+    def size(self) -> int:
+        return len(self._text) if self._text is not None else 0
+
+    @property
+    def is_object(self) -> bool:
+        if self._text is None:
+            return isinstance(self._obj, dict)
+        idx = _skip(self._text, 0)
+        return self._text[idx:idx + 1] == "{"
+
+    def to_dict(self) -> Any:
+        if self._obj is None and self._text is not None:
+            try:
+                self._obj = json.loads(self._text)
+            except json.JSONDecodeError as exc:
+                raise BucketDecodeError(str(exc)) from exc
+        return self._obj
+
+    def iter_games(self) -> Iterator[Any]:
+        """games 配列の要素を順に返す。games が無ければ RuntimeError。"""
+        if self._text is None or self._obj is not None:
+            yield from self._games_from_object()
+            return
+
+        header: Dict[str, Any] = {}
+        state: Dict[str, Any] = {}
+        for game in _scan_object(self._text, header, state):
+            yield game
+        # 最後まで読み切ったときだけ header を確定させる（途中で止めた場合は未確定のまま）
+        self._header = header
+        if "games_key" not in state:
+            raise RuntimeError("bucket 内に games 配列が見つかりません")
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        if self._header is None:
+            if self._text is None or self._obj is not None:
+                obj = self._obj if isinstance(self._obj, dict) else {}
+                games_key = self._find_games_key(obj)
+                self._header = {k: v for k, v in obj.items() if k != games_key}
+            elif not self.is_object:
+                self._header = {}
+            else:
+                try:
+                    for _ in self.iter_games():
+                        pass  # 試合は読み捨てる（保持するのは 1 試合分だけ）
+                except RuntimeError:
+                    pass
+        return self._header if self._header is not None else {}
+
+    def _games_from_object(self) -> Iterator[Any]:
+        obj = self._obj
+        games_key = self._find_games_key(obj) if isinstance(obj, dict) else None
+        if games_key is None:
+            raise RuntimeError("bucket 内に games 配列が見つかりません")
+        yield from obj[games_key]
+
+    @staticmethod
+    def _find_games_key(obj: Dict[str, Any]) -> Optional[str]:
+        lower = {str(key).lower(): key for key in obj}
+        for candidate in GAMES_KEYS:
+            key = lower.get(candidate)
+            if key is not None and isinstance(obj[key], list):
+                return key
+        return None
+
+
+def decode_bucket_payload(raw: Union[bytes, str]) -> Optional[BucketPayload]:
+    """
+    GetBucket の応答本文から value を 1 回の走査で取り出す。
+
+    応答全体を dict にしてから value 文字列を json.loads し直すのではなく、
+    外側は value の位置まで読み進めて文字列をそのまま取り出し、中身は iter_games() で
+    1 試合ずつデコードする。value が無ければ None。
+    """
+    s = raw.decode("utf-8") if isinstance(raw, (bytes, bytearray)) else raw
+    try:
+        idx = _skip(s, 0)
+        idx = _skip(s, _expect(s, idx, "{"))
+        if s[idx:idx + 1] == "}":
+            return None
+        while True:
+            key, idx = _read_key(s, idx)
+            if key == "value":
+                if s[idx:idx + 1] == '"':
+                    text, _ = scanstring(s, idx + 1)
+                    return BucketPayload(text)
+                value, _ = _DECODER.raw_decode(s, idx)
+                return None if value is None else BucketPayload.from_object(value)
+            _, idx = _DECODER.raw_decode(s, idx)
+            idx = _skip(s, idx)
+            char = s[idx:idx + 1]
+            if char == ",":
+                idx = _skip(s, idx + 1)
+            elif char == "}":
+                return None
+            else:
+                raise BucketDecodeError(f"object の区切りが不正です (pos={idx})")
+    except json.JSONDecodeError as exc:
+        raise BucketDecodeError(str(exc)) from exc
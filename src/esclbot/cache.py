@@ -0,0 +1,193 @@
+"""In-memory TTL + LRU cache shared by the ESCL public API client."""
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+__all__ = [
+    "CacheEntry",
+    "CacheStats",
+    "TTLCache",
+    "content_hash",
+]
+
+V = TypeVar("V")
+
+
+def content_hash(data: bytes) -> str:
+    """Return the hex digest used to detect unchanged payloads."""
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass(slots=True)
+class CacheEntry(Generic[V]):
+    value: V
+    content_hash: Optional[str]
+    etag: Optional[str]
+    size: int
+    stored_at: float
+    expires_at: float
+    pinned: bool = False
+
+    def is_fresh(self, now: float) -> bool:
+        return self.pinned or now < self.expires_at
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    revalidated: int = 0
+    evictions: int = 0
+
+
+class TTLCache(Generic[V]):
+    """
+    TTL 付き LRU キャッシュ。
+
+    - get() は期限内（または pin 済み）のエントリだけを返す
+    - peek() は期限切れも返すので、ETag / content hash による再検証に使う
+    - pin 済みエントリ（終了済み Scrim など不変のデータ）は期限切れにならず、
+      容量超過時も未 pin のエントリから先に追い出す
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 60.0,
+        max_entries: int = 256,
+        max_bytes: Optional[int] = None,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        if max_entries <= 0:
+            raise ValueError("max_entries は 1 以上を指定してください。")
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._clock = clock or time.monotonic
+        self._entries: "OrderedDict[str, CacheEntry[V]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self) -> Iterator[str]:
+        return iter(list(self._entries.keys()))
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[CacheEntry[V]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        if not entry.is_fresh(self._clock()):
+            self.stats.stale += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry[V]]:
+        return self._entries.get(key)
+
+    def put(
+        self,
+        key: str,
+        value: V,
+        *,
+        content_hash: Optional[str] = None,
+        etag: Optional[str] = None,
+        size: int = 0,
+        pinned: bool = False,
+        ttl: Optional[float] = None,
+    ) -> CacheEntry[V]:
+        now = self._clock()
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+            pinned = pinned or previous.pinned
+        entry = CacheEntry(
+            value=value,
+            content_hash=content_hash,
+            etag=etag,
+            size=size,
+            stored_at=now,
+            expires_at=now + (self._ttl if ttl is None else ttl),
+            pinned=pinned,
+        )
+        self._entries[key] = entry
+        self._bytes += size
+        self._evict()
+        return entry
+
+    def refresh(self, key: str, *, ttl: Optional[float] = None) -> Optional[CacheEntry[V]]:
+        """再検証で内容が変わっていなかったエントリの期限を延長する。"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = self._clock()
+        entry.stored_at = now
+        entry.expires_at = now + (self._ttl if ttl is None else ttl)
+        self._entries.move_to_end(key)
+        self.stats.revalidated += 1
+        return entry
+
+    def pin(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry.pinned = True
+        return True
+
+    def pin_prefix(self, prefix: str) -> int:
+        count = 0
+        for key, entry in self._entries.items():
+            if key.startswith(prefix) and not entry.pinned:
+                entry.pinned = True
+                count += 1
+        return count
+
+    def invalidate(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "pinned": sum(1 for entry in self._entries.values() if entry.pinned),
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "stale": self.stats.stale,
+            "revalidated": self.stats.revalidated,
+            "evictions": self.stats.evictions,
+        }
+
+    def _over_capacity(self) -> bool:
+        if len(self._entries) > self._max_entries:
+            return True
+        return self._max_bytes is not None and self._bytes > self._max_bytes and len(self._entries) > 1
+
+    def _evict(self) -> None:
+        while self._over_capacity():
+            victim = next((k for k, e in self._entries.items() if not e.pinned), None)
+            if victim is None:
+                victim = next(iter(self._entries))
+            self.invalidate(victim)
+            self.stats.evictions += 1
@@ -2,63 +2,180 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import base64
 import contextlib
 import io
 import json
+import logging
+import os
 import sys
-from typing import Any, Dict, Optional
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
 
-import pandas as pd
+from .columnar import COLUMNAR_FORMATS, FILE_EXTENSIONS, RAW_FORMATS
+from .defaults import DEFAULT_ARCHIVE_DIR, DEFAULT_ARTIFACT_DIR, DEFAULT_MAX_CONCURRENCY, DEFAULT_SEASON_DB
+from .singleflight import SingleFlight
+from .version import __BOT_VERSION__
 
-from .api_scraper import (
-    collect_csv_from_parent_url,
-    get_scrim_name,
-    parse_scrim_group_from_url,
-)
-from .bot import __BOT_VERSION__
-from .reports import (
-    aggregate_player_totals,
-    aggregate_team_totals,
-    safe_filename_component,
-)
+# pandas / httpx / discord.py を読み込むモジュールは、使うコマンドの中で import する
+# （`version` や serve の起動がそれらの読み込みを待たないように）。
+if TYPE_CHECKING:
+    import pandas as pd
 
+    from .artifact_cache import ArtifactCache
+    from .public_api import ESCLPublicApiClient
+    from .scrim_export import ScrimExport
 
-def _title_from_parent(parent_url: str, group: str) -> str:
-    with contextlib.redirect_stdout(io.StringIO()):
-        scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
-    scrim_name = get_scrim_name(scrim_uuid, group_uuid) or "ESCL_Scrim"
-    title = f"{safe_filename_component(scrim_name)}_{safe_filename_component(group)}".rstrip("_")
-    return title or "ESCL_Scrim"
 
+@dataclass(slots=True)
+class ArchiveOptions:
+    """--offline / --archive-dir / --no-archive の指定。"""
+
+    archive_dir: Path = DEFAULT_ARCHIVE_DIR
+    enabled: bool = True
+    offline: bool = False
+
+    def client(self, **kwargs: Any) -> ESCLPublicApiClient:
+        from .bucket_archive import BucketArchive
+        from .public_api import ESCLPublicApiClient
+
+        archive = BucketArchive(self.archive_dir) if (self.enabled or self.offline) else None
+        return ESCLPublicApiClient(archive=archive, offline=self.offline, **kwargs)
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class SeasonOptions:
+    """--season-db / --no-season の指定。"""
+
+    db_path: Path = DEFAULT_SEASON_DB
+    enabled: bool = True
+
+    def absorb(self, scrim_uuid: str, groups: list[Tuple[str, pd.DataFrame]]) -> None:
+        """出力したグループをシーズン集計に取り込む。失敗しても出力自体は続ける。"""
+        if not self.enabled:
+            return
+        from .season_store import SeasonStore, SeasonStoreError
+
+        try:
+            with SeasonStore(self.db_path) as store:
+                for group_uuid, df in groups:
+                    store.ingest(df, scrim_uuid=scrim_uuid, group_uuid=group_uuid)
+        except SeasonStoreError as exc:
+            logger.warning("シーズン集計への取り込みに失敗しました: %s", exc)
+
+    def needs(self, scrim_uuid: str, group_uuid: str) -> bool:
+        """このグループをまだシーズン集計に取り込んでいないか（成果物をキャッシュから返すときの判定）。"""
+        if not self.enabled:
+            return False
+        from .season_store import SeasonStore, SeasonStoreError
 
-def _encode_dataframe_to_csv(df: pd.DataFrame) -> bytes:
-    buf = io.StringIO()
-    df.to_csv(buf, index=False)
-    return buf.getvalue().encode("utf-8")
+        try:
+            with SeasonStore(self.db_path) as store:
+                return not store.has_ingest(scrim_uuid, group_uuid)
+        except SeasonStoreError:
+            return True
 
 
-def _build_xlsx(df_all: pd.DataFrame) -> bytes:
-    mem = io.BytesIO()
-    with pd.ExcelWriter(mem, engine="xlsxwriter") as writer:
-        for g in sorted(set(df_all["game"].dropna().astype(int))):
-            dfg = df_all[df_all["game"] == g]
-            dfg.to_excel(writer, sheet_name=f"GAME{g}", index=False)
+@dataclass(slots=True)
+class ArtifactOptions:
+    """--artifact-dir / --no-artifact-cache の指定。"""
 
-        player_totals = aggregate_player_totals(df_all)
-        player_totals.to_excel(writer, sheet_name="ALL_GAMES", index=False)
+    directory: Path = DEFAULT_ARTIFACT_DIR
+    enabled: bool = True
 
-        team_totals = aggregate_team_totals(df_all)
-        team_totals.to_excel(writer, sheet_name="TEAM_TOTALS", index=False)
 
-    mem.seek(0)
-    return mem.read()
+@dataclass(slots=True)
+class OutputOptions:
+    """--output-dir の指定。"""
 
+    output_dir: Optional[Path] = None
 
-def _collect(parent_url: str, group: str) -> pd.DataFrame:
-    buffer = io.StringIO()
-    with contextlib.redirect_stdout(buffer):
-        return collect_csv_from_parent_url(parent_url, group, 6)
+    def file_fields(self, filename: str, data: bytes) -> Dict[str, Any]:
+        """
+        生成したファイルを応答 JSON のフィールドにする。
+
+        --output-dir があればファイルをそこへ書き、JSON には path / size だけを載せる
+        （base64 で 4/3 倍に膨らんだ本体を標準出力に流さずに済む）。無ければ従来どおり
+        content に base64 で埋め込む。
+        """
+        if self.output_dir is None:
+            return {"filename": filename, "content": base64.b64encode(data).decode("ascii")}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = (self.output_dir / Path(filename).name).resolve()
+        # 書きかけのファイルを呼び出し側に読ませないよう、書き終えてから置き換える
+        partial = path.with_name(f".{path.name}.partial")
+        partial.write_bytes(data)
+        os.replace(partial, path)
+        return {"filename": filename, "path": str(path), "size": len(data)}
+
+
+class ClientPool:
+    """
+    コマンドが使う ESCLPublicApiClient と成果物キャッシュの置き場。
+
+    1 回きりの CLI 実行ではコマンドごとに作って閉じる（成果物キャッシュはディスク層だけが効く）。
+    serve では ArchiveOptions ごとに 1 つを作ってプロセスが終わるまで使い回し、keep-alive 接続・
+    TTLCache・学習済みの GetBucket キー形式・成果物のメモリ層をリクエスト間で持ち越す。
+    flights は同時に届いた同じ出力コマンドを 1 回の処理にまとめる（serve で並行に処理するとき用）。
+    """
+
+    def __init__(self, *, persistent: bool = False, max_connections: int = 10) -> None:
+        self._persistent = persistent
+        self._max_connections = max_connections
+        self.flights = SingleFlight()
+        self._clients: Dict[Tuple[Path, bool, bool], ESCLPublicApiClient] = {}
+        self._artifacts: Dict[Path, ArtifactCache] = {}
+
+    def artifact_cache(self, options: ArtifactOptions) -> Optional[ArtifactCache]:
+        if not options.enabled:
+            return None
+        from .artifact_cache import ArtifactCache
+
+        if not self._persistent:
+            return ArtifactCache(options.directory)
+        cache = self._artifacts.get(options.directory)
+        if cache is None:
+            cache = self._artifacts[options.directory] = ArtifactCache(options.directory)
+        return cache
+
+    @contextlib.asynccontextmanager
+    async def client(self, archive: ArchiveOptions, *, max_connections: int = 10) -> AsyncIterator[ESCLPublicApiClient]:
+        if not self._persistent:
+            async with archive.client(max_connections=max_connections) as client:
+                yield client
+            return
+        key = (archive.archive_dir, archive.enabled, archive.offline)
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = archive.client(max_connections=max(self._max_connections, max_connections))
+        yield client
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+def _parse_parent_url(parent_url: str) -> Tuple[str, str]:
+    from .api_scraper import parse_scrim_group_from_url
+
+    # parse_scrim_group_from_url はデバッグ出力を print するので標準出力（応答 JSON）から隔離する
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_scrim_group_from_url(parent_url)
+
+
+async def _title_from_parent(client: ESCLPublicApiClient, parent_url: str, group: str) -> str:
+    from .reports import safe_filename_component
+
+    scrim_uuid, group_uuid = _parse_parent_url(parent_url)
+    scrim_name = await client.get_scrim_name(scrim_uuid, group_uuid) or "ESCL_Scrim"
+    title = f"{safe_filename_component(scrim_name)}_{safe_filename_component(group)}".rstrip("_")
+    return title or "ESCL_Scrim"
 
 
 def _respond(payload: Dict[str, Any], *, error: bool = False) -> None:
@@ -66,69 +183,415 @@ def _respond(payload: Dict[str, Any], *, error: bool = False) -> None:
     sys.exit(1 if error else 0)
 
 
-def _cmd_version() -> None:
-    _respond({"ok": True, "version": __BOT_VERSION__})
+async def _cmd_version() -> Dict[str, Any]:
+    return {"ok": True, "version": __BOT_VERSION__}
 
 
-def _cmd_csv(parent_url: str, group: Optional[str]) -> None:
-    group_value = group or ""
-    df = _collect(parent_url, group_value)
-    csv_bytes = _encode_dataframe_to_csv(df)
-    title = _title_from_parent(parent_url, group_value)
-    _respond(
-        {
-            "ok": True,
-            "filename": f"{title}.csv",
-            "content": base64.b64encode(csv_bytes).decode("ascii"),
-        }
+async def _cmd_group(
+    pool: ClientPool,
+    parent_url: str,
+    group: Optional[str],
+    archive: ArchiveOptions,
+    season: SeasonOptions,
+    artifacts: ArtifactOptions,
+    output: OutputOptions,
+    fmt: str,
+) -> Dict[str, Any]:
+    """csv / xlsx: 1 グループ分の成果物。同じ内容の bucket から作った成果物があればそれを返す。"""
+    group_label = group or ""
+    scrim_uuid, group_uuid = _parse_parent_url(parent_url)
+    # 出力先（--output-dir）は呼び出しごとに違うので、まとめるのはファイルの中身を作るところまで
+    key = ("group", scrim_uuid, group_uuid, group_label, fmt, astuple(archive), astuple(season), astuple(artifacts))
+    filename, data, cached = await pool.flights.do(
+        key,
+        lambda: _build_group(pool, parent_url, scrim_uuid, group_uuid, group_label, archive, season, artifacts, fmt),
     )
+    return {"ok": True, **output.file_fields(filename, data), "cached": cached}
+
+
+async def _build_group(
+    pool: ClientPool,
+    parent_url: str,
+    scrim_uuid: str,
+    group_uuid: str,
+    group_label: str,
+    archive: ArchiveOptions,
+    season: SeasonOptions,
+    artifacts: ArtifactOptions,
+    fmt: str,
+) -> Tuple[str, bytes, bool]:
+    from .artifact_cache import export_group_artifact
 
+    need_frame = await asyncio.to_thread(season.needs, scrim_uuid, group_uuid)
+    # Bucket 取得と Scrim 名の取得で同じ接続プールを使い回す
+    async with pool.client(archive) as client:
+        artifact = await export_group_artifact(
+            client,
+            pool.artifact_cache(artifacts),
+            scrim_uuid=scrim_uuid,
+            group_uuid=group_uuid,
+            group_label=group_label,
+            fmt=fmt,
+            need_frame=need_frame,
+        )
+        title = await _title_from_parent(client, parent_url, group_label)
+    if artifact.frame is not None:
+        await asyncio.to_thread(season.absorb, scrim_uuid, [(group_uuid, artifact.frame)])
+    return f"{title}{FILE_EXTENSIONS[fmt]}", artifact.data, artifact.cached
 
-def _cmd_xlsx(parent_url: str, group: Optional[str]) -> None:
-    group_value = group or ""
-    df = _collect(parent_url, group_value)
-    xlsx_bytes = _build_xlsx(df)
-    title = _title_from_parent(parent_url, group_value)
-    _respond(
-        {
-            "ok": True,
-            "filename": f"{title}.xlsx",
-            "content": base64.b64encode(xlsx_bytes).decode("ascii"),
-        }
+
+async def _cmd_scrim(
+    pool: ClientPool,
+    parent_urls: list[str],
+    concurrency: int,
+    archive: ArchiveOptions,
+    season: SeasonOptions,
+    artifacts: ArtifactOptions,
+    output: OutputOptions,
+    fmt: str = "xlsx",
+) -> Dict[str, Any]:
+    from .scrim_export import scrim_export_filename
+
+    key = ("scrim", tuple(sorted(set(parent_urls))), fmt, astuple(archive), astuple(season), astuple(artifacts))
+    export, data = await pool.flights.do(
+        key, lambda: _build_scrim(pool, parent_urls, concurrency, archive, season, artifacts, fmt)
     )
+    return {
+        "ok": True,
+        **output.file_fields(scrim_export_filename(export, FILE_EXTENSIONS[fmt]), data),
+        "groups": [group.label for group in export.groups],
+        "warnings": export.warnings(),
+    }
 
 
-def main(argv: Optional[list[str]] = None) -> None:
+async def _build_scrim(
+    pool: ClientPool,
+    parent_urls: list[str],
+    concurrency: int,
+    archive: ArchiveOptions,
+    season: SeasonOptions,
+    artifacts: ArtifactOptions,
+    fmt: str,
+) -> Tuple[ScrimExport, bytes]:
+    from .artifact_cache import export_scrim_artifact
+
+    async def need_frame(scrim_uuid: str, group_uuid: str) -> bool:
+        return await asyncio.to_thread(season.needs, scrim_uuid, group_uuid)
+
+    async with pool.client(archive, max_connections=max(concurrency, 1) * 2) as client:
+        artifact = await export_scrim_artifact(
+            client,
+            pool.artifact_cache(artifacts),
+            parent_urls,
+            fmt,
+            need_frame=need_frame,
+            max_concurrency=concurrency,
+        )
+    export = artifact.export
+    groups = [(group.group_uuid, group.df) for group in export.groups if group.df is not None]
+    await asyncio.to_thread(season.absorb, export.scrim_uuid, groups)
+    return export, artifact.data
+
+
+def _season_workbook(season: SeasonOptions, archive: ArchiveOptions, rebuild: bool) -> Tuple[bytes, int]:
+    from .bucket_archive import BucketArchive
+    from .season_store import SeasonStore, build_season_xlsx, rebuild_from_archive
+
+    with SeasonStore(season.db_path) as store:
+        if rebuild:
+            rebuild_from_archive(store, BucketArchive(archive.archive_dir))
+        standings = store.standings()
+        groups = len(store.ingests())
+    return build_season_xlsx(standings), groups
+
+
+async def _cmd_season(
+    season: SeasonOptions, archive: ArchiveOptions, output: OutputOptions, rebuild: bool
+) -> Dict[str, Any]:
+    data, groups = await asyncio.to_thread(_season_workbook, season, archive, rebuild)
+    return {"ok": True, **output.file_fields("ESCL_Season.xlsx", data), "groups": groups}
+
+
+async def run_command(args: argparse.Namespace, pool: ClientPool) -> Dict[str, Any]:
+    """解析済みの引数で 1 コマンドを実行し、応答 JSON を返す（serve 以外）。"""
+    archive = ArchiveOptions(
+        archive_dir=getattr(args, "archive_dir", DEFAULT_ARCHIVE_DIR),
+        enabled=not getattr(args, "no_archive", False),
+        offline=getattr(args, "offline", False),
+    )
+    season = SeasonOptions(
+        db_path=getattr(args, "season_db", DEFAULT_SEASON_DB),
+        enabled=not getattr(args, "no_season", False),
+    )
+    artifacts = ArtifactOptions(
+        directory=getattr(args, "artifact_dir", DEFAULT_ARTIFACT_DIR),
+        enabled=not getattr(args, "no_artifact_cache", False),
+    )
+    output = OutputOptions(output_dir=getattr(args, "output_dir", None))
+
+    if args.command == "version":
+        return await _cmd_version()
+    if args.command == "csv":
+        return await _cmd_group(pool, args.parent_url, args.group, archive, season, artifacts, output, args.format)
+    if args.command == "xlsx":
+        return await _cmd_group(pool, args.parent_url, args.group, archive, season, artifacts, output, "xlsx")
+    if args.command == "scrim":
+        return await _cmd_scrim(
+            pool, args.parent_urls, args.concurrency, archive, season, artifacts, output, args.format
+        )
+    if args.command == "season":
+        return await _cmd_season(season, archive, output, args.rebuild)
+    raise ValueError(f"unknown command: {args.command}")
+
+
+async def _handle_request(parser: argparse.ArgumentParser, pool: ClientPool, line: bytes) -> Dict[str, Any]:
+    request_id: Any = None
+    try:
+        request = json.loads(line)
+        request_id = request.get("id")
+        argv = request["argv"]
+        if not isinstance(argv, list) or not all(isinstance(arg, str) for arg in argv):
+            raise ValueError("argv は文字列の配列で指定してください。")
+        try:
+            args = parser.parse_args(argv)
+        except SystemExit:
+            raise ValueError(f"引数を解釈できませんでした: {' '.join(argv)}") from None
+        if args.command == "serve":
+            raise ValueError("serve の中で serve は実行できません。")
+        payload = await run_command(args, pool)
+    except Exception as exc:  # noqa: BLE001
+        payload = {"ok": False, "error": str(exc)}
+    return {"id": request_id, **payload}
+
+
+async def serve_lines(
+    reader: asyncio.StreamReader,
+    write: Callable[[bytes], Awaitable[None]],
+    pool: ClientPool,
+) -> None:
+    """
+    JSON Lines のリクエストを読み、届いた順に並行実行して 1 行ずつ応答する。
+
+    リクエストは {"id": ..., "argv": ["csv", "<url>", "--group", "G5"]}、応答は
+    {"id": ..., "ok": ...} に各コマンドの応答 JSON を足したもの。完了順に返すので
+    呼び出し側は id で突き合わせる。reader が EOF になったら実行中の分を待って戻る。
+    """
+    parser = build_parser()
+    tasks: set[asyncio.Task[None]] = set()
+
+    async def handle(line: bytes) -> None:
+        response = await _handle_request(parser, pool, line)
+        await write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    while line := await reader.readline():
+        if not line.strip():
+            continue
+        task = asyncio.create_task(handle(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def _serve_stdio(pool: ClientPool) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    out = sys.stdout.buffer
+    # 応答以外の出力（ライブラリの print など）が応答の行に混ざらないよう stderr へ逃がす
+    sys.stdout = sys.stderr
+
+    async def write(data: bytes) -> None:
+        out.write(data)
+        out.flush()
+
+    await serve_lines(reader, write, pool)
+
+
+async def _serve_socket(pool: ClientPool, socket_path: Path) -> None:
+    async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+
+        async def write(data: bytes) -> None:
+            async with lock:
+                writer.write(data)
+                await writer.drain()
+
+        try:
+            await serve_lines(reader, write, pool)
+        finally:
+            writer.close()
+
+    socket_path.unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(on_connect, path=str(socket_path))
+    logger.info("ESCL worker listening on %s", socket_path)
+    async with server:
+        await server.serve_forever()
+
+
+async def _serve(socket_path: Optional[Path], max_connections: int) -> None:
+    pool = ClientPool(persistent=True, max_connections=max_connections)
+    try:
+        if socket_path is None:
+            await _serve_stdio(pool)
+        else:
+            await _serve_socket(pool, socket_path)
+    finally:
+        await pool.aclose()
+
+
+async def _run_once(args: argparse.Namespace) -> Dict[str, Any]:
+    return await run_command(args, ClientPool())
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="python -m src.esclbot.cli")
     sub = parser.add_subparsers(dest="command", required=True)
 
     sub.add_parser("version", help="ESCL Bot のバージョン情報を表示")
 
-    csv_parser = sub.add_parser(
-        "csv", help="スクラムからCSVを生成（ALL_GAMES相当の生データ）"
+    archive_options = argparse.ArgumentParser(add_help=False)
+    archive_options.add_argument(
+        "--offline",
+        action="store_true",
+        help="ESCL に問い合わせず、アーカイブ済みの応答だけで生成する",
+    )
+    archive_options.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=DEFAULT_ARCHIVE_DIR,
+        help=f"取得した応答を保存するアーカイブ（既定: {DEFAULT_ARCHIVE_DIR}）",
+    )
+    archive_options.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="取得した応答をアーカイブに保存しない",
+    )
+
+    season_options = argparse.ArgumentParser(add_help=False)
+    season_options.add_argument(
+        "--season-db",
+        type=Path,
+        default=DEFAULT_SEASON_DB,
+        help=f"シーズン集計のデータベース（既定: {DEFAULT_SEASON_DB}）",
+    )
+    season_options.add_argument(
+        "--no-season",
+        action="store_true",
+        help="出力したデータをシーズン集計に取り込まない",
+    )
+
+    output_options = argparse.ArgumentParser(add_help=False)
+    output_options.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="生成したファイルをこのディレクトリに書き、JSON には path / size だけを返す（既定: base64 で content に埋め込む）",
+    )
+
+    artifact_options = argparse.ArgumentParser(add_help=False)
+    artifact_options.add_argument(
+        "--artifact-dir",
+        type=Path,
+        default=DEFAULT_ARTIFACT_DIR,
+        help=f"生成済みファイルのキャッシュ（bucket の内容が同じなら作り直さない。既定: {DEFAULT_ARTIFACT_DIR}）",
+    )
+    artifact_options.add_argument(
+        "--no-artifact-cache",
+        action="store_true",
+        help="生成済みファイルのキャッシュを使わない",
     )
+
+    file_parents = [archive_options, season_options, artifact_options, output_options]
+    csv_parser = sub.add_parser("csv", help="スクラムからCSVを生成（ALL_GAMES相当の生データ）", parents=file_parents)
     csv_parser.add_argument("parent_url", help="グループページURL")
     csv_parser.add_argument("--group", default="", help="任意のグループ名（例: G5）")
-
-    xlsx_parser = sub.add_parser(
-        "xlsx", help="スクラムからExcelを生成（ALL_GAMES/TEAM_TOTALS付き）"
+    csv_parser.add_argument(
+        "--format",
+        choices=RAW_FORMATS,
+        default="csv",
+        help="出力形式（parquet / arrow は型付きの列のまま出力。pyarrow が必要）",
     )
+
+    xlsx_parser = sub.add_parser("xlsx", help="スクラムからExcelを生成（ALL_GAMES/TEAM_TOTALS付き）", parents=file_parents)
     xlsx_parser.add_argument("parent_url", help="グループページURL")
     xlsx_parser.add_argument("--group", default="", help="任意のグループ名（例: G5）")
 
-    args = parser.parse_args(argv)
+    scrim_parser = sub.add_parser(
+        "scrim",
+        help="同じスクラムの複数グループを並行取得し、1冊のExcelにまとめる（グループ別シート＋全体集計）",
+        parents=file_parents,
+    )
+    scrim_parser.add_argument("parent_urls", nargs="+", help="グループページURL（同じスクラムのもの）")
+    scrim_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"同時に取得するグループ数の上限（既定: {DEFAULT_MAX_CONCURRENCY}）",
+    )
+    scrim_parser.add_argument(
+        "--format",
+        choices=("xlsx", *COLUMNAR_FORMATS),
+        default="xlsx",
+        help="出力形式（parquet / arrow は全グループの生データを 1 表で出力。pyarrow が必要）",
+    )
+
+    season_parser = sub.add_parser(
+        "season",
+        help="取り込み済みスクリムのシーズン通算集計をExcelで出力（SEASON_PLAYERS/SEASON_TEAMS）",
+        parents=[output_options],
+    )
+    season_parser.add_argument(
+        "--season-db",
+        type=Path,
+        default=DEFAULT_SEASON_DB,
+        help=f"シーズン集計のデータベース（既定: {DEFAULT_SEASON_DB}）",
+    )
+    season_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="アーカイブ済みの GetBucket 応答からシーズン集計を作り直してから出力する",
+    )
+    season_parser.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=DEFAULT_ARCHIVE_DIR,
+        help=f"--rebuild で読むアーカイブ（既定: {DEFAULT_ARCHIVE_DIR}）",
+    )
+
+    serve_parser = sub.add_parser(
+        "serve",
+        help="常駐して JSON Lines のリクエスト（{\"id\": ..., \"argv\": [...]}）を並行に処理する",
+    )
+    serve_parser.add_argument(
+        "--socket",
+        type=Path,
+        default=None,
+        help="標準入出力の代わりにこの Unix ソケットで待ち受ける",
+    )
+    serve_parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=10,
+        help="ESCL への同時接続数の上限（既定: 10）",
+    )
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(_serve(args.socket, args.max_connections))
+        return
 
     try:
-        if args.command == "version":
-            _cmd_version()
-        elif args.command == "csv":
-            _cmd_csv(args.parent_url, args.group)
-        elif args.command == "xlsx":
-            _cmd_xlsx(args.parent_url, args.group)
-        else:
-            raise ValueError(f"unknown command: {args.command}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            payload = asyncio.run(_run_once(args))
     except Exception as exc:  # noqa: BLE001
         _respond({"ok": False, "error": str(exc)}, error=True)
+    _respond(payload)
 
 
 if __name__ == "__main__":
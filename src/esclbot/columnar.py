@@ -0,0 +1,74 @@
+"""Encode raw scrim DataFrames as CSV, Parquet or Arrow IPC files."""
+from __future__ import annotations
+
+import importlib.util
+import io
+from typing import TYPE_CHECKING, Dict, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+__all__ = [
+    "COLUMNAR_FORMATS",
+    "ColumnarUnavailableError",
+    "FILE_EXTENSIONS",
+    "RAW_FORMATS",
+    "columnar_available",
+    "encode_frame",
+]
+
+# 生データの出力形式。parquet / arrow は pyarrow（任意依存・requirements-arrow.txt）が必要。
+RAW_FORMATS: Tuple[str, ...] = ("csv", "parquet", "arrow")
+COLUMNAR_FORMATS: Tuple[str, ...] = ("parquet", "arrow")
+FILE_EXTENSIONS: Dict[str, str] = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "xlsx": ".xlsx"}
+
+# どちらも列ごとに zstd 圧縮する（Arrow IPC は pyarrow / polars / DuckDB からそのまま memory map できる）
+_COMPRESSION = "zstd"
+
+
+class ColumnarUnavailableError(RuntimeError):
+    """pyarrow が入っていないため parquet / arrow を出力できない。"""
+
+
+def columnar_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _require_pyarrow():
+    if not columnar_available():
+        raise ColumnarUnavailableError(
+            "parquet / arrow 出力には pyarrow が必要です（pip install -r requirements-arrow.txt）。"
+        )
+    import pyarrow as pa  # 重いので使うときだけ読み込む
+
+    return pa
+
+
+def _to_table(df: pd.DataFrame):
+    # category は dictionary 型、Int32 は null 付き int32、float64 はそのまま Arrow の型になる
+    pa = _require_pyarrow()
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def encode_frame(df: pd.DataFrame, fmt: str) -> bytes:
+    """df を fmt（csv / parquet / arrow）のファイル内容にする。"""
+    if fmt == "csv":
+        buf = io.StringIO()
+        df.to_csv(buf, index=False)
+        return buf.getvalue().encode("utf-8")
+    if fmt == "parquet":
+        pa = _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        sink = pa.BufferOutputStream()
+        pq.write_table(_to_table(df), sink, compression=_COMPRESSION)
+        return sink.getvalue().to_pybytes()
+    if fmt == "arrow":
+        pa = _require_pyarrow()
+        table = _to_table(df)
+        sink = pa.BufferOutputStream()
+        options = pa.ipc.IpcWriteOptions(compression=_COMPRESSION)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"未対応の出力形式です: {fmt}")
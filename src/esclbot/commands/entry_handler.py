@@ -5,12 +5,13 @@ import logging
 import os
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
-from typing import TYPE_CHECKING, List, Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import discord
 from discord.abc import Messageable
 
-from ..entry_scheduler import EntryJobResult, compute_run_at
+from ..entry_scheduler import EntryJobMetadata, EntryJobResult, compute_run_at
+from ..progress import ProgressReporter
 from ..reports import safe_filename_component
 from ..team_store import TeamStoreError
 
@@ -45,6 +46,8 @@ class EntryCommandHandler:
         self._header_lines: List[str] = []
         self._progress_targets: List[Messageable] = []
         self._root_message: Optional[discord.Message] = None
+        # 進捗はキュー経由で 1 つの状態メッセージにまとめる（応募の送信は Discord を待たない）
+        self._progress: ProgressReporter[discord.Message] = ProgressReporter(self._send_to_targets, _edit_message)
 
     async def execute(
         self,
@@ -99,11 +102,16 @@ class EntryCommandHandler:
                 dispatch_time=params.dispatch_time,
                 log_hook=self.send_progress,
                 result_hook=self._handle_result,
+                # 取り消し・Bot の停止で終わったときも進捗を送り切って閉じる
+                close_hook=self._progress.aclose,
                 now=params.now,
+                # 再起動後に復元したときも同じスレッド / チャンネルへ進捗を送る
+                context={"channel_ids": [target.id for target in self._progress_targets if hasattr(target, "id")]},
             )
         except Exception as exc:  # noqa: BLE001
             logger.error("応募ジョブのスケジュールに失敗しました: %s", exc)
-            await self.send_progress("❌ 応募ジョブの登録に失敗しました。再度お試しください。")
+            self._progress.post_message("❌ 応募ジョブの登録に失敗しました。再度お試しください。")
+            self._progress.close()
             return
 
         self._header_lines.append(f"- ジョブID: `{metadata.job_id}`")
@@ -152,7 +160,8 @@ class EntryCommandHandler:
             )
         except Exception as exc:  # noqa: BLE001
             logger.error("応募の即時送信に失敗しました: %s", exc)
-            await self.send_progress("❌ 応募の送信に失敗しました。再度お試しください。")
+            self._progress.post_message("❌ 応募の送信に失敗しました。再度お試しください。")
+            self._progress.close()
             return
 
         status_text = "成功" if result.ok else "失敗"
@@ -161,17 +170,23 @@ class EntryCommandHandler:
         await self.interaction.edit_original_response(content="\n".join(self._header_lines))
 
     async def send_progress(self, text: str) -> None:
+        """スケジューラの log_hook。状態メッセージに 1 行足してすぐ戻る。"""
+        self._progress.post(text)
+
+    async def _send_to_targets(self, text: str) -> Optional[discord.Message]:
         for target in self._progress_targets:
             try:
-                await target.send(text, allowed_mentions=self.bot.allowed_mentions)
-                return
+                return await target.send(text, allowed_mentions=self.bot.allowed_mentions)
             except discord.HTTPException as exc:
                 logger.warning("進捗メッセージ送信に失敗しました: %s", exc)
 
         logger.warning("進捗メッセージを送信できませんでした: %s", text)
+        return None
 
     async def _handle_result(self, result: EntryJobResult) -> None:
-        await self.send_progress(format_entry_result(result))
+        # 結果は通知が届くよう別の 1 通にする。送り終えたら進捗のタスクも終わる
+        self._progress.post_message(format_entry_result(result))
+        self._progress.close()
 
     async def _validate_and_resolve(
         self,
@@ -294,6 +309,53 @@ class EntryCommandHandler:
             )
 
 
+class RestoredEntryNotifier:
+    """Bot の再起動後に journal から戻した応募ジョブの進捗を、登録時の通知先へ送る。"""
+
+    def __init__(self, bot: "ESCLDiscordBot", meta: EntryJobMetadata, context: Dict[str, Any]) -> None:
+        self.bot = bot
+        self.meta = meta
+        self._channel_ids = [int(cid) for cid in context.get("channel_ids", []) if str(cid).isdigit()]
+        self._progress: ProgressReporter[discord.Message] = ProgressReporter(self._send_to_channels, _edit_message)
+
+    @classmethod
+    def hooks(
+        cls, bot: "ESCLDiscordBot", meta: EntryJobMetadata, context: Dict[str, Any]
+    ) -> Tuple[
+        Callable[[str], Awaitable[None]],
+        Callable[[EntryJobResult], Awaitable[None]],
+        Callable[[], Awaitable[None]],
+    ]:
+        notifier = cls(bot, meta, context)
+        return notifier.send_progress, notifier.handle_result, notifier.close
+
+    async def send_progress(self, text: str) -> None:
+        self._progress.post(text)
+
+    async def handle_result(self, result: EntryJobResult) -> None:
+        self._progress.post_message(format_entry_result(result))
+        self._progress.close()
+
+    async def close(self) -> None:
+        await self._progress.aclose()
+
+    async def _send_to_channels(self, text: str) -> Optional[discord.Message]:
+        for channel_id in self._channel_ids:
+            try:
+                channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+                if isinstance(channel, Messageable):
+                    return await channel.send(text, allowed_mentions=self.bot.allowed_mentions)
+            except discord.HTTPException as exc:
+                logger.warning("進捗メッセージ送信に失敗しました: %s", exc)
+
+        logger.warning("進捗メッセージを送信できませんでした（job_id=%s）: %s", self.meta.job_id, text)
+        return None
+
+
+async def _edit_message(message: discord.Message, content: str) -> None:
+    await message.edit(content=content)
+
+
 def format_entry_result(result: EntryJobResult) -> str:
     icon = "✅" if result.ok else "❌"
     status = f"status={result.status_code}" if result.status_code is not None else "status=不明"
@@ -0,0 +1,25 @@
+"""Default data locations and limits shared by the entry points (no pandas / httpx imports)."""
+from __future__ import annotations
+
+from pathlib import Path
+
+__all__ = [
+    "DATA_DIR",
+    "DEFAULT_ARCHIVE_DIR",
+    "DEFAULT_ARTIFACT_DIR",
+    "DEFAULT_ENTRY_JOURNAL",
+    "DEFAULT_MAX_CONCURRENCY",
+    "DEFAULT_SEASON_DB",
+]
+
+DATA_DIR = Path("data")
+# 取得した ESCL 応答のアーカイブ（bucket_archive.BucketArchive）
+DEFAULT_ARCHIVE_DIR = DATA_DIR / "escl" / "archive"
+# 生成済みの CSV / Excel などのキャッシュ（artifact_cache.ArtifactCache のディスク層）
+DEFAULT_ARTIFACT_DIR = DATA_DIR / "escl" / "artifacts"
+# シーズン通算集計（season_store.SeasonStore）
+DEFAULT_SEASON_DB = DATA_DIR / "escl" / "season.sqlite3"
+# 応募予約の記録（entry_journal.EntryJournal。Bot の再起動後に予約を復元する）
+DEFAULT_ENTRY_JOURNAL = DATA_DIR / "escl" / "entry_journal.sqlite3"
+# スクリム出力で同時に取得するグループ数の上限（scrim_export.export_scrim）
+DEFAULT_MAX_CONCURRENCY = 4
@@ -0,0 +1,214 @@
+"""Write-ahead journal of scheduled entry jobs so they survive a bot restart (SQLite)."""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+
+from .defaults import DEFAULT_ENTRY_JOURNAL
+
+if TYPE_CHECKING:
+    from .entry_scheduler import EntryJobMetadata, EntryJobResult
+    from .rate_limit import RetryPolicy
+
+__all__ = [
+    "DEFAULT_ENTRY_JOURNAL",
+    "EntryJournal",
+    "EntryJournalError",
+    "JournaledJob",
+]
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entry_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_events_job ON entry_events (job_id);
+"""
+
+# 予約の登録（schedule）に対して、これらのイベントがあれば終わったジョブとみなす
+_TERMINAL_KINDS = ("cancel", "result")
+
+
+class EntryJournalError(Exception):
+    """EntryJournal に関連する例外。"""
+
+
+@dataclass(slots=True)
+class JournaledJob:
+    meta: EntryJobMetadata
+    # 進捗の通知先など、再起動後にフックを作り直すための情報（schedule_entry の context）
+    context: Dict[str, Any] = field(default_factory=dict)
+    # schedule_entry で指定した再試行の方針（省略したジョブは None）
+    retry_policy: Optional[RetryPolicy] = None
+
+
+class EntryJournal:
+    """
+    応募ジョブのイベント（schedule / cancel / result）を追記していく SQLite の表。
+
+    起動時に pending() で「登録済みで、取り消しも結果もまだ無い」ジョブを読み戻す。
+    書き込みは同期 API なので、EntryScheduler は専用スレッドから呼び、発火の経路では待たない。
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_ENTRY_JOURNAL,
+        *,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._path = Path(path)
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def __enter__(self) -> "EntryJournal":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # ---------- 追記 ----------
+    def record_schedule(
+        self,
+        meta: EntryJobMetadata,
+        context: Optional[Dict[str, Any]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> None:
+        data = {
+            "scrim_id": meta.scrim_id,
+            "team_id": meta.team_id,
+            "entry_date": meta.entry_date.isoformat(),
+            "run_at": meta.run_at.isoformat(),
+            "created_by": meta.created_by,
+            "created_at": meta.created_at.isoformat(),
+            "context": context or {},
+            "retry_policy": retry_policy.to_dict() if retry_policy is not None else None,
+        }
+        self._append(meta.job_id, "schedule", data)
+
+    def record_cancel(self, job_id: str) -> None:
+        self._append(job_id, "cancel", {})
+
+    def record_result(self, job_id: str, result: EntryJobResult) -> None:
+        data = {
+            "ok": result.ok,
+            "status_code": result.status_code,
+            "attempts": result.attempts,
+            "summary": result.summary,
+            "detail": result.detail,
+            "send_error": result.send_error,
+        }
+        self._append(job_id, "result", data)
+
+    def _append(self, job_id: str, kind: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute(
+                        "INSERT INTO entry_events (job_id, kind, recorded_at, data) VALUES (?, ?, ?, ?)",
+                        (job_id, kind, self._clock(), json.dumps(data, ensure_ascii=False)),
+                    )
+            except (sqlite3.Error, TypeError, ValueError) as exc:
+                raise EntryJournalError(f"応募ジョブの記録に失敗しました: {exc}") from exc
+
+    # ---------- 読み出し ----------
+    def pending(self) -> List[JournaledJob]:
+        """まだ終わっていないジョブを登録順に返す。"""
+        from .entry_scheduler import EntryJobMetadata
+        from .rate_limit import RetryPolicy
+
+        terminal = ", ".join("?" for _ in _TERMINAL_KINDS)
+        with self._lock:
+            try:
+                rows = self._connect().execute(
+                    f"""
+                    SELECT job_id, data FROM entry_events AS e
+                    WHERE kind = 'schedule' AND NOT EXISTS (
+                        SELECT 1 FROM entry_events AS t
+                        WHERE t.job_id = e.job_id AND t.seq > e.seq AND t.kind IN ({terminal})
+                    )
+                    ORDER BY seq
+                    """,
+                    _TERMINAL_KINDS,
+                ).fetchall()
+            except sqlite3.Error as exc:
+                raise EntryJournalError(f"応募ジョブの読み込みに失敗しました: {exc}") from exc
+
+        jobs: Dict[str, JournaledJob] = {}
+        for job_id, raw in rows:
+            try:
+                data = json.loads(raw)
+                meta = EntryJobMetadata(
+                    job_id=job_id,
+                    scrim_id=int(data["scrim_id"]),
+                    team_id=int(data["team_id"]),
+                    entry_date=date.fromisoformat(data["entry_date"]),
+                    run_at=datetime.fromisoformat(data["run_at"]),
+                    created_by=int(data["created_by"]),
+                    created_at=datetime.fromisoformat(data["created_at"]),
+                )
+                policy = data.get("retry_policy")
+                retry_policy = RetryPolicy.from_dict(policy) if policy else None
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.warning("応募ジョブの記録を読めませんでした: %s (%s)", job_id, exc)
+                continue
+            # 同じ job_id を登録し直した場合は新しい方を使う
+            jobs[job_id] = JournaledJob(meta=meta, context=data.get("context") or {}, retry_policy=retry_policy)
+        return list(jobs.values())
+
+    def compact(self, *, older_than: float) -> int:
+        """終わってから older_than 秒より経ったジョブのイベントを消し、消した件数を返す。"""
+        terminal = ", ".join("?" for _ in _TERMINAL_KINDS)
+        cutoff = self._clock() - older_than
+        with self._lock:
+            try:
+                conn = self._connect()
+                with conn:
+                    cursor = conn.execute(
+                        f"""
+                        DELETE FROM entry_events WHERE job_id IN (
+                            SELECT job_id FROM entry_events
+                            GROUP BY job_id
+                            HAVING MAX(recorded_at) < ?
+                               AND MAX(CASE WHEN kind IN ({terminal}) THEN seq END)
+                                   > MAX(CASE WHEN kind = 'schedule' THEN seq ELSE 0 END)
+                        )
+                        """,
+                        (cutoff, *_TERMINAL_KINDS),
+                    )
+            except sqlite3.Error as exc:
+                raise EntryJournalError(f"応募ジョブの記録の整理に失敗しました: {exc}") from exc
+        return cursor.rowcount
@@ -2,11 +2,27 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import heapq
 import json
+import logging
+import random
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
-from typing import Awaitable, Callable, Dict, Optional
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 from zoneinfo import ZoneInfo
 
 from .escl_api import (
@@ -15,12 +31,32 @@ from .escl_api import (
     ESCLAuthError,
     ESCLNetworkError,
 )
+from .rate_limit import Priority, RateLimitGovernor, RetryPolicy, retry_after_seconds
+from .singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from .entry_journal import EntryJournal
 
 LogHook = Callable[[str], Awaitable[None]]
 ResultHook = Callable[["EntryJobResult"], Awaitable[None]]
+# このプロセスでジョブの通知が終わったとき（結果・取り消し・停止）に 1 回だけ呼ぶ。進捗表示の後始末に使う
+CloseHook = Callable[[], Awaitable[None]]
+# 再起動後に復元したジョブのフックを (メタデータ, schedule_entry の context) から作り直す
+HookFactory = Callable[
+    ["EntryJobMetadata", Dict[str, Any]], Tuple[LogHook, Optional[ResultHook], Optional[CloseHook]]
+]
 
 JST = ZoneInfo("Asia/Tokyo")
 
+logger = logging.getLogger(__name__)
+
+# 終わったジョブの記録を journal に残しておく期間（rehydrate() のたびに古いものを消す）
+_JOURNAL_RETENTION = 30 * 24 * 3600.0
+# 送信時刻の直前はタイマーではなく、イベントループを回しながらこの秒数だけ待つ（タイマーの遅れを避ける）
+_SPIN_WINDOW = 0.002
+# shutdown() で close_hook（進捗の送り切り）を待つ上限（秒）
+_CLOSE_TIMEOUT = 5.0
+
 __all__ = [
     "EntryJobMetadata",
     "EntryJobResult",
@@ -48,14 +84,123 @@ class EntryJobResult:
     summary: str
     detail: Optional[str] = None
     payload: Optional[Dict[str, object]] = None
+    # 最初の送信を始めた時刻 - run_at（秒、サーバー時刻に補正済み）。正なら遅れ
+    send_error: Optional[float] = None
+
+
+@dataclass(slots=True)
+class _PendingJob:
+    meta: EntryJobMetadata
+    log_hook: LogHook
+    result_hook: Optional[ResultHook]
+    retry_policy: Optional[RetryPolicy] = None
+    close_hook: Optional[CloseHook] = None
+
+
+class _JobHeap:
+    """
+    run_at 順の min-heap。取り消しは遅延削除（heap には残し、取り出すときに読み飛ばす）。
+
+    追加・取り消しは O(log n)（取り消し済みが半分を超えたら作り直すので償却込み）。
+    利用者・Scrim・開催日ごとの索引も持ち、一覧は該当するジョブ数に比例する時間で返す。
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, int, str]] = []
+        self._jobs: Dict[str, _PendingJob] = {}
+        self._seq = 0
+        self._by_user: Dict[int, Set[str]] = {}
+        self._by_scrim: Dict[int, Set[str]] = {}
+        self._by_date: Dict[date, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._jobs
+
+    def push(self, job: _PendingJob) -> None:
+        meta = job.meta
+        self._seq += 1
+        self._jobs[meta.job_id] = job
+        heapq.heappush(self._heap, (meta.run_at.timestamp(), self._seq, meta.job_id))
+        for index, value in self._indexes(meta):
+            index.setdefault(value, set()).add(meta.job_id)
+
+    def remove(self, job_id: str) -> Optional[_PendingJob]:
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return None
+        for index, value in self._indexes(job.meta):
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(job_id)
+                if not ids:
+                    del index[value]
+        if len(self._heap) > 2 * len(self._jobs) + 16:
+            self._heap = [item for item in self._heap if item[2] in self._jobs]
+            heapq.heapify(self._heap)
+        return job
+
+    def next_at(self) -> Optional[float]:
+        self._drop_removed()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[_PendingJob]:
+        """run_at が now 以前のジョブをすべて（run_at・登録順に）取り出す。"""
+        due: List[_PendingJob] = []
+        while True:
+            self._drop_removed()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, job_id = heapq.heappop(self._heap)
+            job = self.remove(job_id)
+            if job is not None:
+                due.append(job)
+
+    def select(self, *, user_id: Optional[int], scrim_id: Optional[int], entry_date: Optional[date]) -> List[_PendingJob]:
+        candidates: Optional[Set[str]] = None
+        for index, value in ((self._by_user, user_id), (self._by_scrim, scrim_id), (self._by_date, entry_date)):
+            if value is None:
+                continue
+            ids = index.get(value, set())
+            candidates = ids if candidates is None else candidates & ids
+        ids = self._jobs.keys() if candidates is None else candidates
+        return [self._jobs[job_id] for job_id in ids]
+
+    def clear(self) -> List[_PendingJob]:
+        jobs = list(self._jobs.values())
+        self.__init__()
+        return jobs
+
+    def _drop_removed(self) -> None:
+        while self._heap and self._heap[0][2] not in self._jobs:
+            heapq.heappop(self._heap)
+
+    def _indexes(self, meta: EntryJobMetadata) -> Tuple[Tuple[Dict, object], ...]:
+        return ((self._by_user, meta.created_by), (self._by_scrim, meta.scrim_id), (self._by_date, meta.entry_date))
 
 
 class EntryScheduler:
     """
     ESCL 応募スケジューラ。
 
-    - run_at（前日 0:00 JST）まで待機し、0.5 秒間隔 × 最大3回で応募を試行
-    - ログは log_hook 経由で逐次通知
+    - run_at（前日 0:00 JST）まで待機し、RetryPolicy（既定は 0.5 秒間隔 × 最大3回）に従って応募を試行。
+      429 のあとは Retry-After / RateLimit-Reset に従って待つ。方針はジョブごとに指定できる
+    - ログは log_hook 経由で逐次通知（送信の経路で await するので、Discord への送信などは
+      ProgressReporter のようにキューへ積んですぐ戻ること）
+    - 待機中のジョブは run_at 順の heap に載せ、起床用のタスク 1 つだけで待つ
+      （何百件予約してもタスクは増えない）。同じ時刻のジョブはまとめて 1 回で発火する
+    - journal を渡すと登録・取り消し・結果を記録し、再起動後に rehydrate() で未完了の予約を戻す
+      （記録は専用スレッドで行い、発火から送信までの経路では待たない）
+    - warmup_lead 秒を指定すると run_at のその秒数前に起き、ESCL への接続を張りながら
+      Date ヘッダーで時計のずれを測り、残りは monotonic 時計で送信時刻（サーバー時刻の run_at）まで待つ
+    - 同じ run_at のジョブ（複数チームでの応募など）は 1 つの発火グループにし、初回の送信は同時に、
+      再試行はチームごとに retry_interval / グループの件数 ずつずらして互いに 429 を招かないようにする
+    - governor を渡すと、発火の準備から結果が出るまで RateLimitGovernor.preempt() で
+      集計の取得などの低い優先度の送信を止める
+    - hedge_after 秒を指定すると、予約ジョブの送信は ESCLApiClient のヘッジ付きで行う
+      （その秒数で答えが無ければ同じ応募をもう 1 本送り、先に決着した方を採る）
     """
 
     def __init__(
@@ -67,27 +212,130 @@ class EntryScheduler:
         retry_interval: float = 0.5,
         retry_backoff_after_429: float = 1.0,
         sleep_coro: Optional[Callable[[float], Awaitable[None]]] = None,
+        clock: Optional[Callable[[], datetime]] = None,
+        max_wait: float = 60.0,
+        journal: Optional[EntryJournal] = None,
+        warmup_lead: float = 0.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        governor: Optional[RateLimitGovernor] = None,
+        hedge_after: Optional[float] = None,
     ) -> None:
         self._api_client = api_client
         self._tz = timezone
-        self._max_attempts = max_attempts
-        self._retry_interval = retry_interval
-        self._backoff_after_429 = retry_backoff_after_429
+        # retry_policy を渡さなければ、従来の引数どおりの揺らぎなしの方針にする
+        self._retry_policy = retry_policy or RetryPolicy(
+            max_attempts=max_attempts,
+            interval=retry_interval,
+            backoff_after_429=retry_backoff_after_429,
+            jitter=0.0,
+        )
+        self._governor = governor
+        self._hedge_after = hedge_after
+        self._rng = random.Random()
         self._sleep = sleep_coro or asyncio.sleep
-        self._jobs: Dict[str, asyncio.Task[None]] = {}
+        self._clock = clock or (lambda: datetime.now(self._tz))
+        # 壁時計の補正（NTP など）に追従できるよう、長い待機もこの秒数ごとに時刻を確かめ直す
+        self._max_wait = max_wait
+        self._pending = _JobHeap()
+        self._running: Dict[str, asyncio.Task[None]] = {}
         self._metadata: Dict[str, EntryJobMetadata] = {}
         self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task[None]] = None
+        self._journal = journal
+        self._journal_writer: Optional[ThreadPoolExecutor] = None
+        self._warmup_lead = max(warmup_lead, 0.0)
+        # 最後に測ったサーバー時刻 - ローカル時刻（秒）
+        self._clock_offset = 0.0
+        # 同じ run_at のジョブは接続の準備と送信時刻までの待機を 1 回にまとめ、同じタイマーで起きる
+        self._send_gates = SingleFlight()
+
+    @property
+    def clock_offset(self) -> float:
+        return self._clock_offset
 
     async def shutdown(self) -> None:
         async with self._lock:
-            tasks = list(self._jobs.values())
-            self._jobs.clear()
+            pending = self._pending.clear()
+            tasks = list(self._running.values())
+            dispatcher, self._dispatcher = self._dispatcher, None
+            self._running.clear()
             self._metadata.clear()
 
+        if dispatcher is not None:
+            dispatcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await dispatcher
+        for job in pending:
+            if self._journal is None:
+                await _notify(job.log_hook, "応募ジョブがキャンセルされました。")
+            else:
+                # 記録が残っているので、次の起動時に rehydrate() で戻る
+                await _notify(job.log_hook, "Bot の停止により待機を中断しました。再起動後に予約を再開します。")
+        # 送信中のジョブは _job_runner の finally で close_hook を呼ぶ
         for task in tasks:
             task.cancel()
-            with contextlib.suppress(asyncio.CancelledError):
-                await task
+        closing = [asyncio.ensure_future(_close(job.close_hook)) for job in pending if job.close_hook]
+        closing.extend(tasks)
+        if closing:
+            # 停止の通知がイベントループを閉じる前に届くよう、進捗の送り切りを待つ
+            _, unfinished = await asyncio.wait(closing, timeout=_CLOSE_TIMEOUT)
+            for future in unfinished:
+                future.cancel()
+            await asyncio.gather(*closing, return_exceptions=True)
+        writer, self._journal_writer = self._journal_writer, None
+        if writer is not None:
+            await asyncio.to_thread(writer.shutdown)  # 書きかけの記録を流し切る
+
+    async def rehydrate(self, hooks: HookFactory) -> List[EntryJobMetadata]:
+        """journal から未完了の予約を読み戻して登録し直す。予定時刻を過ぎたものはすぐ送信する。"""
+        if self._journal is None:
+            return []
+        try:
+            await self._write_journal(partial(self._journal.compact, older_than=_JOURNAL_RETENTION))
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("応募ジョブの記録を整理できませんでした: %s", exc)
+        journaled = await self._write_journal(self._journal.pending)
+        now = self._clock()
+        restored: List[EntryJobMetadata] = []
+        for job in journaled:
+            meta = job.meta
+            async with self._lock:
+                if meta.job_id in self._metadata:
+                    continue
+            log_hook, result_hook, close_hook = hooks(meta, job.context)
+            if meta.entry_date < now.astimezone(self._tz).date():
+                # 停止中に開催日を過ぎた予約は送っても意味がないので、結果だけ記録して終える
+                expired = EntryJobResult(
+                    ok=False,
+                    status_code=None,
+                    attempts=0,
+                    summary="Bot の停止中に開催日を過ぎたため、応募を送信しませんでした。",
+                )
+                self._journal_result(meta, expired)
+                if result_hook:
+                    await result_hook(expired)
+                await _close(close_hook)
+                continue
+            await _notify(log_hook, f"Bot の再起動後に応募予約を復元しました（ジョブID `{meta.job_id}`）。")
+            await self._announce_wait(meta.run_at, now=now, log_hook=log_hook)
+            async with self._lock:
+                self._metadata[meta.job_id] = meta
+                self._pending.push(
+                    _PendingJob(
+                        meta=meta,
+                        log_hook=log_hook,
+                        result_hook=result_hook,
+                        retry_policy=job.retry_policy,
+                        close_hook=close_hook,
+                    )
+                )
+                self._ensure_dispatcher()
+                self._wakeup.set()
+            restored.append(meta)
+        if restored:
+            logger.info("応募予約を %d 件復元しました", len(restored))
+        return restored
 
     async def schedule_entry(
         self,
@@ -101,10 +349,18 @@ class EntryScheduler:
         result_hook: Optional[ResultHook] = None,
         job_id: Optional[str] = None,
         now: Optional[datetime] = None,
+        context: Optional[Dict[str, Any]] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        close_hook: Optional[CloseHook] = None,
     ) -> EntryJobMetadata:
+        """
+        応募ジョブを登録する。context は journal に一緒に残す JSON 化できる情報
+        （進捗の通知先など。rehydrate() のフック作成に渡る）。retry_policy を省くとスケジューラの既定。
+        close_hook は結果の通知・取り消し・shutdown() のどれで終わっても最後に 1 回呼ぶ。
+        """
         run_at = compute_run_at(entry_date, self._tz, dispatch_time=dispatch_time)
         job_id = job_id or secrets.token_hex(8)
-        now_dt = now or datetime.now(self._tz)
+        now_dt = now or self._clock()
         meta = EntryJobMetadata(
             job_id=job_id,
             scrim_id=scrim_id,
@@ -115,30 +371,145 @@ class EntryScheduler:
             created_at=now_dt,
         )
 
-        task = asyncio.create_task(
-            self._job_runner(meta, log_hook=log_hook, result_hook=result_hook, now=now_dt),
-            name=f"entry-job-{job_id}",
-        )
+        async with self._lock:
+            if job_id in self._metadata:
+                raise ValueError(f"ジョブID が重複しています: {job_id}")
+        if self._journal is not None:
+            # 登録の記録は応答を返す前に済ませる（ここで失敗しても予約自体は続ける）
+            try:
+                await self._write_journal(self._journal.record_schedule, meta, context, retry_policy)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("応募ジョブの記録に失敗しました: %s (%s)", job_id, exc)
+                await log_hook("⚠️ 予約を保存できませんでした。Bot を再起動すると、この予約は失われます。")
+        # 待機の案内は、発火（送信開始のログ）より先に届くよう heap に載せる前に送る
+        await self._announce_wait(meta.run_at, now=now_dt, log_hook=log_hook)
 
         async with self._lock:
-            self._jobs[job_id] = task
             self._metadata[job_id] = meta
-
-        task.add_done_callback(lambda t, job_id=job_id: asyncio.create_task(self._cleanup(job_id, t)))
+            self._pending.push(
+                _PendingJob(
+                    meta=meta,
+                    log_hook=log_hook,
+                    result_hook=result_hook,
+                    retry_policy=retry_policy,
+                    close_hook=close_hook,
+                )
+            )
+            self._ensure_dispatcher()
+            self._wakeup.set()
         return meta
 
     async def get_metadata(self, job_id: str) -> Optional[EntryJobMetadata]:
         async with self._lock:
             return self._metadata.get(job_id)
 
-    async def _cleanup(self, job_id: str, task: asyncio.Task[None]) -> None:
-        try:
-            with contextlib.suppress(asyncio.CancelledError):
-                await task
-        finally:
-            async with self._lock:
-                self._jobs.pop(job_id, None)
+    async def list_jobs(
+        self,
+        *,
+        user_id: Optional[int] = None,
+        scrim_id: Optional[int] = None,
+        entry_date: Optional[date] = None,
+    ) -> List[EntryJobMetadata]:
+        """待機中のジョブを run_at 順に返す（指定した条件はすべて満たすものだけ）。"""
+        async with self._lock:
+            jobs = self._pending.select(user_id=user_id, scrim_id=scrim_id, entry_date=entry_date)
+        return sorted((job.meta for job in jobs), key=lambda meta: (meta.run_at, meta.created_at))
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """ジョブを取り消す。待機中なら heap から外し、送信中なら止める。見つからなければ False。"""
+        async with self._lock:
+            job = self._pending.remove(job_id)
+            task = self._running.get(job_id) if job is None else None
+            if job is not None:
                 self._metadata.pop(job_id, None)
+        if job is None and task is None:
+            return False
+        if self._journal is not None:
+            try:
+                await self._write_journal(self._journal.record_cancel, job_id)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("応募ジョブの取り消しを記録できませんでした: %s (%s)", job_id, exc)
+        if job is not None:
+            await _notify(job.log_hook, "応募ジョブがキャンセルされました。")
+            await _close(job.close_hook)
+        else:
+            task.cancel()  # close_hook は _job_runner の finally で呼ばれる
+        return True
+
+    def _write_journal(self, fn: Callable[..., Any], *args: Any) -> asyncio.Future[Any]:
+        """journal への書き込みを専用スレッド（1 本なので記録の順序は保たれる）に渡す。"""
+        if self._journal_writer is None:
+            self._journal_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entry-journal")
+        return asyncio.get_running_loop().run_in_executor(self._journal_writer, fn, *args)
+
+    def _journal_result(self, meta: EntryJobMetadata, result: EntryJobResult) -> None:
+        if self._journal is None:
+            return
+        # 送信の直後なので待たない（失敗はログだけ残す。次回起動時に再送され、409 で応募済みと分かる）
+        future = self._write_journal(self._journal.record_result, meta.job_id, result)
+        future.add_done_callback(_log_journal_failure)
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_loop(), name="entry-scheduler")
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            # サーバー時刻で見て、送信時刻の warmup_lead 秒前になったジョブを起こす
+            now = self._clock().timestamp() + self._clock_offset + self._warmup_lead
+            due = self._pending.pop_due(now)
+            if due:
+                self._fire(due)
+                continue
+            next_at = self._pending.next_at()
+            timeout = None if next_at is None else min(max(next_at - now, 0.0), self._max_wait)
+            # wait_for(Event.wait()) は 3.11 だと完了と同時の cancel() を取りこぼすので、タイマーで起こす
+            timer = None if timeout is None else asyncio.get_running_loop().call_later(timeout, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    def _fire(self, jobs: List[_PendingJob]) -> None:
+        """同じ時点で期限の来たジョブを、間に await を挟まずまとめて送信開始する。"""
+        groups: Dict[float, List[_PendingJob]] = {}
+        for job in jobs:
+            groups.setdefault(job.meta.run_at.timestamp(), []).append(job)
+        for members in groups.values():
+            # 同じ Scrim への応募が続けて並ぶようにし、再試行の位相を順にずらす
+            members.sort(key=lambda job: (job.meta.scrim_id, job.meta.created_at))
+            # ジョブごとに再試行方針が違うこともあるので、グループで最も長い間隔を等分する
+            interval = max((job.retry_policy or self._retry_policy).interval for job in members)
+            stagger = interval / len(members)
+            if len(members) > 1:
+                logger.info(
+                    "応募ジョブ %d 件を 1 グループで発火します（再試行は %.0f ms ずつずらす）",
+                    len(members),
+                    stagger * 1000,
+                )
+            for index, job in enumerate(members):
+                job_id = job.meta.job_id
+                task = asyncio.create_task(
+                    self._job_runner(
+                        job.meta,
+                        log_hook=job.log_hook,
+                        result_hook=job.result_hook,
+                        retry_policy=job.retry_policy,
+                        close_hook=job.close_hook,
+                        group_size=len(members),
+                        retry_phase=index * stagger,
+                    ),
+                    name=f"entry-job-{job_id}",
+                )
+                self._running[job_id] = task
+                task.add_done_callback(lambda t, job_id=job_id: self._forget(job_id, t))
+
+    def _forget(self, job_id: str, task: asyncio.Task[None]) -> None:
+        if self._running.get(job_id) is task:
+            del self._running[job_id]
+            self._metadata.pop(job_id, None)
 
     async def _job_runner(
         self,
@@ -146,15 +517,29 @@ class EntryScheduler:
         *,
         log_hook: LogHook,
         result_hook: Optional[ResultHook],
-        now: datetime,
+        retry_policy: Optional[RetryPolicy] = None,
+        close_hook: Optional[CloseHook] = None,
+        group_size: int = 1,
+        retry_phase: float = 0.0,
     ) -> None:
         try:
-            await self._await_until(meta.run_at, now=now, log_hook=log_hook)
-            attempts = self._max_attempts
+            policy = retry_policy or self._retry_policy
             await log_hook(
-                f"応募送信を開始します: scrim_id={meta.scrim_id}, team_id={meta.team_id}, 最大試行 {attempts} 回"
+                f"応募送信を開始します: scrim_id={meta.scrim_id}, team_id={meta.team_id}, "
+                f"最大試行 {policy.max_attempts} 回"
             )
-            result = await self._execute_attempts(meta, log_hook=log_hook, max_attempts=attempts)
+            async with self._preempt():
+                if self._warmup_lead:
+                    await self._send_gates.do(
+                        meta.run_at.timestamp(), partial(self._wait_for_send_time, meta.run_at, group_size)
+                    )
+                send_error = self._clock().timestamp() + self._clock_offset - meta.run_at.timestamp()
+                result = await self._execute_attempts(
+                    meta, log_hook=log_hook, policy=policy, retry_phase=retry_phase, hedge_after=self._hedge_after
+                )
+            result.send_error = send_error
+            logger.info("応募ジョブ %s: run_at %+.1f ms で送信しました", meta.job_id, send_error * 1000)
+            self._journal_result(meta, result)
             if result_hook:
                 await result_hook(result)
         except asyncio.CancelledError:
@@ -162,17 +547,56 @@ class EntryScheduler:
             raise
         except Exception as exc:
             await log_hook(f"応募ジョブで想定外のエラーが発生しました: {exc}")
+            failure = EntryJobResult(
+                ok=False,
+                status_code=None,
+                attempts=0,
+                summary="内部エラーが発生しました。",
+                detail=str(exc),
+            )
+            self._journal_result(meta, failure)
             if result_hook:
-                failure = EntryJobResult(
-                    ok=False,
-                    status_code=None,
-                    attempts=0,
-                    summary="内部エラーが発生しました。",
-                    detail=str(exc),
-                )
                 await result_hook(failure)
+        finally:
+            await _close(close_hook)
+
+    def _preempt(self) -> AsyncContextManager[None]:
+        if self._governor is None:
+            return contextlib.nullcontext()
+        return self._governor.preempt(Priority.ENTRY)
+
+    async def _wait_for_send_time(self, run_at: datetime, connections: int) -> None:
+        """
+        グループの件数分の接続を温めて時計のずれを測り、サーバー時刻の run_at まで monotonic 時計で待つ。
+        """
+        loop = asyncio.get_running_loop()
+        probe = asyncio.ensure_future(self._probe_clock(connections))
+        budget = run_at.timestamp() - (self._clock().timestamp() + self._clock_offset)
+        # 計測が送信時刻に間に合わなければ待たずに送る（計測は裏で続き、次のグループに使われる）
+        await asyncio.wait({probe}, timeout=max(budget - 0.1, 0.0))
+        remaining = run_at.timestamp() - (self._clock().timestamp() + self._clock_offset)
+        deadline = loop.time() + remaining
+        if remaining > _SPIN_WINDOW:
+            await asyncio.sleep(remaining - _SPIN_WINDOW)
+        while loop.time() < deadline:
+            await asyncio.sleep(0)
+
+    async def _probe_clock(self, connections: int) -> None:
+        try:
+            probe = await self._api_client.probe_clock(connections=connections)
+        except ESCLAPIError as exc:
+            # 計測できなくても送信はする（前回のずれ、無ければローカル時計のまま）
+            logger.warning("ESCL サーバーの時計を確認できませんでした: %s", exc)
+            return
+        self._clock_offset = probe.offset
+        logger.info(
+            "ESCL サーバーの時計のずれ: %+.0f ms (±%.0f ms, RTT %.0f ms)",
+            probe.offset * 1000,
+            probe.uncertainty * 1000,
+            probe.rtt * 1000,
+        )
 
-    async def _await_until(self, target: datetime, *, now: datetime, log_hook: LogHook) -> None:
+    async def _announce_wait(self, target: datetime, *, now: datetime, log_hook: LogHook) -> None:
         now_dt = now
         if now_dt.tzinfo is None:
             now_dt = now_dt.replace(tzinfo=self._tz)
@@ -184,7 +608,6 @@ class EntryScheduler:
         minutes = int((delay % 3600) // 60)
         seconds = int(delay % 60)
         await log_hook(f"応募実行まで {hours}時間 {minutes}分 {seconds}秒 待機します。")
-        await self._sleep(delay)
 
     async def _execute_attempts(
         self,
@@ -192,17 +615,32 @@ class EntryScheduler:
         *,
         log_hook: LogHook,
         max_attempts: Optional[int] = None,
+        retry_phase: float = 0.0,
+        policy: Optional[RetryPolicy] = None,
+        hedge_after: Optional[float] = None,
     ) -> EntryJobResult:
-        attempts_limit = max_attempts or self._max_attempts
+        """
+        応募を policy（省略時はスケジューラの既定）に従って最大 max_attempts 回送る。
+        retry_phase 秒だけ最初の再試行を遅らせ、同じグループのほかのジョブと再試行の時刻が重ならないようにする。
+        hedge_after を渡すと各回の送信をヘッジ付きにする。
+        """
+        policy = policy or self._retry_policy
+        attempts_limit = max_attempts or policy.max_attempts
+        throttles = 0
         last_status: Optional[int] = None
         last_detail: Optional[str] = None
         last_payload: Optional[Dict[str, object]] = None
 
         for attempt in range(1, attempts_limit + 1):
             try:
-                response = await self._api_client.create_application(
-                    scrim_id=meta.scrim_id, team_id=meta.team_id
-                )
+                if hedge_after is None:
+                    response = await self._api_client.create_application(
+                        scrim_id=meta.scrim_id, team_id=meta.team_id
+                    )
+                else:
+                    response = await self._api_client.create_application(
+                        scrim_id=meta.scrim_id, team_id=meta.team_id, hedge_after=hedge_after
+                    )
             except ESCLAuthError as exc:
                 payload = exc.response.payload if isinstance(exc.response.payload, dict) else None
                 summary = "ESCL API 認証エラー: JWT を再設定してください。"
@@ -275,18 +713,20 @@ class EntryScheduler:
                         f"[{attempt}/{attempts_limit}] 受付開始前または終了後の可能性があります (status=422)。"
                     )
                 elif status == 429:
+                    throttles += 1
+                    delay = policy.throttle_delay(throttles, retry_after_seconds(response.headers), self._rng)
                     await log_hook(
-                        f"[{attempt}/{attempts_limit}] レート制限 (status=429)。追加で {self._backoff_after_429:.1f} 秒待機します。"
+                        f"[{attempt}/{attempts_limit}] レート制限 (status=429)。追加で {delay:.1f} 秒待機します。"
                     )
                     if attempt != attempts_limit:
-                        await self._sleep(self._backoff_after_429)
+                        await self._sleep(delay)
                 else:
                     await log_hook(
                         f"[{attempt}/{attempts_limit}] 応答 status={status}。引き続きリトライします。"
                     )
 
             if attempt != attempts_limit:
-                await self._sleep(self._retry_interval)
+                await self._sleep(policy.retry_delay(self._rng) + (retry_phase if attempt == 1 else 0.0))
 
         summary = "応募が成功しませんでした。"
         if last_status == 422:
@@ -327,7 +767,8 @@ class EntryScheduler:
         await log_hook(
             f"応募を即時送信します: scrim_id={meta.scrim_id}, team_id={meta.team_id}, リトライなし"
         )
-        result = await self._execute_attempts(meta, log_hook=log_hook, max_attempts=1)
+        async with self._preempt():
+            result = await self._execute_attempts(meta, log_hook=log_hook, max_attempts=1)
         if result_hook:
             await result_hook(result)
         return result
@@ -347,6 +788,27 @@ def compute_run_at(
     return run_at.astimezone(tz)
 
 
+async def _notify(log_hook: LogHook, message: str) -> None:
+    try:
+        await log_hook(message)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("応募ジョブの通知に失敗しました: %s (%s)", message, exc)
+
+
+async def _close(close_hook: Optional[CloseHook]) -> None:
+    if close_hook is None:
+        return
+    try:
+        await close_hook()
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("応募ジョブの進捗表示を閉じられませんでした: %s", exc)
+
+
+def _log_journal_failure(future: asyncio.Future[Any]) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("応募ジョブの結果を記録できませんでした: %s", future.exception())
+
+
 def _summarize_payload(payload: Optional[Dict[str, object]]) -> Optional[str]:
     if not payload:
         return None
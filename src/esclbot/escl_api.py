@@ -1,9 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
-import httpx
+from .rate_limit import Priority
+
+if TYPE_CHECKING:
+    import httpx
+
+    from .rate_limit import RateLimitGovernor
 
 __all__ = [
     "ESCLApiClient",
@@ -12,11 +21,20 @@ __all__ = [
     "ESCLConfigError",
     "ESCLNetworkError",
     "ESCLResponse",
+    "ClockProbe",
+    "HedgeStats",
 ]
 
+logger = logging.getLogger(__name__)
+
 
 BASE_URL = "https://core-api-prod.escl.workers.dev"
 CONNECT_PROTOCOL_VERSION = "1"
+CREATE_APPLICATION_PATH = "/user.v1.UserApplicationService/CreateApplication"
+
+# もう一方のリクエストを待っても答えが変わらない応答（成功・応募済み・認証や入力の誤り）
+# 以外、つまり受付開始前（422）・レート制限・5xx は決着とみなさない
+_UNSETTLED_STATUSES = frozenset({408, 422, 425, 429})
 
 
 class ESCLAPIError(Exception):
@@ -36,12 +54,40 @@ class ESCLResponse:
     status_code: Optional[int]
     payload: Optional[Dict[str, Any]]
     text: str
+    # Retry-After / RateLimit-* を読むための応答ヘッダー（キーは小文字）
+    headers: Dict[str, str] = field(default_factory=dict)
 
     @property
     def ok(self) -> bool:
         return self.status_code is not None and 200 <= self.status_code < 300
 
 
+@dataclass(slots=True)
+class ClockProbe:
+    """ESCL サーバーの時計とのずれの推定値（Date ヘッダーから求める）。"""
+
+    # サーバー時刻 - ローカル時刻（秒）。正ならサーバーの方が進んでいる
+    offset: float
+    # offset の誤差の幅（±秒）
+    uncertainty: float
+    # 計測したリクエストの往復時間の最小値（秒）
+    rtt: float
+
+
+@dataclass(slots=True)
+class HedgeStats:
+    # ヘッジ付きで送った CreateApplication の件数と、そのうち予備を送った件数
+    requests: int = 0
+    hedged: int = 0
+    # 予備の方が先に決着した件数と、その時の（最初の送信からの）所要秒数の合計
+    hedge_wins: int = 0
+    hedge_win_latency: float = 0.0
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.requests if self.requests else 0.0
+
+
 class ESCLAuthError(ESCLAPIError):
     """Raised when ESCL API returns 401 系の認証エラー。"""
 
@@ -65,6 +111,10 @@ class ESCLApiClient:
     非同期 ESCL API クライアント。
 
     token_provider は常に最新の JWT を返す Callable を想定。
+    governor を渡すと、送信のたびにトークンを取り（CreateApplication は Priority.ENTRY、
+    それ以外は Priority.INTERACTIVE）、応答の 429 / レート制限ヘッダーを知らせる。
+    create_application(hedge_after=...) は、その秒数で答えが無ければ同じ応募をもう 1 本
+    （プールの別の接続で）送り、先に決着した方を採る（ヘッジ。重複した応募は 409 になるだけ）。
     """
 
     def __init__(
@@ -73,22 +123,78 @@ class ESCLApiClient:
         *,
         request_timeout: float = 10.0,
         client: Optional[httpx.AsyncClient] = None,
+        governor: Optional[RateLimitGovernor] = None,
     ) -> None:
         self._token_provider = token_provider
-        self._client = client or httpx.AsyncClient(base_url=BASE_URL, timeout=request_timeout)
-        self._owns_client = client is None
+        self._governor = governor
+        if client is None:
+            httpx = _httpx()
+            # 応募の数秒前に probe_clock() で張った接続を、送信まで閉じずに残しておく
+            client = httpx.AsyncClient(
+                base_url=BASE_URL, timeout=request_timeout, limits=httpx.Limits(keepalive_expiry=30.0)
+            )
+            self._owns_client = True
+        else:
+            self._owns_client = False
+        self._client = client
+        self.hedge_stats = HedgeStats()
 
     async def aclose(self) -> None:
         if self._owns_client:
             await self._client.aclose()
 
-    async def create_application(self, *, scrim_id: int, team_id: int) -> ESCLResponse:
+    async def create_application(
+        self, *, scrim_id: int, team_id: int, hedge_after: Optional[float] = None
+    ) -> ESCLResponse:
         payload = {"scrimId": scrim_id, "teamId": team_id}
+        if hedge_after is not None:
+            return await self._hedged_post(CREATE_APPLICATION_PATH, payload, hedge_after)
         return await self._post(
-            "/user.v1.UserApplicationService/CreateApplication",
+            CREATE_APPLICATION_PATH,
             payload,
+            priority=Priority.ENTRY,
         )
 
+    async def _hedged_post(self, path: str, json_payload: Dict[str, Any], hedge_after: float) -> ESCLResponse:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.hedge_stats.requests += 1
+        primary = asyncio.ensure_future(self._post(path, json_payload, priority=Priority.ENTRY))
+        attempts: List[asyncio.Future[ESCLResponse]] = [primary]
+        finished: List[asyncio.Future[ESCLResponse]] = []
+        winner: Optional[asyncio.Future[ESCLResponse]] = None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            if not done:
+                attempts.append(asyncio.ensure_future(self._post(path, json_payload, priority=Priority.ENTRY)))
+                self.hedge_stats.hedged += 1
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in sorted(done, key=attempts.index):
+                    finished.append(attempt)
+                    if _settled(attempt):
+                        winner = attempt
+                        break
+        finally:
+            losers = [attempt for attempt in attempts if not attempt.done()]
+            for attempt in losers:
+                attempt.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+        if winner is None:
+            # どちらも決着しなければ、応答を得られた方（最初の送信を優先）を返して再試行に任せる
+            winner = next((a for a in finished if a.exception() is None), finished[0])
+        elif winner is not primary:
+            latency = loop.time() - started
+            self.hedge_stats.hedge_wins += 1
+            self.hedge_stats.hedge_win_latency += latency
+            logger.info("CreateApplication は予備のリクエストが先に決着しました（%.0f ms）", latency * 1000)
+        for attempt in finished:
+            if attempt is not winner:
+                attempt.exception()  # 採らなかった方の例外は捨てる
+        return winner.result()
+
     async def get_applications(self, *, scrim_id: int) -> ESCLResponse:
         payload = {"scrimId": scrim_id}
         return await self._post(
@@ -102,17 +208,68 @@ class ESCLApiClient:
             {},
         )
 
-    async def _post(self, path: str, json_payload: Dict[str, Any]) -> ESCLResponse:
+    async def probe_clock(
+        self,
+        *,
+        samples: int = 4,
+        spacing: float = 0.25,
+        timeout: float = 2.0,
+        connections: int = 1,
+    ) -> ClockProbe:
+        """
+        ESCL サーバーに HEAD を送って接続（DNS・TCP・TLS）を張っておき、Date ヘッダーから時計のずれを推定する。
+
+        Date は秒単位なので 1 回では ±0.5 秒しか分からない。spacing 秒ずつずらして samples 回送り、
+        各回の「送信〜受信の間のどこかでサーバーが D 秒台だった」という範囲を重ねて幅を狭める。
+        1 回目は connections 本を同時に送り、同時に送信する件数分の接続をプールに用意する。
+        """
+        observations: List[Tuple[float, float, float]] = []
+        rtts: List[float] = []
+        for index in range(samples):
+            if index:
+                await asyncio.sleep(spacing)
+            parallel = connections if index == 0 else 1
+            batch = await asyncio.gather(*(self._head_sample(timeout) for _ in range(parallel)))
+            for sent_at, received_at, server_at in batch:
+                rtts.append(received_at - sent_at)
+                if server_at is not None:
+                    observations.append((sent_at, received_at, server_at))
+        if not observations:
+            raise ESCLAPIError("ESCL API の応答に Date ヘッダーがありませんでした。")
+        return _estimate_clock(observations, min(rtts))
+
+    async def _head_sample(self, timeout: float) -> Tuple[float, float, Optional[float]]:
+        httpx = _httpx()
+        sent_at = time.time()
+        try:
+            response = await self._client.head("/", timeout=timeout)
+        except httpx.RequestError as exc:
+            raise ESCLNetworkError(str(exc)) from exc
+        received_at = time.time()
+        header = response.headers.get("date")
+        try:
+            server_at = parsedate_to_datetime(header).timestamp() if header else None
+        except (TypeError, ValueError):
+            server_at = None
+        return sent_at, received_at, server_at
+
+    async def _post(
+        self, path: str, json_payload: Dict[str, Any], *, priority: Priority = Priority.INTERACTIVE
+    ) -> ESCLResponse:
+        httpx = _httpx()
         jwt = self._token_provider()
         if not jwt:
             raise ESCLConfigError("ESCL_JWT が設定されていません。")
 
         headers = _build_headers(jwt)
-
+        if self._governor is not None:
+            await self._governor.acquire(path, priority)
         try:
             response = await self._client.post(path, json=json_payload, headers=headers)
         except httpx.RequestError as exc:
             raise ESCLNetworkError(str(exc)) from exc
+        if self._governor is not None:
+            self._governor.observe(path, response.status_code, response.headers)
 
         text = response.text
         payload: Optional[Dict[str, Any]]
@@ -121,9 +278,41 @@ class ESCLApiClient:
         except ValueError:
             payload = None
 
-        escl_response = ESCLResponse(status_code=response.status_code, payload=payload, text=text)
+        escl_response = ESCLResponse(
+            status_code=response.status_code,
+            payload=payload,
+            text=text,
+            headers={key.lower(): value for key, value in response.headers.items()},
+        )
 
         if response.status_code == 401:
             raise ESCLAuthError("ESCL API で認証エラーが発生しました。", escl_response)
 
         return escl_response
+
+
+def _httpx():
+    # httpx は実際に通信するときだけ読み込む（スケジューラ単体の import を軽く保つ）
+    import httpx
+
+    return httpx
+
+
+def _estimate_clock(observations: List[Tuple[float, float, float]], rtt: float) -> ClockProbe:
+    # サーバーが D 秒台（D <= t + offset < D + 1）だった瞬間 t は送信〜受信の間にあるので
+    # offset は (D - received_at, D + 1 - sent_at) に入る。全サンプルの範囲を重ねる
+    low = max(server_at - received_at for _, received_at, server_at in observations)
+    high = min(server_at + 1.0 - sent_at for sent_at, _, server_at in observations)
+    if low > high:
+        # 計測中にローカルの時計が補正されたなど。最後のサンプルだけで見積もる
+        sent_at, received_at, server_at = observations[-1]
+        low, high = server_at - received_at, server_at + 1.0 - sent_at
+    return ClockProbe(offset=(low + high) / 2, uncertainty=(high - low) / 2, rtt=rtt)
+
+
+def _settled(attempt: asyncio.Future[ESCLResponse]) -> bool:
+    exc = attempt.exception()
+    if exc is not None:
+        return isinstance(exc, (ESCLAuthError, ESCLConfigError))
+    status = attempt.result().status_code
+    return status is not None and status < 500 and status not in _UNSETTLED_STATUSES
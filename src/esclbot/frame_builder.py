@@ -0,0 +1,247 @@
+"""Typed, column-oriented builder for raw scrim DataFrames."""
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .reports import COUNT_COLUMNS, RATE_COLUMNS, RAW_ID_COLUMNS
+
+__all__ = [
+    "RAW_COLUMN_ORDER",
+    "ScrimFrameBuilder",
+    "apply_raw_dtypes",
+    "concat_raw_frames",
+]
+
+# REQUIRED_HEADERS と同じ並び（api_scraper を import すると循環するためここで定義）
+_PLAYER_COLUMNS = [
+    "team_name", "team_num", "player_name", "character", "placement", "kills", "assists",
+    "damage", "shots", "hits", "accuracy", "headshots", "headshots_accuracy", "survival_time",
+]
+RAW_COLUMN_ORDER = RAW_ID_COLUMNS + _PLAYER_COLUMNS
+
+# int32（欠損は mask）で持つ列。整数の回数・順位だけにする
+_INT_COLUMNS = ["placement"] + [col for col in COUNT_COLUMNS if col != "survival_time"]
+# float64 で持つ列（生存時間は小数で来ることがあるので丸めない）
+_FLOAT_COLUMNS = ["survival_time"] + RATE_COLUMNS
+# カテゴリで持つ列（同じ値が何度も出てくる）。team_num は番号ではなくラベルとして API の値をそのまま持つ
+_CATEGORY_COLUMNS = ["team_name", "team_num", "character"]
+
+_INT32_MIN = -(2**31)
+_INT32_MAX = 2**31 - 1
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        out = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(out) else out
+
+
+def _to_int32(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    if number is None or math.isinf(number):
+        return None
+    out = int(round(number))
+    if out < _INT32_MIN or out > _INT32_MAX:
+        return None
+    return out
+
+
+def _to_label(value: Any) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):  # None / NaN（str 列の欠損）
+        return None
+    text = str(value)
+    return text if text else None
+
+
+def _label_categorical(labels: List[Optional[str]]) -> pd.Categorical:
+    categorical = pd.Categorical(labels)
+    if len(categorical.categories) == 0:
+        # 全部欠損でも文字列のカテゴリにしておく（Parquet / Arrow で float 列にならないように）
+        categorical = pd.Categorical(labels, categories=pd.Index([], dtype=str))
+    return categorical
+
+
+class _Int32Column:
+    __slots__ = ("values", "mask")
+
+    def __init__(self) -> None:
+        self.values = array("i")
+        self.mask = bytearray()
+
+    def append(self, value: Any) -> None:
+        number = _to_int32(value)
+        if number is None:
+            self.values.append(0)
+            self.mask.append(1)
+        else:
+            self.values.append(number)
+            self.mask.append(0)
+
+    def to_array(self) -> pd.api.extensions.ExtensionArray:
+        return pd.arrays.IntegerArray(
+            np.frombuffer(self.values, dtype=np.int32).copy(),
+            np.frombuffer(self.mask, dtype=np.bool_).copy(),
+        )
+
+
+class _Float64Column:
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        self.values = array("d")
+
+    def append(self, value: Any) -> None:
+        number = _to_float(value)
+        self.values.append(math.nan if number is None else number)
+
+    def to_array(self) -> np.ndarray:
+        return np.frombuffer(self.values, dtype=np.float64).copy()
+
+
+class ScrimFrameBuilder:
+    """
+    プレイヤー行を dict のリストではなく型付きの列バッファへ直接積み上げる。
+
+    - カウント系（survival_time を除く）/ placement: int32（欠損は pandas の Int32 マスク）
+    - survival_time / accuracy / headshots_accuracy: float64。欠損した率は build() 時にまとめて計算する
+      （float32 だと xlsx に 33.33000183... のような値が出るため、率も float64 のまま持つ）
+    - team_name / team_num / character: category（API の値を文字列にしたもの）、player_name: str
+    列の並びは RAW_ID_COLUMNS + REQUIRED_HEADERS のまま。
+    """
+
+    def __init__(self, group_label: str, scrim_uuid: str) -> None:
+        self._group = group_label or ""
+        self._scrim_id = scrim_uuid
+        self._game = array("i")
+        self._ints: Dict[str, _Int32Column] = {col: _Int32Column() for col in _INT_COLUMNS}
+        self._floats: Dict[str, _Float64Column] = {col: _Float64Column() for col in _FLOAT_COLUMNS}
+        self._labels: Dict[str, List[Optional[str]]] = {col: [] for col in _CATEGORY_COLUMNS}
+        self._player_names: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self._game)
+
+    def append(
+        self,
+        *,
+        game: int,
+        team_name: Any,
+        team_num: Any,
+        player_name: Any,
+        character: Any,
+        placement: Any,
+        kills: Any,
+        assists: Any,
+        damage: Any,
+        shots: Any,
+        hits: Any,
+        accuracy: Any,
+        headshots: Any,
+        headshots_accuracy: Any,
+        survival_time: Any,
+    ) -> None:
+        self._game.append(int(game))
+        ints = self._ints
+        ints["placement"].append(placement)
+        ints["kills"].append(kills)
+        ints["assists"].append(assists)
+        ints["damage"].append(damage)
+        ints["shots"].append(shots)
+        ints["hits"].append(hits)
+        ints["headshots"].append(headshots)
+        floats = self._floats
+        floats["survival_time"].append(survival_time)
+        floats["accuracy"].append(accuracy)
+        floats["headshots_accuracy"].append(headshots_accuracy)
+        self._labels["team_name"].append(_to_label(team_name))
+        self._labels["team_num"].append(_to_label(team_num))
+        self._labels["character"].append(_to_label(character))
+        self._player_names.append(_to_label(player_name))
+
+    def build(self, *, sort: bool = True) -> pd.DataFrame:
+        n = len(self._game)
+        data: Dict[str, Any] = {
+            "group": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[self._group]),
+            "scrim_id": pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[self._scrim_id]),
+            "game": np.frombuffer(self._game, dtype=np.int32).copy(),
+            "player_name": pd.array(self._player_names, dtype=object),
+        }
+        for col, column in self._ints.items():
+            data[col] = column.to_array()
+        for col, column in self._floats.items():
+            data[col] = column.to_array()
+        for col, labels in self._labels.items():
+            data[col] = _label_categorical(labels)
+
+        df = pd.DataFrame(data, columns=RAW_COLUMN_ORDER)
+        _fill_rates(df)
+        if sort:
+            df = df.sort_values(
+                ["game", "placement", "team_name", "player_name"], na_position="last"
+            ).reset_index(drop=True)
+        return df
+
+
+def _fill_rates(df: pd.DataFrame) -> None:
+    """
+    欠損している accuracy（hits / shots）と headshots_accuracy（headshots / hits）を
+    ベクトル演算で埋める（従来の行ごとの計算と同じ規則: 分母が 0 なら 0、分子・分母が欠損なら埋めない）。
+    """
+    for column, numerator, denominator in (
+        ("accuracy", "hits", "shots"),
+        ("headshots_accuracy", "headshots", "hits"),
+    ):
+        num = df[numerator].to_numpy(dtype=np.float64, na_value=np.nan)
+        den = df[denominator].to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(df[column].to_numpy()) & ~np.isnan(num) & ~np.isnan(den)
+        if not missing.any():
+            continue
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(den > 0, num / den * 100.0, 0.0)
+        df.loc[missing, column] = rate[missing]
+
+
+def apply_raw_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """dict 行から作った生データ DataFrame（旧ヒューリスティック経路）を同じ型に揃える。"""
+    out = df.copy()
+    for col in RAW_COLUMN_ORDER:
+        if col not in out.columns:
+            out[col] = None
+    for col in _INT_COLUMNS:
+        out[col] = pd.array([_to_int32(v) for v in out[col]], dtype="Int32")
+    for col in _FLOAT_COLUMNS:
+        out[col] = np.array([_to_float(v) for v in out[col]], dtype=np.float64)
+    for col in _CATEGORY_COLUMNS + ["group", "scrim_id"]:
+        out[col] = _label_categorical([_to_label(v) for v in out[col]])
+    out["game"] = pd.to_numeric(out["game"], errors="coerce").fillna(0).astype(np.int32)
+    out = out[RAW_COLUMN_ORDER]
+    _fill_rates(out)
+    return out
+
+
+def concat_raw_frames(frames: Sequence[pd.DataFrame]) -> pd.DataFrame:
+    """
+    複数グループの生データを縦に連結する。
+
+    そのまま pd.concat するとカテゴリの異なる category 列が object に戻ってしまうため、
+    先にカテゴリを和集合にそろえてから連結し、型付きの列（category / Int32 / float64）を保つ。
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(columns=RAW_COLUMN_ORDER)
+    for column in frames[0].columns:
+        if not all(column in f.columns and isinstance(f[column].dtype, pd.CategoricalDtype) for f in frames):
+            continue
+        categories = union_categoricals([f[column].array for f in frames]).categories
+        frames = [f.assign(**{column: f[column].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,160 @@
+"""Queue-backed progress reporting that coalesces log lines into one status message."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+__all__ = [
+    "ProgressReporter",
+    "ProgressStats",
+]
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M")
+
+# Discord のメッセージ上限（2000 文字）に余裕を持たせる
+DEFAULT_MAX_LENGTH = 1900
+
+# キューに入れる項目: (本文, 独立したメッセージとして送るか)。本文 None は終了の合図
+_Item = Tuple[Optional[str], bool]
+
+
+@dataclass(slots=True)
+class ProgressStats:
+    lines: int = 0
+    sent: int = 0
+    edited: int = 0
+    failed: int = 0
+
+
+class ProgressReporter(Generic[M]):
+    """
+    進捗の行を非同期キューに積み、別タスクで 1 つの状態メッセージへの編集にまとめて送る。
+
+    post() / log() はキューに入れてすぐ戻るので、EntryScheduler の log_hook に渡しても
+    応募の送信や再試行が Discord への送信（やそのレート制限）を待つことはない。
+    タスクは最初の post() で起動し、1 回送る（send / edit）ごとに interval 秒あけて、その間に
+    届いた行をまとめる。状態メッセージが max_length を超えそうなら次の行から新しいメッセージにする。
+    post_message() は結果の通知など、状態メッセージとは別の 1 通として（それまでの行を送ってから）送る。
+    send が None を返す・送信や編集で例外が出たときはログだけ残し、次の送信で送り直す。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Optional[M]]],
+        edit: Callable[[M, str], Awaitable[Any]],
+        *,
+        interval: float = 1.0,
+        max_length: int = DEFAULT_MAX_LENGTH,
+    ) -> None:
+        self._send = send
+        self._edit = edit
+        self._interval = interval
+        self._max_length = max_length
+        self._queue: asyncio.Queue[_Item] = asyncio.Queue()
+        self._task: Optional[asyncio.Task[None]] = None
+        self._closed = False
+        self._message: Optional[M] = None
+        self._lines: List[str] = []
+        self._dirty = False
+        self.stats = ProgressStats()
+
+    def post(self, text: str) -> None:
+        """状態メッセージに 1 行足す（送信は待たない）。"""
+        self._put((text, False))
+
+    def post_message(self, text: str) -> None:
+        """状態メッセージとは別の 1 通として送る（送信は待たない）。"""
+        self._put((text, True))
+
+    async def log(self, text: str) -> None:
+        """EntryScheduler の log_hook として使う。"""
+        self.post(text)
+
+    def close(self) -> None:
+        """残りを送り終えたらタスクを終える（待たない）。"""
+        if not self._closed:
+            self._closed = True
+            if self._task is not None:
+                self._queue.put_nowait((None, False))
+
+    async def aclose(self) -> None:
+        self.close()
+        if self._task is not None:
+            await self._task
+
+    def _put(self, item: _Item) -> None:
+        if self._closed:
+            logger.warning("終了した進捗表示への送信を破棄しました: %s", item[0])
+            return
+        self._queue.put_nowait(item)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="entry-progress")
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for text, standalone in batch:
+                if text is None:
+                    await self._flush()
+                    return
+                if standalone:
+                    await self._flush()
+                    await self._deliver(text)
+                else:
+                    await self._append(text)
+            await self._flush()
+            await asyncio.sleep(self._interval)
+
+    async def _append(self, line: str) -> None:
+        self.stats.lines += 1
+        line = line[: self._max_length]
+        if self._lines and len(self._render()) + 1 + len(line) > self._max_length:
+            # 今のメッセージは確定させ（送れなかった行は諦める）、ここから新しい状態メッセージにする
+            await self._flush()
+            self._message = None
+            self._lines = []
+            self._dirty = False
+        self._lines.append(line)
+        self._dirty = True
+
+    async def _flush(self) -> None:
+        if not self._dirty:
+            return
+        content = self._render()
+        try:
+            if self._message is None:
+                self._message = await self._send(content)
+                if self._message is None:
+                    self.stats.failed += 1
+                    return
+                self.stats.sent += 1
+            else:
+                await self._edit(self._message, content)
+                self.stats.edited += 1
+        except Exception as exc:  # noqa: BLE001
+            # 消されたメッセージの編集などは、次の送信で新しいメッセージにする
+            logger.warning("進捗メッセージを更新できませんでした: %s", exc)
+            self.stats.failed += 1
+            self._message = None
+            return
+        self._dirty = False
+
+    async def _deliver(self, text: str) -> None:
+        try:
+            sent = await self._send(text[: self._max_length])
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("進捗メッセージを送信できませんでした: %s", exc)
+            sent = None
+        if sent is None:
+            self.stats.failed += 1
+            return
+        self.stats.sent += 1
+
+    def _render(self) -> str:
+        return "\n".join(self._lines)
@@ -0,0 +1,495 @@
+"""Async, connection-pooled client for the ESCL public API (scrim results)."""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import logging
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+import pandas as pd
+
+from .api_scraper import (
+    BUCKET_ENDPOINT,
+    KEY_FORMAT_GID_JSON,
+    BucketKeyFormatMemory,
+    bucket_as_dict,
+    build_bucket_key,
+    extract_dataframe_from_bucket,
+    format_group_label,
+    group_id_from_payload,
+    group_num_from_bucket,
+    group_num_from_payload,
+    normalize_uuid,
+    parse_scrim_group_from_url,
+    sanitize_scrim_title,
+    scrim_finished_from_payload,
+    scrim_name_from_payload,
+    scrim_title_from_payload,
+)
+from .bucket_archive import BucketArchive, BucketArchiveMiss
+from .bucket_stream import BucketPayload, decode_bucket_payload
+from .cache import TTLCache, content_hash
+from .escl_api import BASE_URL, ESCLAPIError, ESCLNetworkError
+from .rate_limit import Priority, RateLimitGovernor
+from .singleflight import SingleFlight
+
+__all__ = [
+    "ESCLPublicApiClient",
+    "ESCLPublicHTTPError",
+]
+
+logger = logging.getLogger(__name__)
+
+GROUP_ENDPOINT = "public.v1.PublicGroupService/GetGroupByUUID"
+SCRIM_ENDPOINT = "public.v1.PublicScrimService/GetScrim"
+
+_PUBLIC_HEADERS = {
+    "content-type": "application/json",
+    "accept": "application/json",
+    "user-agent": "Mozilla/5.0 (ESCL Bot)",
+    "origin": "https://fightnt.escl.co.jp",
+    "referer": "https://fightnt.escl.co.jp/",
+}
+
+
+class ESCLPublicHTTPError(ESCLAPIError):
+    """Raised when the public API answers with a non-2xx status."""
+
+    def __init__(self, message: str, *, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def bucket_cache_key(scrim_uuid: str, group_uuid: str) -> str:
+    return f"bucket:{scrim_uuid}/{group_uuid}"
+
+
+def scrim_cache_key(scrim_uuid: str) -> str:
+    return f"scrim:{scrim_uuid}"
+
+
+def group_cache_key(group_uuid: str) -> str:
+    return f"group:{group_uuid}"
+
+
+class ESCLPublicApiClient:
+    """
+    ESCL 公開 API（GetBucket / GetScrim / GetGroupByUUID）向けの非同期クライアント。
+
+    httpx.AsyncClient を 1 つ保持して keep-alive 接続を使い回すため、
+    同じプロセス内の連続リクエストでは TLS ハンドシェイクが発生しない。
+    http2=None の場合は h2 パッケージが導入済みのときだけ HTTP/2 を有効化する。
+
+    応答は TTLCache に保存し（bucket は scrim_uuid/group_uuid、Scrim は scrim_uuid 単位）、
+    期限切れ後は ETag / content hash で再検証する。終了済み Scrim（finished=true）の
+    エントリは pin され、以降の再エクスポートでは ESCL へ問い合わせない。
+    同じグループの GetBucket が同時に走っている間は、後から来た呼び出しもその結果を待つ。
+
+    GetBucket で成功したキー形式はデプロイ単位・Scrim 単位で記憶し、次回は 1 リクエストで済ませる。
+    race_key_formats=True のときは、未学習の Scrim に対して全キー形式を並行に投げて最初の成功を採用する。
+
+    archive を渡すと、ESCL から取得した応答本文をすべて BucketArchive に保存する。
+    offline=True のときは通信せず、archive に保存済みの最新の応答だけで答える（無ければ BucketArchiveMiss）。
+
+    governor を渡すと、送信は Priority.REPORT でトークンを取ってから行う（応募の送信が優先される）。
+    """
+
+    def __init__(
+        self,
+        *,
+        request_timeout: float = 20.0,
+        max_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        http2: Optional[bool] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[TTLCache[Any]] = None,
+        cache_ttl: float = 60.0,
+        cache_max_entries: int = 256,
+        key_formats: Optional[BucketKeyFormatMemory] = None,
+        race_key_formats: bool = False,
+        archive: Optional[BucketArchive] = None,
+        offline: bool = False,
+        governor: Optional[RateLimitGovernor] = None,
+    ) -> None:
+        if offline and archive is None:
+            raise ValueError("offline=True には archive の指定が必要です。")
+        if client is None:
+            use_http2 = _http2_available() if http2 is None else http2
+            client = httpx.AsyncClient(
+                base_url=BASE_URL,
+                timeout=request_timeout,
+                headers=_PUBLIC_HEADERS,
+                http2=use_http2,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+            )
+            self._owns_client = True
+        else:
+            self._owns_client = False
+        self._client = client
+        self._cache: TTLCache[Any] = (
+            cache if cache is not None else TTLCache(ttl=cache_ttl, max_entries=cache_max_entries)
+        )
+        self._key_formats = key_formats or BucketKeyFormatMemory()
+        self._race_key_formats = race_key_formats
+        self._deployment = str(self._client.base_url)
+        self._archive = archive
+        self._offline = offline
+        self._bucket_flights = SingleFlight()
+        self._governor = governor
+
+    @property
+    def cache(self) -> TTLCache[Any]:
+        return self._cache
+
+    @property
+    def archive(self) -> Optional[BucketArchive]:
+        return self._archive
+
+    @property
+    def offline(self) -> bool:
+        return self._offline
+
+    async def __aenter__(self) -> "ESCLPublicApiClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def post_json(self, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self._send(endpoint, payload)
+        _raise_for_status(response, payload)
+        return _parse_json(response)
+
+    async def _send(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        *,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        if self._offline:
+            raise BucketArchiveMiss(f"オフラインモードでは ESCL に問い合わせません: {endpoint}")
+        if self._governor is not None:
+            await self._governor.acquire(endpoint, Priority.REPORT)
+        try:
+            response = await self._client.post(f"/{endpoint}", json=payload, headers=headers)
+        except httpx.RequestError as exc:
+            raise ESCLNetworkError(str(exc)) from exc
+        if self._governor is not None:
+            self._governor.observe(endpoint, response.status_code, response.headers)
+        return response
+
+    async def _cached_post(
+        self,
+        cache_key: str,
+        endpoint: str,
+        payload: Dict[str, Any],
+        *,
+        decode: Callable[[Any], Any] = lambda data: data,
+        decode_body: Optional[Callable[[bytes], Any]] = None,
+        pinned: bool = False,
+        lookup: bool = True,
+        archive_ref: Tuple[str, str] = ("", ""),
+    ) -> Any:
+        if lookup:
+            entry = self._cache.get(cache_key)
+            if entry is not None:
+                return entry.value
+
+        if self._offline:
+            return await self._replay(cache_key, endpoint, decode, decode_body, archive_ref)
+
+        stale = self._cache.peek(cache_key)
+        headers = {"if-none-match": stale.etag} if stale is not None and stale.etag else None
+        response = await self._send(endpoint, payload, headers=headers)
+        if stale is not None and response.status_code == 304:
+            self._cache.refresh(cache_key)
+            return stale.value
+        _raise_for_status(response, payload)
+
+        digest = content_hash(response.content)
+        if stale is not None and stale.content_hash == digest:
+            # 内容が変わっていなければパースし直さずに使い回す
+            self._cache.refresh(cache_key)
+            return stale.value
+
+        value = _decode_response(response, decode, decode_body)
+        self._cache.put(
+            cache_key,
+            value,
+            content_hash=digest,
+            etag=response.headers.get("etag"),
+            size=len(response.content),
+            pinned=pinned,
+        )
+        await self._archive_body(endpoint, response.content, digest, archive_ref, payload)
+        return value
+
+    async def _replay(
+        self,
+        cache_key: str,
+        endpoint: str,
+        decode: Callable[[Any], Any],
+        decode_body: Optional[Callable[[bytes], Any]],
+        archive_ref: Tuple[str, str],
+    ) -> Any:
+        assert self._archive is not None
+        scrim_uuid, group_uuid = archive_ref
+        body = await asyncio.to_thread(
+            self._archive.load, endpoint, scrim_uuid=scrim_uuid, group_uuid=group_uuid
+        )
+        if decode_body is not None:
+            value = decode_body(body)
+        else:
+            try:
+                value = decode(json.loads(body))
+            except ValueError as exc:
+                raise ESCLAPIError(f"アーカイブの応答を JSON として解釈できません: {endpoint}") from exc
+        # アーカイブは不変なので pin して以降は読み直さない
+        self._cache.put(cache_key, value, content_hash=content_hash(body), size=len(body), pinned=True)
+        return value
+
+    async def _archive_body(
+        self,
+        endpoint: str,
+        body: bytes,
+        digest: str,
+        archive_ref: Tuple[str, str],
+        payload: Dict[str, Any],
+    ) -> None:
+        if self._archive is None:
+            return
+        scrim_uuid, group_uuid = archive_ref
+        try:
+            await asyncio.to_thread(
+                self._archive.put,
+                endpoint,
+                body,
+                scrim_uuid=scrim_uuid,
+                group_uuid=group_uuid,
+                key=str(payload.get("key", "")),
+                digest=digest,
+            )
+        except OSError as exc:
+            # 保存に失敗しても取得結果は返す
+            logger.warning("応答のアーカイブに失敗しました: %s (%s)", endpoint, exc)
+
+    def _scrim_is_finished(self, scrim_uuid: str) -> bool:
+        entry = self._cache.peek(scrim_cache_key(scrim_uuid))
+        return entry is not None and scrim_finished_from_payload(entry.value)
+
+    def bucket_content_hash(self, scrim_uuid: str, group_uuid: str) -> Optional[str]:
+        """キャッシュ済みの GetBucket 応答本文の sha256（未取得・追い出し済みなら None）。"""
+        entry = self._cache.peek(bucket_cache_key(normalize_uuid(scrim_uuid), normalize_uuid(group_uuid)))
+        return entry.content_hash if entry is not None else None
+
+    async def get_group_bucket(self, scrim_uuid: str, group_uuid: str) -> Any:
+        """api_scraper.get_group_bucket の非同期版（学習済みのキー形式から試す）。"""
+        return bucket_as_dict(await self.get_group_bucket_payload(scrim_uuid, group_uuid))
+
+    async def get_group_bucket_payload(self, scrim_uuid: str, group_uuid: str) -> Optional[BucketPayload]:
+        """
+        GetBucket の value を BucketPayload のまま返す。
+
+        キャッシュにも value 文字列のまま載せ、試合は抽出時に 1 つずつデコードする。
+        """
+        scrim_uuid = normalize_uuid(scrim_uuid)
+        group_uuid = normalize_uuid(group_uuid)
+        cache_key = bucket_cache_key(scrim_uuid, group_uuid)
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            return entry.value
+        # 同じグループを同時に頼まれたら（スクリム終了直後の出力集中など）取得は 1 回にまとめる
+        return await self._bucket_flights.do(cache_key, lambda: self._load_bucket(scrim_uuid, group_uuid))
+
+    async def _load_bucket(self, scrim_uuid: str, group_uuid: str) -> Optional[BucketPayload]:
+        cache_key = bucket_cache_key(scrim_uuid, group_uuid)
+        if self._offline:
+            # アーカイブは (scrim, group) 単位なのでキー形式を試す必要はない
+            return await self._cached_post(
+                cache_key,
+                BUCKET_ENDPOINT,
+                {},
+                decode_body=decode_bucket_payload,
+                lookup=False,
+                archive_ref=(scrim_uuid, group_uuid),
+            )
+
+        if self._race_key_formats and self._key_formats.preferred(self._deployment, scrim_uuid) is None:
+            return await self._race_bucket(scrim_uuid, group_uuid)
+
+        last_exc: Optional[Exception] = None
+        for key_format in self._key_formats.order(self._deployment, scrim_uuid):
+            try:
+                return await self._fetch_bucket(key_format, scrim_uuid, group_uuid)
+            except (ESCLAPIError, LookupError) as exc:
+                last_exc = exc
+        raise _bucket_error(last_exc)
+
+    async def _fetch_bucket(self, key_format: str, scrim_uuid: str, group_uuid: str) -> Optional[BucketPayload]:
+        group_ref: Any = group_uuid
+        if key_format == KEY_FORMAT_GID_JSON:
+            # 数値 groupId が必要な形式だけ追加で解決する
+            group_ref = await self.get_group_id(group_uuid)
+            if group_ref is None:
+                raise LookupError(f"groupId を解決できませんでした: {group_uuid}")
+        key = build_bucket_key(key_format, scrim_uuid, group_ref)
+        logger.debug("GetBucket key=%s", key)
+        bucket = await self._cached_post(
+            bucket_cache_key(scrim_uuid, group_uuid),
+            BUCKET_ENDPOINT,
+            {"key": key},
+            decode_body=decode_bucket_payload,
+            pinned=self._scrim_is_finished(scrim_uuid),
+            lookup=False,
+            archive_ref=(scrim_uuid, group_uuid),
+        )
+        self._key_formats.remember(self._deployment, scrim_uuid, key_format)
+        return bucket
+
+    async def _race_bucket(self, scrim_uuid: str, group_uuid: str) -> Optional[BucketPayload]:
+        """全キー形式を並行に投げ、最初に成功した応答を採用して残りはキャンセルする。"""
+        pending = {
+            asyncio.create_task(self._fetch_bucket(key_format, scrim_uuid, group_uuid))
+            for key_format in self._key_formats.order(self._deployment, scrim_uuid)
+        }
+        last_exc: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        return task.result()
+                    if not isinstance(exc, (ESCLAPIError, LookupError)):
+                        raise exc
+                    last_exc = exc
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise _bucket_error(last_exc)
+
+    async def get_group(self, group_uuid: str) -> Dict[str, Any]:
+        group_uuid = normalize_uuid(group_uuid)
+        return await self._cached_post(
+            group_cache_key(group_uuid), GROUP_ENDPOINT, {"uuid": group_uuid}, archive_ref=("", group_uuid)
+        )
+
+    async def get_group_id(self, group_uuid: str) -> Optional[int]:
+        try:
+            return group_id_from_payload(await self.get_group(group_uuid))
+        except (ESCLAPIError, TypeError, ValueError):
+            return None
+
+    async def get_scrim(self, scrim_uuid: str) -> Dict[str, Any]:
+        """GetScrim の応答。終了済みなら Scrim と配下の bucket を pin する。"""
+        scrim_uuid = normalize_uuid(scrim_uuid)
+        cache_key = scrim_cache_key(scrim_uuid)
+        data = await self._cached_post(
+            cache_key, SCRIM_ENDPOINT, {"uuid": scrim_uuid}, archive_ref=(scrim_uuid, "")
+        )
+        if scrim_finished_from_payload(data):
+            self._cache.pin(cache_key)
+            self._cache.pin_prefix(bucket_cache_key(scrim_uuid, ""))
+        return data
+
+    async def get_scrim_name(self, scrim_uuid: str, group_uuid: Optional[str] = None) -> Optional[str]:
+        try:
+            data = await self.get_scrim(scrim_uuid)
+        except ESCLAPIError:
+            return None
+        return scrim_name_from_payload(data)
+
+    async def get_scrim_and_group_labels(self, parent_url: str) -> Tuple[str, str]:
+        """api_scraper.get_scrim_and_group_labels の非同期版（bucket はキャッシュを共有）。"""
+        scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
+
+        scrim_title = ""
+        try:
+            scrim_title = scrim_title_from_payload(await self.get_scrim(scrim_uuid))
+        except ESCLAPIError:
+            pass
+
+        gnum = None
+        try:
+            gnum = group_num_from_bucket(await self.get_group_bucket_payload(scrim_uuid, group_uuid))
+        except (ESCLAPIError, ValueError):
+            pass
+        if gnum is None:
+            try:
+                gnum = group_num_from_payload(await self.get_group(group_uuid))
+            except ESCLAPIError:
+                pass
+
+        return sanitize_scrim_title(scrim_title), format_group_label(gnum)
+
+    async def collect_csv_from_parent_url(
+        self,
+        parent_url: str,
+        group_label: str = "",
+        max_games: int = 6,
+        *,
+        executor: Optional[Executor] = None,
+    ) -> pd.DataFrame:
+        """
+        api_scraper.collect_csv_from_parent_url の非同期版。
+
+        抽出（pandas）は executor（None なら既定のスレッドプール）で実行し、イベントループを塞がない。
+        """
+        scrim_uuid, group_uuid = parse_scrim_group_from_url(parent_url)
+        bucket = await self.get_group_bucket_payload(scrim_uuid, group_uuid)
+        extract = partial(extract_dataframe_from_bucket, bucket, scrim_uuid, group_label, max_games=max_games)
+        return await asyncio.get_running_loop().run_in_executor(executor, extract)
+
+
+def _bucket_error(last_exc: Optional[BaseException]) -> BaseException:
+    if isinstance(last_exc, ESCLAPIError):
+        return last_exc
+    return ESCLAPIError(f"GetBucket のキーを解決できませんでした: {last_exc}")
+
+
+def _raise_for_status(response: httpx.Response, payload: Dict[str, Any]) -> None:
+    if response.is_error:
+        # 404などの時に、投げたpayloadと短いレスポンス本文を表示
+        message = f"{response.status_code} for {response.url} payload={payload}"
+        message += f" resp={response.text[:200]}"
+        raise ESCLPublicHTTPError(message, status_code=response.status_code)
+
+
+def _decode_response(
+    response: httpx.Response,
+    decode: Callable[[Any], Any],
+    decode_body: Optional[Callable[[bytes], Any]],
+) -> Any:
+    if decode_body is None:
+        return decode(_parse_json(response))
+    # 応答本文を直接デコードする（response.json() で全体を dict にしない）
+    try:
+        return decode_body(response.content)
+    except ValueError as exc:
+        raise ESCLAPIError(f"JSON として解釈できない応答です: {response.url}") from exc
+
+
+def _parse_json(response: httpx.Response) -> Dict[str, Any]:
+    try:
+        return response.json()
+    except ValueError as exc:
+        raise ESCLAPIError(f"JSON として解釈できない応答です: {response.url}") from exc
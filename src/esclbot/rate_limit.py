@@ -0,0 +1,296 @@
+"""Process-wide outbound rate limiting and retry policy for the ESCL API."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable, Dict, Mapping, Optional, Set
+
+__all__ = [
+    "Priority",
+    "RateLimit",
+    "RateLimitGovernor",
+    "RateLimitStats",
+    "RetryPolicy",
+    "retry_after_seconds",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """送信の優先度（小さいほど先）。"""
+
+    ENTRY = 0  # 応募の送信（CreateApplication）
+    INTERACTIVE = 1  # コマンドから直接呼ぶ照会
+    REPORT = 2  # 集計用の取得（GetBucket など）
+
+
+@dataclass(slots=True, frozen=True)
+class RateLimit:
+    # 1 秒あたりに補充するトークン数と、貯められる上限
+    rate: float
+    burst: float
+
+
+# ESCL は上限を公開していないので控えめな値にする。同時に発火する複数チームの応募は burst で通す
+DEFAULT_HOST_LIMIT = RateLimit(rate=10.0, burst=20.0)
+DEFAULT_ENDPOINT_LIMIT = RateLimit(rate=5.0, burst=10.0)
+
+
+@dataclass(slots=True, frozen=True)
+class RetryPolicy:
+    """
+    応募の再試行の方針（ジョブごとに指定できる）。
+
+    - 422 など再試行できる応答のあとは interval 秒待つ
+    - 429 のあとは Retry-After / RateLimit-Reset が分かればその秒数、無ければ
+      backoff_after_429 × multiplier^(連続した 429 の回数 - 1) 秒を追加で待つ（max_delay まで）
+    - どの待ち時間も ±jitter の割合で揺らし、複数のジョブの再試行が重ならないようにする
+    """
+
+    max_attempts: int = 3
+    interval: float = 0.5
+    backoff_after_429: float = 1.0
+    multiplier: float = 2.0
+    max_delay: float = 10.0
+    jitter: float = 0.2
+
+    def retry_delay(self, rng: random.Random) -> float:
+        return self._jittered(self.interval, rng)
+
+    def throttle_delay(self, throttles: int, retry_after: Optional[float], rng: random.Random) -> float:
+        if retry_after is not None:
+            # サーバーの指定より早く送っても 429 になるだけなので、揺らすのは遅らせる方向だけ
+            return min(retry_after, self.max_delay) * (1.0 + rng.uniform(0.0, self.jitter))
+        base = self.backoff_after_429 * self.multiplier ** max(throttles - 1, 0)
+        return self._jittered(min(base, self.max_delay), rng)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "RetryPolicy":
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**known)
+
+    def _jittered(self, delay: float, rng: random.Random) -> float:
+        if not self.jitter:
+            return delay
+        return max(delay * (1.0 + rng.uniform(-self.jitter, self.jitter)), 0.0)
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]], *, now: Optional[float] = None) -> Optional[float]:
+    """
+    応答ヘッダーから、次に送ってよいまでの秒数を読む（分からなければ None）。
+
+    Retry-After（秒数または HTTP 日付）を優先し、無ければ RateLimit-Remaining / X-RateLimit-Remaining が
+    0 のときの RateLimit-Reset / X-RateLimit-Reset（秒数、または大きな値なら UNIX 時刻）を使う。
+    """
+    if not headers:
+        return None
+    lowered = {key.lower(): value for key, value in headers.items()}
+    current = time.time() if now is None else now
+    retry_after = lowered.get("retry-after")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(retry_after).timestamp() - current, 0.0)
+        except (TypeError, ValueError):
+            pass
+    for prefix in ("ratelimit-", "x-ratelimit-"):
+        remaining = lowered.get(f"{prefix}remaining")
+        reset = lowered.get(f"{prefix}reset")
+        if remaining is None or reset is None:
+            continue
+        try:
+            if float(remaining) > 0:
+                return None
+            value = float(reset)
+        except ValueError:
+            continue
+        # 10 年分より大きければ UNIX 時刻とみなす
+        return max(value - current, 0.0) if value > 315_360_000 else max(value, 0.0)
+    return None
+
+
+@dataclass(slots=True)
+class RateLimitStats:
+    acquired: int = 0
+    # トークンや優先度の都合で待たされた回数と、その合計秒数
+    waited: int = 0
+    wait_seconds: float = 0.0
+    # 待っている低い優先度の送信を追い越して送った回数
+    preempted: int = 0
+    # 429 やレート制限ヘッダーで送信を止めた回数
+    throttled: int = 0
+    throttled_by_endpoint: Dict[str, int] = field(default_factory=dict)
+
+
+class _TokenBucket:
+    __slots__ = ("limit", "tokens", "updated", "paused_until")
+
+    def __init__(self, limit: RateLimit, now: float) -> None:
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = now
+        self.paused_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        """トークンを 1 つ取れるまでの秒数（0 なら今すぐ取れる）。"""
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.updated) * self.limit.rate)
+        self.updated = now
+        wait = self.paused_until - now
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) / self.limit.rate)
+        return max(wait, 0.0)
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+
+class RateLimitGovernor:
+    """
+    ESCL への送信をプロセス全体で調停する。
+
+    ホスト全体と endpoint ごとのトークンバケットを両方通ったものだけを送る。待っている送信のうち
+    優先度の高いもの（Priority.ENTRY）が 1 つでもあれば、低いものはトークンがあっても譲る。
+    preempt() の間は、待っている送信がいなくても低い優先度の送信を止める（応募の発火前後に
+    集計の取得が割り込まないようにする）。429 や RateLimit ヘッダーを observe() に渡すと、
+    その endpoint を指定の秒数だけ止める。同じイベントループから使う。
+    """
+
+    def __init__(
+        self,
+        *,
+        host: RateLimit = DEFAULT_HOST_LIMIT,
+        endpoints: Optional[Mapping[str, RateLimit]] = None,
+        default: RateLimit = DEFAULT_ENDPOINT_LIMIT,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._clock = clock or time.monotonic
+        self._host = _TokenBucket(host, self._clock())
+        self._limits = {_endpoint_name(name): limit for name, limit in (endpoints or {}).items()}
+        self._default = default
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._waiting: Dict[int, int] = {}
+        self._windows: Dict[int, int] = {}
+        self._wakeups: Set[asyncio.Future[None]] = set()
+        self.stats = RateLimitStats()
+
+    async def acquire(self, endpoint: str, priority: Priority = Priority.REPORT) -> None:
+        """endpoint に 1 回送ってよくなるまで待つ。"""
+        name = _endpoint_name(endpoint)
+        bucket = self._bucket(name)
+        started = self._clock()
+        waited = False
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                now = self._clock()
+                if self._outranked(priority):
+                    delay: Optional[float] = None
+                else:
+                    delay = max(self._host.wait_time(now), bucket.wait_time(now))
+                    if delay <= 0:
+                        self._host.take()
+                        bucket.take()
+                        if any(count and level > priority for level, count in self._waiting.items()):
+                            self.stats.preempted += 1
+                        break
+                waited = True
+                await self._sleep(delay)
+        finally:
+            self._waiting[priority] -= 1
+            self._wake_all()
+        self.stats.acquired += 1
+        if waited:
+            self.stats.waited += 1
+            self.stats.wait_seconds += self._clock() - started
+
+    @contextlib.asynccontextmanager
+    async def preempt(self, priority: Priority = Priority.ENTRY) -> AsyncIterator[None]:
+        """この中にいる間、priority より低い優先度の送信を止める。"""
+        self._windows[priority] = self._windows.get(priority, 0) + 1
+        try:
+            yield
+        finally:
+            self._windows[priority] -= 1
+            self._wake_all()
+
+    def observe(
+        self, endpoint: str, status_code: Optional[int], headers: Optional[Mapping[str, str]]
+    ) -> Optional[float]:
+        """応答を見て、429 やレート制限ヘッダーがあれば endpoint を止める。止めた秒数を返す。"""
+        pause = retry_after_seconds(headers)
+        if pause is None and status_code == 429:
+            pause = 1.0
+        if pause is None or pause <= 0:
+            return None
+        self.throttle(endpoint, pause)
+        return pause
+
+    def throttle(self, endpoint: str, seconds: float) -> None:
+        name = _endpoint_name(endpoint)
+        bucket = self._bucket(name)
+        bucket.paused_until = max(bucket.paused_until, self._clock() + seconds)
+        self.stats.throttled += 1
+        self.stats.throttled_by_endpoint[name] = self.stats.throttled_by_endpoint.get(name, 0) + 1
+        logger.warning("ESCL のレート制限により %s への送信を %.1f 秒止めます", name, seconds)
+        self._wake_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = self._clock()
+        return {
+            **asdict(self.stats),
+            "waiting": {Priority(p).name.lower(): n for p, n in self._waiting.items() if n},
+            "paused": {
+                name: round(bucket.paused_until - now, 3)
+                for name, bucket in self._buckets.items()
+                if bucket.paused_until > now
+            },
+        }
+
+    def _bucket(self, name: str) -> _TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = _TokenBucket(self._limits.get(name, self._default), self._clock())
+        return bucket
+
+    def _outranked(self, priority: Priority) -> bool:
+        counts = (*self._waiting.items(), *self._windows.items())
+        return any(count and level < priority for level, count in counts)
+
+    async def _sleep(self, delay: Optional[float]) -> None:
+        """delay 秒か、ほかの送信の状態が変わる（_wake_all）まで待つ。"""
+        loop = asyncio.get_running_loop()
+        wakeup = loop.create_future()
+        self._wakeups.add(wakeup)
+        timer = None if delay is None else loop.call_later(delay, _resolve, wakeup)
+        try:
+            await wakeup
+        finally:
+            self._wakeups.discard(wakeup)
+            if timer is not None:
+                timer.cancel()
+
+    def _wake_all(self) -> None:
+        for wakeup in list(self._wakeups):
+            _resolve(wakeup)
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _endpoint_name(endpoint: str) -> str:
+    return endpoint.lstrip("/")
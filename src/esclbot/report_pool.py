@@ -0,0 +1,187 @@
+"""Bounded process pool for pandas / xlsxwriter report jobs."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional, Sequence
+
+__all__ = [
+    "DEFAULT_REPORT_QUEUE",
+    "DEFAULT_REPORT_WORKERS",
+    "ReportPool",
+    "ReportPoolBusy",
+    "ReportPoolStats",
+    "run_when_free",
+]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_WORKERS = 2
+DEFAULT_REPORT_QUEUE = 8
+# run_when_free() が満杯のプールの空きを確かめる間隔（秒）
+_FREE_POLL_INTERVAL = 0.2
+
+# ワーカーの親になる forkserver で先に読んでおくモジュール（各ワーカーは fork するだけで使える）
+_PACKAGE = __name__.rpartition(".")[0]
+_FORKSERVER_PRELOAD = ("pandas", "xlsxwriter", f"{_PACKAGE}.api_scraper", f"{_PACKAGE}.artifact_cache")
+
+
+class ReportPoolBusy(RuntimeError):
+    """実行中 + 待ちのジョブが上限に達していて、新しいジョブを受け付けられない。"""
+
+
+@dataclass(slots=True)
+class ReportPoolStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    in_flight: int = 0
+    peak_queued: int = 0
+
+
+class ReportPool(Executor):
+    """
+    レポート生成（抽出・集計・ブックの書き出し）専用の Executor。
+
+    pandas / xlsxwriter の処理は GIL を長く握るため、既定のスレッドプールで動かすと
+    同じプロセスのイベントループ（Gateway の heartbeat、インタラクション、EntryScheduler の
+    発火）が遅れる。ここでは別プロセス（max_workers 個）で実行し、ループ側は結果を待つだけにする。
+
+    - 実行中 + 待ちのジョブが max_workers + max_queue に達したら submit() は ReportPoolBusy を送出する
+    - ジョブの関数と引数・戻り値は pickle できるもの（モジュール直下の関数、DataFrame、bytes など）に限る
+    - ワーカーが落ちてプールが壊れたら、次の submit() で作り直す
+    - processes=False のときは同じ上限のスレッドプールで動かす（テストや 1 回きりの CLI 向け）
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_REPORT_WORKERS,
+        *,
+        max_queue: int = DEFAULT_REPORT_QUEUE,
+        processes: bool = True,
+        preload: Sequence[str] = _FORKSERVER_PRELOAD,
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers は 1 以上を指定してください。")
+        if max_queue < 0:
+            raise ValueError("max_queue は 0 以上を指定してください。")
+        self._max_workers = max_workers
+        self._max_queue = max_queue
+        self._processes = processes
+        self._preload = list(preload)
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._shutdown = False
+        self.stats = ReportPoolStats()
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    @property
+    def capacity(self) -> int:
+        return self._max_workers + self._max_queue
+
+    @property
+    def free(self) -> int:
+        """今すぐ受け付けられるジョブ数。"""
+        return max(self.capacity - self.stats.in_flight, 0)
+
+    @property
+    def queued(self) -> int:
+        """ワーカーの空きを待っているジョブ数（キューの深さ）。"""
+        return max(self.stats.in_flight - self._max_workers, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "queued": self.queued,
+                "max_workers": self._max_workers,
+                "max_queue": self._max_queue,
+            }
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future[Any]:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("ReportPool は停止済みです。")
+            if self.stats.in_flight >= self.capacity:
+                self.stats.rejected += 1
+                logger.warning(
+                    "レポート生成の待ちが上限に達しました（実行中 %d / 待ち %d）",
+                    min(self.stats.in_flight, self._max_workers),
+                    self.queued,
+                )
+                raise ReportPoolBusy("レポート生成が混み合っています。しばらくしてから再実行してください。")
+            future = self._submit_locked(fn, args, kwargs)
+            self.stats.submitted += 1
+            self.stats.in_flight += 1
+            queued = self.queued
+            self.stats.peak_queued = max(self.stats.peak_queued, queued)
+        if queued:
+            logger.info("レポート生成の待ち: %d 件", queued)
+        future.add_done_callback(self._finished)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _submit_locked(self, fn: Callable[..., Any], args: Any, kwargs: Any) -> Future[Any]:
+        if self._executor is None:
+            self._executor = self._create_executor()
+        try:
+            return self._executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            logger.warning("レポート生成のワーカーが異常終了したため、プールを作り直します")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            return self._executor.submit(fn, *args, **kwargs)
+
+    def _create_executor(self) -> Executor:
+        if not self._processes:
+            return ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="escl-report")
+        # 動作中のスレッド（discord.py・to_thread）ごと fork しないよう、fork 以外の開始方法を使う
+        if os.name == "posix" and "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(self._preload)
+        else:
+            context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=self._max_workers, mp_context=context)
+
+    def _finished(self, future: Future[Any]) -> None:
+        with self._lock:
+            self.stats.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.stats.failed += 1
+            else:
+                self.stats.completed += 1
+
+
+async def run_when_free(executor: Optional[Executor], fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    executor で fn(*args) を実行して結果を待つ。
+
+    executor が ReportPool で満杯のときは ReportPoolBusy にせず、空くまで待ってから投入する。
+    1 つの依頼の中で何件も投げる処理（スクリムの全グループの抽出など）で、一部だけ失敗させないために使う。
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        if isinstance(executor, ReportPool) and not executor.free:
+            await asyncio.sleep(_FREE_POLL_INTERVAL)
+            continue
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except ReportPoolBusy:
+            # 空きを確かめてから投入するまでの間に、ほかの依頼が埋めた
+            await asyncio.sleep(_FREE_POLL_INTERVAL)
@@ -1,192 +1,270 @@
 """Shared utilities for generating scrim reports and safe filenames."""
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 
 _ILLEGAL_FILENAME_CHARS = set(r'\/:*?"<>|')
 
+# 生データ（GAME シート / CSV）の列。api_scraper.REQUIRED_HEADERS の前に識別列が付く。
+RAW_ID_COLUMNS = ["group", "scrim_id", "game"]
+# 合計を取るカウント系の列（集計では常に数値として扱う）
+COUNT_COLUMNS = ["kills", "assists", "damage", "shots", "hits", "headshots", "survival_time"]
+# 再計算する率系の列（%）
+RATE_COLUMNS = ["accuracy", "headshots_accuracy"]
+# 部分和として持つ列。足し上げても意味が変わらない（率は分子・分母から、平均は和と件数から再計算する）
+PARTIAL_COLUMNS = [*COUNT_COLUMNS, "games_played", "placement_sum", "placement_count"]
+# ALL_GAMES はこの 3 列の組で 1 行（生データの groupby はこのキーで 1 回だけ行う）
+PLAYER_KEYS = ["player_name", "team_name", "team_num"]
+
+TEAM_TOTAL_COLUMNS = [
+    "team_name",
+    "team_num",
+    "kills",
+    "assists",
+    "damage",
+    "shots",
+    "hits",
+    "accuracy",
+    "headshots",
+    "headshots_accuracy",
+    "survival_time",
+]
+PLAYER_TOTAL_COLUMNS = [
+    "team_name",
+    "team_num",
+    "player_name",
+    "characters",
+    "games_played",
+    "kills",
+    "assists",
+    "damage",
+    "shots",
+    "hits",
+    "accuracy",
+    "headshots",
+    "headshots_accuracy",
+    "survival_time",
+    "placement_avg",
+]
+
 
 def safe_filename_component(value: str) -> str:
     """Return a filesystem safe fragment derived from ``value``."""
     return "".join(char for char in value if char not in _ILLEGAL_FILENAME_CHARS).strip()
 
 
+def _is_clean_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) and not series.hasnans
+
+
 def _ensure_numeric_columns(df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
-    result = df.copy()
-    for column in columns:
-        if column in result.columns:
-            result[column] = pd.to_numeric(result[column], errors="coerce").fillna(0)
-        else:
-            result[column] = 0
-    return result
+    """
+    columns を欠損なしの数値列にそろえる。
 
+    frame_builder で作った DataFrame は既に Int32 / float64 なので、その場合はコピーせずそのまま返す。
+    直す必要がある列だけを差し替えた浅いフレームを返し、入力は変更しない。
+    """
+    fixes: dict[str, object] = {}
+    for column in columns:
+        if column not in df.columns:
+            fixes[column] = 0
+        elif not _is_clean_numeric(df[column]):
+            fixes[column] = pd.to_numeric(df[column], errors="coerce").fillna(0)
+    if not fixes:
+        return df
+    return df.assign(**fixes)
 
-def aggregate_team_totals(df_all: pd.DataFrame) -> pd.DataFrame:
-    """Build the TEAM_TOTALS table from raw scrim data."""
-    numeric_columns = ["kills", "assists", "damage", "shots", "hits", "headshots", "survival_time"]
-    df = _ensure_numeric_columns(df_all, numeric_columns)
 
-    if "team_num" not in df.columns:
-        df["team_num"] = None
-    else:
-        df["team_num"] = df["team_num"].apply(_to_int_or_none)
+def _to_plain_numeric(series: pd.Series) -> pd.Series:
+    """集計結果の nullable 整数（Int32 の合計など）を従来どおりの numpy 数値列に戻す。"""
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(series):
+        return series.astype("int64")
+    return series
 
-    grouped = (
-        df.groupby(["team_num", "team_name"], dropna=False)[numeric_columns]
-        .sum()
-        .reset_index()
-    )
 
-    grouped["accuracy"] = (grouped["hits"] / grouped["shots"]).where(grouped["shots"] > 0, 0) * 100.0
-    grouped["headshots_accuracy"] = (
-        grouped["headshots"] / grouped["hits"]
-    ).where(grouped["hits"] > 0, 0) * 100.0
+def _decategorize(series: pd.Series) -> pd.Series:
+    """category 列（frame_builder の team_name など）を元の値の dtype に戻す。"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
 
-    grouped["accuracy"] = grouped["accuracy"].round(2)
-    grouped["headshots_accuracy"] = grouped["headshots_accuracy"].round(2)
 
-    grouped["_team_num_sort"] = grouped["team_num"].apply(
-        lambda value: value if isinstance(value, int) else 10**9
-    )
-    grouped = (
-        grouped.sort_values(by=["_team_num_sort", "team_name"], na_position="last")
-        .drop(columns="_team_num_sort")
-        .reset_index(drop=True)
+def _team_num_keys(df: pd.DataFrame) -> pd.Series:
+    if "team_num" not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    series = df["team_num"]
+    if pd.api.types.is_integer_dtype(series):
+        return series
+    # category（frame_builder のラベル）の apply はカテゴリ単位で写して float に潰れるので、値に戻してから変換する
+    return _decategorize(series).astype(object).apply(_to_int_or_none)
+
+
+@dataclass(slots=True)
+class ScrimTotals:
+    """aggregate_totals の結果（ALL_GAMES と TEAM_TOTALS）。"""
+
+    players: pd.DataFrame
+    teams: pd.DataFrame
+
+
+def aggregate_totals(df_all: pd.DataFrame) -> ScrimTotals:
+    """
+    ALL_GAMES（プレイヤー合計）と TEAM_TOTALS（チーム合計）をまとめて作る。
+
+    型そろえは 1 回だけ行い、生データの groupby もプレイヤー単位の 1 回だけにする。
+    チーム合計はプレイヤー単位の部分和をさらに足し上げて求める（合計なので結果は同じ）。
+    """
+    df = _prepare_for_totals(df_all)
+    grouped = df.groupby(PLAYER_KEYS, dropna=False, observed=True)
+    partials = _player_partials(grouped)
+    return ScrimTotals(
+        players=_player_table(partials, _unique_characters(df, grouped)),
+        teams=_team_table(partials),
     )
 
-    ordered_columns = [
-        "team_name",
-        "team_num",
-        "kills",
-        "assists",
-        "damage",
-        "shots",
-        "hits",
-        "accuracy",
-        "headshots",
-        "headshots_accuracy",
-        "survival_time",
-    ]
 
-    for column in ordered_columns:
-        if column not in grouped.columns:
-            grouped[column] = None
-
-    return grouped[ordered_columns]
+def aggregate_team_totals(df_all: pd.DataFrame) -> pd.DataFrame:
+    """Build the TEAM_TOTALS table from raw scrim data."""
+    df = _prepare_for_totals(df_all)
+    return _team_table(_player_partials(df.groupby(PLAYER_KEYS, dropna=False, observed=True)))
 
 
 def aggregate_player_totals(df_all: pd.DataFrame) -> pd.DataFrame:
     """Build the ALL_GAMES table from raw scrim data."""
-    numeric_columns = ["kills", "assists", "damage", "shots", "hits", "headshots", "survival_time"]
-    df = _ensure_numeric_columns(df_all, numeric_columns)
+    df = _prepare_for_totals(df_all)
+    grouped = df.groupby(PLAYER_KEYS, dropna=False, observed=True)
+    return _player_table(_player_partials(grouped), _unique_characters(df, grouped))
+
+
+def player_partials(df_all: pd.DataFrame) -> pd.DataFrame:
+    """
+    プレイヤー単位の部分和（PLAYER_KEYS + PARTIAL_COLUMNS + characters）。
+
+    placement は平均ではなく和と件数で持つので、別々に集計した部分和を足し上げても
+    生データをまとめて集計した結果と一致する（シーズン集計の差分更新に使う）。
+    """
+    df = _prepare_for_totals(df_all)
+    grouped = df.groupby(PLAYER_KEYS, dropna=False, observed=True)
+    partials = _player_partials(grouped)
+    partials["characters"] = _characters_column(_unique_characters(df, grouped), len(partials))
+    return partials
+
+
+def _prepare_for_totals(df_all: pd.DataFrame) -> pd.DataFrame:
+    """集計に使う列を 1 回でそろえる（カウント列は数値、placement は数値、team_num は int / None）。"""
+    df = _ensure_numeric_columns(df_all, COUNT_COLUMNS)
+
+    extra: dict[str, object] = {}
+    if "placement" not in df.columns:
+        extra["placement"] = float("nan")
+    elif not pd.api.types.is_numeric_dtype(df["placement"]):
+        extra["placement"] = pd.to_numeric(df["placement"], errors="coerce")
+    for key in ("player_name", "team_name"):
+        if key not in df.columns:
+            extra[key] = None
+    if "team_num" not in df.columns or not pd.api.types.is_integer_dtype(df["team_num"]):
+        extra["team_num"] = _team_num_keys(df)
 
-    if "placement" in df.columns:
-        df["placement"] = pd.to_numeric(df["placement"], errors="coerce")
-    else:
-        df["placement"] = None
+    return df.assign(**extra) if extra else df
 
-    for key in ("player_name", "team_name", "team_num"):
-        if key not in df.columns:
-            df[key] = None
-
-    df["_games_played"] = 1
-
-    aggregated = df.groupby(["player_name", "team_name", "team_num"], dropna=False).agg(
-        {
-            "_games_played": "sum",
-            "kills": "sum",
-            "assists": "sum",
-            "damage": "sum",
-            "shots": "sum",
-            "hits": "sum",
-            "headshots": "sum",
-            "survival_time": "sum",
-            "placement": "mean",
-        }
-    )
-    grouped = aggregated.reset_index().rename(columns={"_games_played": "games_played"})
 
-    if "character" in df.columns:
-        grouped = grouped.merge(
-            _aggregate_unique_characters(df),
-            on=["player_name", "team_name", "team_num"],
-            how="left",
-        )
-    else:
-        grouped["characters"] = None
+def _player_partials(grouped) -> pd.DataFrame:
+    """プレイヤー単位の部分和。placement は平均ではなく和と件数で持ち、後から足し上げられるようにする。"""
+    partials = grouped[COUNT_COLUMNS].sum()
+    placement = grouped["placement"]
+    partials["games_played"] = grouped.size()
+    partials["placement_sum"] = placement.sum().astype("float64")
+    partials["placement_count"] = placement.count()
+    return partials.reset_index()
 
-    grouped["games_played"] = grouped["games_played"].fillna(0).astype(int)
 
-    for column in numeric_columns:
-        grouped[column] = grouped[column].fillna(0).round(0).astype(int)
+def _unique_characters(df: pd.DataFrame, grouped) -> Optional[pd.Series]:
+    """
+    プレイヤーごとの使用キャラを初出順・重複なしで ", " 連結する（グループ番号 → 文字列）。
+
+    キャラは整数コードにして (グループ番号, コード) を 1 本の int64 にまとめ、pd.unique で
+    初出順のまま重複を落とす。空白だけの名前の判定もユニークな名前に対してだけ行う。
+    """
+    if "character" not in df.columns:
+        return None
+    codes, uniques = pd.factorize(df["character"])
+    labels = np.array([str(value) for value in uniques], dtype=object)
+    usable = np.array([bool(label.strip()) for label in labels], dtype=bool)
+    keep = codes >= 0
+    keep[keep] = usable[codes[keep]]
+
+    width = max(len(labels), 1)
+    pairs = pd.unique(grouped.ngroup().to_numpy(dtype=np.int64)[keep] * width + codes[keep])
+    if len(pairs) == 0:
+        return pd.Series(dtype=object)
+    order = np.argsort(pairs // width, kind="stable")
+    groups = pairs[order] // width
+    names = labels[pairs[order] % width]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    joined = [", ".join(chunk) for chunk in np.split(names, starts[1:])]
+    return pd.Series(joined, index=groups[starts], dtype=object)
+
+
+def _characters_column(characters: Optional[pd.Series], size: int) -> object:
+    if characters is None:
+        return None
+    joined = characters.reindex(range(size))
+    return joined.astype(object).where(joined.notna(), None).to_numpy()
 
-    grouped["accuracy"] = (grouped["hits"] / grouped["shots"]).where(grouped["shots"] > 0, 0) * 100.0
+
+def add_rate_columns(grouped: pd.DataFrame) -> None:
+    """hits / shots と headshots / hits から accuracy / headshots_accuracy（%・小数 2 桁）を入れる。"""
+    grouped["accuracy"] = ((grouped["hits"] / grouped["shots"]).where(grouped["shots"] > 0, 0) * 100.0).round(2)
     grouped["headshots_accuracy"] = (
-        grouped["headshots"] / grouped["hits"]
-    ).where(grouped["hits"] > 0, 0) * 100.0
-    grouped["accuracy"] = grouped["accuracy"].round(2)
-    grouped["headshots_accuracy"] = grouped["headshots_accuracy"].round(2)
+        (grouped["headshots"] / grouped["hits"]).where(grouped["hits"] > 0, 0) * 100.0
+    ).round(2)
 
-    grouped = grouped.rename(columns={"placement": "placement_avg"})
-    grouped["placement_avg"] = grouped["placement_avg"].round(2)
 
+def _sort_by_team(grouped: pd.DataFrame, by: list[str], ordered_columns: list[str]) -> pd.DataFrame:
     grouped["team_num"] = grouped["team_num"].apply(_to_int_or_none)
+    grouped["team_name"] = _decategorize(grouped["team_name"])
     grouped["_team_num_sort"] = grouped["team_num"].apply(
         lambda value: value if isinstance(value, int) else 10**9
     )
     grouped = (
-        grouped.sort_values(
-            by=["_team_num_sort", "team_name", "player_name"],
-            na_position="last",
-        )
+        grouped.sort_values(by=["_team_num_sort", *by], na_position="last")
         .drop(columns="_team_num_sort")
         .reset_index(drop=True)
     )
-
-    ordered_columns = [
-        "team_name",
-        "team_num",
-        "player_name",
-        "characters",
-        "games_played",
-        "kills",
-        "assists",
-        "damage",
-        "shots",
-        "hits",
-        "accuracy",
-        "headshots",
-        "headshots_accuracy",
-        "survival_time",
-        "placement_avg",
-    ]
-
     for column in ordered_columns:
         if column not in grouped.columns:
             grouped[column] = None
-
     return grouped[ordered_columns]
 
 
-def _aggregate_unique_characters(df: pd.DataFrame) -> pd.DataFrame:
-    def _unique_join(series: pd.Series) -> Optional[str]:
-        values = [str(value) for value in series if pd.notna(value) and str(value).strip()]
-        if not values:
-            return None
-        seen: list[str] = []
-        for value in values:
-            if value not in seen:
-                seen.append(value)
-        return ", ".join(seen)
-
+def _team_table(partials: pd.DataFrame) -> pd.DataFrame:
     grouped = (
-        df.groupby(["player_name", "team_name", "team_num"], dropna=False)["character"]
-        .agg(_unique_join)
+        partials.groupby(["team_num", "team_name"], dropna=False, observed=True)[COUNT_COLUMNS]
+        .sum()
         .reset_index()
     )
-    return grouped.rename(columns={"character": "characters"})
+    for column in COUNT_COLUMNS:
+        grouped[column] = _to_plain_numeric(grouped[column])
+    add_rate_columns(grouped)
+    return _sort_by_team(grouped, ["team_name"], TEAM_TOTAL_COLUMNS)
+
+
+def _player_table(partials: pd.DataFrame, characters: Optional[pd.Series]) -> pd.DataFrame:
+    grouped = partials.drop(columns=["placement_sum", "placement_count"])
+    grouped["characters"] = _characters_column(characters, len(grouped))
+
+    grouped["games_played"] = grouped["games_played"].fillna(0).astype(int)
+    for column in COUNT_COLUMNS:
+        grouped[column] = _to_plain_numeric(grouped[column]).fillna(0).round(0).astype(int)
+    add_rate_columns(grouped)
+
+    count = partials["placement_count"]
+    grouped["placement_avg"] = (partials["placement_sum"] / count).where(count > 0).astype("float64").round(2)
+    return _sort_by_team(grouped, ["team_name", "player_name"], PLAYER_TOTAL_COLUMNS)
 
 
 def _to_int_or_none(value: object) -> Optional[int]:
@@ -197,7 +275,18 @@ def _to_int_or_none(value: object) -> Optional[int]:
 
 
 __all__ = [
+    "COUNT_COLUMNS",
+    "PARTIAL_COLUMNS",
+    "PLAYER_KEYS",
+    "PLAYER_TOTAL_COLUMNS",
+    "RATE_COLUMNS",
+    "RAW_ID_COLUMNS",
+    "ScrimTotals",
+    "TEAM_TOTAL_COLUMNS",
+    "add_rate_columns",
     "aggregate_player_totals",
     "aggregate_team_totals",
+    "aggregate_totals",
+    "player_partials",
     "safe_filename_component",
 ]
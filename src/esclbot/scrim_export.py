@@ -0,0 +1,308 @@
+"""Export every group of a scrim concurrently into one merged workbook."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import logging
+import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .api_scraper import (
+    extract_dataframe_from_bucket,
+    format_group_label,
+    group_num_from_bucket,
+    group_num_from_payload,
+    parse_scrim_group_from_url,
+    sanitize_scrim_title,
+    scrim_title_from_payload,
+)
+from .defaults import DEFAULT_MAX_CONCURRENCY
+from .escl_api import ESCLAPIError
+from .frame_builder import concat_raw_frames
+from .public_api import ESCLPublicApiClient
+from .report_pool import run_when_free
+from .reports import aggregate_player_totals, aggregate_team_totals, safe_filename_component
+from .workbook import WorkbookWriter
+
+__all__ = [
+    "DEFAULT_MAX_CONCURRENCY",
+    "GroupExport",
+    "ScrimExport",
+    "build_scrim_xlsx",
+    "drop_failed_groups",
+    "export_scrim",
+    "extract_groups",
+    "fetch_scrim",
+    "parse_group_urls",
+    "scrim_export_filename",
+    "split_group_urls",
+]
+
+logger = logging.getLogger(__name__)
+
+
+_URL_SEPARATORS = re.compile(r"[\s,]+")
+
+
+@dataclass(slots=True)
+class GroupExport:
+    group_uuid: str
+    label: str
+    # 生データ（抽出前や、成果物をキャッシュから返して抽出しなかったときは None）
+    df: Optional[pd.DataFrame]
+    # GetBucket 応答本文の sha256（成果物キャッシュのキーに使う）
+    content_hash: Optional[str] = None
+    # 抽出前の bucket（extract_groups で抽出したら手放す）
+    payload: Any = field(default=None, repr=False)
+
+
+@dataclass(slots=True)
+class ScrimExport:
+    scrim_uuid: str
+    title: str
+    groups: List[GroupExport] = field(default_factory=list)
+    failures: Dict[str, str] = field(default_factory=dict)
+    expected_groups: Optional[int] = None
+
+    @property
+    def missing_groups(self) -> int:
+        """GetScrim の groups 数に対して、取得できなかった（URL が渡されなかった）グループ数。"""
+        if not self.expected_groups:
+            return 0
+        return max(self.expected_groups - len(self.groups), 0)
+
+    def warnings(self) -> List[str]:
+        out = [f"{group_uuid}: {reason}" for group_uuid, reason in self.failures.items()]
+        if self.missing_groups:
+            out.append(
+                f"{self.expected_groups} グループ中 {len(self.groups)} グループのみ出力しました。"
+            )
+        return out
+
+
+def split_group_urls(text: str) -> List[str]:
+    """空白・改行・カンマ区切りで渡された URL 群を分割する（Discord の文字列オプション向け）。"""
+    return [part for part in _URL_SEPARATORS.split(text or "") if part]
+
+
+def parse_group_urls(urls: Iterable[str]) -> Tuple[str, List[str]]:
+    """
+    グループ URL 群から (scrim_uuid, [group_uuid, ...]) を返す。
+
+    公開 API には Scrim 配下のグループ一覧を返すエンドポイントが無いため、
+    グループは URL で受け取る。別 Scrim の URL が混ざっていたら ValueError。
+    """
+    scrim_uuid: Optional[str] = None
+    groups: List[str] = []
+    for url in urls:
+        with contextlib.redirect_stdout(io.StringIO()):
+            s_uuid, g_uuid = parse_scrim_group_from_url(url)
+        if scrim_uuid is None:
+            scrim_uuid = s_uuid
+        elif s_uuid != scrim_uuid:
+            raise ValueError(f"別の Scrim の URL が含まれています: {url}")
+        if g_uuid not in groups:
+            groups.append(g_uuid)
+    if scrim_uuid is None:
+        raise ValueError("グループページの URL を 1 つ以上指定してください。")
+    return scrim_uuid, groups
+
+
+async def _group_label(client: ESCLPublicApiClient, scrim_uuid: str, group_uuid: str) -> str:
+    gnum = None
+    try:
+        gnum = group_num_from_bucket(await client.get_group_bucket_payload(scrim_uuid, group_uuid))
+    except (ESCLAPIError, ValueError):
+        pass
+    if gnum is None:
+        try:
+            gnum = group_num_from_payload(await client.get_group(group_uuid))
+        except ESCLAPIError:
+            pass
+    return format_group_label(gnum)
+
+
+async def fetch_scrim(
+    client: ESCLPublicApiClient,
+    group_urls: Iterable[str],
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> ScrimExport:
+    """
+    Scrim の各グループの bucket を並行に取得する（抽出はしない。各グループの df は None）。
+
+    - GetBucket は max_concurrency 本までに絞って同時に投げる（接続プールは client と共有）
+    - 取得に失敗したグループは failures に記録し、残りのグループだけを返す
+    content_hash とラベルが揃うので、抽出の前に成果物キャッシュ（scrim_artifact_key）を引ける。
+    """
+    if max_concurrency <= 0:
+        raise ValueError("max_concurrency は 1 以上を指定してください。")
+    scrim_uuid, group_uuids = parse_group_urls(group_urls)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_group(index: int, group_uuid: str) -> GroupExport:
+        async with semaphore:
+            payload = await client.get_group_bucket_payload(scrim_uuid, group_uuid)
+            label = await _group_label(client, scrim_uuid, group_uuid) or f"GROUP{index}"
+            digest = client.bucket_content_hash(scrim_uuid, group_uuid)
+        return GroupExport(group_uuid=group_uuid, label=label, df=None, content_hash=digest, payload=payload)
+
+    scrim_task = asyncio.ensure_future(client.get_scrim(scrim_uuid))
+    results = await asyncio.gather(
+        *(fetch_group(i, g) for i, g in enumerate(group_uuids, start=1)),
+        return_exceptions=True,
+    )
+    try:
+        scrim = await scrim_task
+    except ESCLAPIError:
+        scrim = {}
+
+    export = ScrimExport(scrim_uuid=scrim_uuid, title=_scrim_title(scrim))
+    export.expected_groups = _expected_groups(scrim)
+    for group_uuid, result in zip(group_uuids, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            logger.warning("グループの取得に失敗しました: %s (%s)", group_uuid, result)
+            export.failures[group_uuid] = str(result)
+        else:
+            export.groups.append(result)
+
+    if not export.groups:
+        raise RuntimeError("どのグループからもデータを取得できませんでした。")
+    export.groups.sort(key=_group_sort_key)
+    return export
+
+
+async def extract_groups(
+    export: ScrimExport,
+    groups: Optional[Iterable[GroupExport]] = None,
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_games: int = 6,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Exception]:
+    """
+    fetch_scrim で取得した groups（既定は全グループ）の生データを抽出して df に入れる。
+
+    抽出（extract_dataframe_from_bucket）は max_concurrency 件までに絞って executor 上で実行し、
+    イベントループを塞がない。executor が ReportPool なら満杯のときは空くまで待つ（グループの数だけ
+    一度に投げて一部が ReportPoolBusy で落ちることはない）。抽出し終えたグループの bucket は手放す。
+    失敗したグループは {group_uuid: 例外} で返す（export からは外さない）。
+    """
+    if max_concurrency <= 0:
+        raise ValueError("max_concurrency は 1 以上を指定してください。")
+    targets = [group for group in (export.groups if groups is None else groups) if group.df is None]
+    semaphore = asyncio.Semaphore(max_concurrency)
+    own_executor = executor is None
+    pool = executor or ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="escl-extract")
+
+    async def extract(group: GroupExport) -> None:
+        async with semaphore:
+            group.df = await run_when_free(
+                pool, extract_dataframe_from_bucket, group.payload, export.scrim_uuid, group.label, max_games
+            )
+        group.payload = None
+
+    try:
+        results = await asyncio.gather(*(extract(group) for group in targets), return_exceptions=True)
+    finally:
+        if own_executor:
+            pool.shutdown(wait=False)
+
+    failures: Dict[str, Exception] = {}
+    for group, result in zip(targets, results):
+        if isinstance(result, BaseException):
+            if not isinstance(result, Exception):
+                raise result
+            failures[group.group_uuid] = result
+    return failures
+
+
+async def export_scrim(
+    client: ESCLPublicApiClient,
+    group_urls: Iterable[str],
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_games: int = 6,
+    executor: Optional[Executor] = None,
+) -> ScrimExport:
+    """
+    Scrim の各グループを並行に取得して DataFrame にする（fetch_scrim → extract_groups）。
+
+    取得または抽出に失敗したグループは failures に記録し、残りのグループだけで出力する。
+    """
+    export = await fetch_scrim(client, group_urls, max_concurrency=max_concurrency)
+    failures = await extract_groups(export, max_concurrency=max_concurrency, max_games=max_games, executor=executor)
+    drop_failed_groups(export, failures)
+    return export
+
+
+def drop_failed_groups(export: ScrimExport, failures: Dict[str, Exception]) -> None:
+    """抽出に失敗したグループを failures に移す。1 グループも残らなければ RuntimeError。"""
+    for group_uuid, exc in failures.items():
+        logger.warning("グループの抽出に失敗しました: %s (%s)", group_uuid, exc)
+        export.failures[group_uuid] = str(exc)
+    export.groups = [group for group in export.groups if group.group_uuid not in failures]
+    if not export.groups:
+        raise RuntimeError("どのグループからもデータを取得できませんでした。")
+
+
+def _scrim_title(scrim: object) -> str:
+    return sanitize_scrim_title(scrim_title_from_payload(scrim)) if scrim else ""
+
+
+def _expected_groups(scrim: object) -> Optional[int]:
+    data = scrim.get("scrim") if isinstance(scrim, dict) else None
+    value = data.get("groups") if isinstance(data, dict) else None
+    return value if isinstance(value, int) and value > 0 else None
+
+
+def _group_sort_key(group: GroupExport) -> Tuple[int, str]:
+    match = re.fullmatch(r"G(\d+)", group.label)
+    return (int(match.group(1)) if match else 10**9, group.label)
+
+
+def scrim_export_filename(export: ScrimExport, extension: str = ".xlsx") -> str:
+    title = safe_filename_component(export.title or "ESCL_Scrim") or "ESCL_Scrim"
+    return f"{title}_ALL{extension}"
+
+
+def _sheet_name(label: str, used: set) -> str:
+    # Excel のシート名は 31 文字まで・重複不可
+    base = (safe_filename_component(label).replace("[", "").replace("]", "") or "GROUP")[:31]
+    name, n = base, 2
+    while name.upper() in used:
+        suffix = f"_{n}"
+        name = base[: 31 - len(suffix)] + suffix
+        n += 1
+    used.add(name.upper())
+    return name
+
+
+def build_scrim_xlsx(export: ScrimExport) -> bytes:
+    """
+    グループごとのシート（全試合の生データ）と、Scrim 全体の集計シートを 1 冊にまとめる。
+
+    - G1..Gn: 各グループの生データ
+    - ALL_GAMES: 全グループ通算のプレイヤー合計
+    - TEAM_TOTALS: 全グループのチーム合計（group 列付き）
+    """
+    used: set = {"ALL_GAMES", "TEAM_TOTALS"}
+    team_frames: List[pd.DataFrame] = []
+    with WorkbookWriter() as book:
+        for group in export.groups:
+            book.write_frame(_sheet_name(group.label, used), group.df)
+            team_totals = aggregate_team_totals(group.df)
+            team_totals.insert(0, "group", group.label)
+            team_frames.append(team_totals)
+
+        df_all = concat_raw_frames([group.df for group in export.groups])
+        book.write_frame("ALL_GAMES", aggregate_player_totals(df_all))
+        book.write_frame("TEAM_TOTALS", pd.concat(team_frames, ignore_index=True))
+    return book.getvalue()
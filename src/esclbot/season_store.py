@@ -0,0 +1,389 @@
+"""Persistent season leaderboard that absorbs exported scrims incrementally (SQLite)."""
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from .api_scraper import (
+    BUCKET_ENDPOINT,
+    extract_dataframe_from_bucket,
+    format_group_label,
+    group_num_from_bucket,
+)
+from .bucket_archive import BucketArchive
+from .bucket_stream import decode_bucket_payload
+from .defaults import DEFAULT_SEASON_DB
+from .escl_api import ESCLAPIError
+from .reports import (
+    COUNT_COLUMNS,
+    PARTIAL_COLUMNS,
+    PLAYER_TOTAL_COLUMNS,
+    TEAM_TOTAL_COLUMNS,
+    ScrimTotals,
+    add_rate_columns,
+    player_partials,
+)
+from .workbook import WorkbookWriter
+
+__all__ = [
+    "DEFAULT_SEASON_DB",
+    "IngestRecord",
+    "SEASON_PLAYER_COLUMNS",
+    "SEASON_TEAM_COLUMNS",
+    "SeasonStore",
+    "SeasonStoreError",
+    "build_season_xlsx",
+    "rebuild_from_archive",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# シーズン通算では team_num（スクリムごとの枠番号）は意味を持たないため、チームは team_name で束ねる。
+# scrims は出場したスクリム（グループ）数。
+_SUM_COLUMNS = ["scrims", *PARTIAL_COLUMNS]
+SEASON_PLAYER_COLUMNS = [c for c in PLAYER_TOTAL_COLUMNS if c != "team_num"]
+SEASON_PLAYER_COLUMNS.insert(SEASON_PLAYER_COLUMNS.index("games_played"), "scrims")
+SEASON_TEAM_COLUMNS = ["team_name", "scrims", "games_played"]
+SEASON_TEAM_COLUMNS += [c for c in TEAM_TOTAL_COLUMNS if c not in ("team_name", "team_num")]
+SEASON_TEAM_COLUMNS += ["placement_avg"]
+
+_PLAYER_KEYS = ("player_name", "team_name")
+_TEAM_KEYS = ("team_name",)
+
+
+class SeasonStoreError(Exception):
+    """SeasonStore に関連する例外。"""
+
+
+@dataclass(slots=True)
+class IngestRecord:
+    scrim_uuid: str
+    group_uuid: str
+    group_label: str
+    ingested_at: float
+    rows: int
+
+
+def _merge_characters(current: Optional[str], added: Optional[str]) -> Optional[str]:
+    """", " 区切りのキャラ一覧を初出順・重複なしでつなぐ（SQLite 関数として登録する）。"""
+    names = [name for text in (current, added) if text for name in text.split(", ")]
+    return ", ".join(dict.fromkeys(names)) or None
+
+
+def _schema() -> str:
+    sums = ", ".join(
+        f"{c} {'REAL' if c == 'placement_sum' else 'INTEGER'} NOT NULL DEFAULT 0" for c in _SUM_COLUMNS
+    )
+    return f"""
+    CREATE TABLE IF NOT EXISTS ingests (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        scrim_uuid TEXT NOT NULL,
+        group_uuid TEXT NOT NULL,
+        group_label TEXT NOT NULL,
+        ingested_at REAL NOT NULL,
+        rows INTEGER NOT NULL,
+        UNIQUE (scrim_uuid, group_uuid)
+    );
+    CREATE TABLE IF NOT EXISTS player_partials (
+        seq INTEGER NOT NULL, player_name TEXT NOT NULL, team_name TEXT NOT NULL, {sums}, characters TEXT,
+        PRIMARY KEY (seq, player_name, team_name)
+    );
+    CREATE TABLE IF NOT EXISTS team_partials (
+        seq INTEGER NOT NULL, team_name TEXT NOT NULL, {sums},
+        PRIMARY KEY (seq, team_name)
+    );
+    CREATE TABLE IF NOT EXISTS player_totals (
+        player_name TEXT NOT NULL, team_name TEXT NOT NULL, {sums}, characters TEXT,
+        PRIMARY KEY (player_name, team_name)
+    );
+    CREATE TABLE IF NOT EXISTS team_totals (
+        team_name TEXT NOT NULL PRIMARY KEY, {sums}
+    );
+    """
+
+
+class SeasonStore:
+    """
+    シーズン通算のプレイヤー / チーム集計を SQLite に持ち、スクリムを取り込むたびに差分で更新する。
+
+    - player_partials / team_partials: 取り込んだ (scrim_uuid, group_uuid) ごとの部分和
+    - player_totals / team_totals: 部分和を足し上げた通算値（読み出しはこの表だけを見る）
+
+    同じグループを取り込み直したときは、前回の部分和を通算から引いてから新しい部分和を足す。
+    率（accuracy など）は分子・分母（hits / shots / headshots）の合計から、平均順位は
+    placement_sum / placement_count から、読み出し時に再計算する。
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_SEASON_DB,
+        *,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._path = Path(path)
+        self._clock = clock or time.time
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def __enter__(self) -> "SeasonStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._path, check_same_thread=False)
+            conn.create_function("merge_characters", 2, _merge_characters, deterministic=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_schema())
+            self._conn = conn
+        return self._conn
+
+    # ---------- 取り込み ----------
+    def ingest(self, df: pd.DataFrame, *, scrim_uuid: str, group_uuid: str, group_label: str = "") -> IngestRecord:
+        """1 グループ分の生データを取り込む。取り込み済みのグループなら置き換える。"""
+        if not scrim_uuid or not group_uuid:
+            raise SeasonStoreError("scrim_uuid と group_uuid を指定してください。")
+        if not group_label and "group" in df.columns and len(df):
+            group_label = str(df["group"].iloc[0])
+        partials = _with_text_keys(player_partials(df), _PLAYER_KEYS)
+        players = _player_rows(partials)
+        teams = _team_rows(df, partials)
+        record = IngestRecord(scrim_uuid, group_uuid, group_label or "", self._clock(), len(df))
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._retract(conn, scrim_uuid, group_uuid)
+                    cursor = conn.execute(
+                        "INSERT INTO ingests (scrim_uuid, group_uuid, group_label, ingested_at, rows) VALUES (?, ?, ?, ?, ?)",
+                        (record.scrim_uuid, record.group_uuid, record.group_label, record.ingested_at, record.rows),
+                    )
+                    seq = cursor.lastrowid
+                    _insert(conn, "player_partials", ["seq", *_PLAYER_KEYS, *_SUM_COLUMNS, "characters"],
+                            [(seq, *row) for row in players])
+                    _insert(conn, "team_partials", ["seq", *_TEAM_KEYS, *_SUM_COLUMNS], [(seq, *row) for row in teams])
+                    _add_totals(conn, "player_totals", _PLAYER_KEYS, players, characters=True)
+                    _add_totals(conn, "team_totals", _TEAM_KEYS, teams, characters=False)
+            except sqlite3.Error as exc:
+                raise SeasonStoreError(f"シーズン集計の更新に失敗しました: {exc}") from exc
+        return record
+
+    def _retract(self, conn: sqlite3.Connection, scrim_uuid: str, group_uuid: str) -> None:
+        row = conn.execute(
+            "SELECT seq FROM ingests WHERE scrim_uuid = ? AND group_uuid = ?", (scrim_uuid, group_uuid)
+        ).fetchone()
+        if row is None:
+            return
+        seq = row[0]
+        for keys, partials, totals in (
+            (_PLAYER_KEYS, "player_partials", "player_totals"),
+            (_TEAM_KEYS, "team_partials", "team_totals"),
+        ):
+            columns = ", ".join([*keys, *_SUM_COLUMNS])
+            rows = conn.execute(f"SELECT {columns} FROM {partials} WHERE seq = ?", (seq,)).fetchall()
+            assign = ", ".join(f"{c} = {c} - ?" for c in _SUM_COLUMNS)
+            where = " AND ".join(f"{k} = ?" for k in keys)
+            conn.executemany(
+                f"UPDATE {totals} SET {assign} WHERE {where}",
+                [(*r[len(keys):], *r[: len(keys)]) for r in rows],
+            )
+            conn.execute(f"DELETE FROM {partials} WHERE seq = ?", (seq,))
+            conn.execute(f"DELETE FROM {totals} WHERE scrims <= 0")
+            if totals == "player_totals":
+                _recompute_characters(conn, [r[: len(keys)] for r in rows])
+        conn.execute("DELETE FROM ingests WHERE seq = ?", (seq,))
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for table in ("ingests", "player_partials", "team_partials", "player_totals", "team_totals"):
+                    conn.execute(f"DELETE FROM {table}")
+
+    # ---------- 読み出し ----------
+    def has_ingest(self, scrim_uuid: str, group_uuid: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT 1 FROM ingests WHERE scrim_uuid = ? AND group_uuid = ?", (scrim_uuid, group_uuid)
+            ).fetchone()
+        return row is not None
+
+    def ingests(self) -> List[IngestRecord]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT scrim_uuid, group_uuid, group_label, ingested_at, rows FROM ingests ORDER BY seq"
+            ).fetchall()
+        return [IngestRecord(*row) for row in rows]
+
+    def player_totals(self) -> pd.DataFrame:
+        """シーズン通算のプレイヤー集計（kills 降順）。"""
+        df = self._read("player_totals", [*_PLAYER_KEYS, *_SUM_COLUMNS, "characters"])
+        df = _finish(df)
+        return df.sort_values(
+            by=["kills", "damage", "player_name"], ascending=[False, False, True], kind="stable"
+        ).reset_index(drop=True)[SEASON_PLAYER_COLUMNS]
+
+    def team_totals(self) -> pd.DataFrame:
+        """シーズン通算のチーム集計（kills 降順）。"""
+        df = _finish(self._read("team_totals", [*_TEAM_KEYS, *_SUM_COLUMNS]))
+        return df.sort_values(
+            by=["kills", "damage", "team_name"], ascending=[False, False, True], kind="stable"
+        ).reset_index(drop=True)[SEASON_TEAM_COLUMNS]
+
+    def standings(self) -> ScrimTotals:
+        return ScrimTotals(players=self.player_totals(), teams=self.team_totals())
+
+    def _read(self, table: str, columns: Sequence[str]) -> pd.DataFrame:
+        with self._lock:
+            rows = self._connect().execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+        return pd.DataFrame.from_records(rows, columns=list(columns))
+
+
+def _player_rows(partials: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    # 同じ名前で team_num だけ違う行（途中で枠が変わった等）はここで 1 行にまとめる
+    grouped = partials.groupby(list(_PLAYER_KEYS), sort=False)
+    sums = grouped[PARTIAL_COLUMNS].sum()
+    sums["scrims"] = 1
+    sums["characters"] = grouped["characters"].agg(_merge_all)
+    return _records(sums.reset_index(), [*_PLAYER_KEYS, *_SUM_COLUMNS, "characters"])
+
+
+def _team_rows(df: pd.DataFrame, partials: pd.DataFrame) -> List[Tuple[Any, ...]]:
+    """チーム単位の部分和。試合数と順位は（チーム, 試合）で 1 回だけ数える。"""
+    sums = partials.groupby("team_name", sort=False)[COUNT_COLUMNS].sum()
+
+    games = _with_text_keys(df, _TEAM_KEYS)
+    placement = games["placement"] if "placement" in games.columns else pd.Series(float("nan"), index=games.index)
+    games = games.assign(placement=pd.to_numeric(placement, errors="coerce"))
+    games = games.drop_duplicates(subset=["team_name", "game"]).groupby("team_name", sort=False)
+    sums["games_played"] = games.size()
+    sums["placement_sum"] = games["placement"].sum().astype("float64")
+    sums["placement_count"] = games["placement"].count()
+    sums["scrims"] = 1
+    return _records(sums.reset_index(), [*_TEAM_KEYS, *_SUM_COLUMNS])
+
+
+def _with_text_keys(df: pd.DataFrame, keys: Iterable[str]) -> pd.DataFrame:
+    """キー列を欠損なしの文字列にそろえる（SQLite の主キーでは NULL 同士が別物になるため）。"""
+    fixes = {}
+    for key in keys:
+        values = df[key] if key in df.columns else pd.Series(None, index=df.index, dtype=object)
+        fixes[key] = values.astype(object).where(values.notna(), "").astype(str)
+    return df.assign(**fixes)
+
+
+def _merge_all(values: Iterable[Optional[str]]) -> Optional[str]:
+    merged: Optional[str] = None
+    for value in values:
+        merged = _merge_characters(merged, value)
+    return merged
+
+
+def _records(df: pd.DataFrame, columns: Sequence[str]) -> List[Tuple[Any, ...]]:
+    # tolist() で Python の int / float / str にする（NaN は sqlite3 が NULL として保存する）
+    return list(zip(*(df[column].tolist() for column in columns)))
+
+
+def _insert(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: List[Tuple[Any, ...]]) -> None:
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def _add_totals(
+    conn: sqlite3.Connection,
+    table: str,
+    keys: Sequence[str],
+    rows: List[Tuple[Any, ...]],
+    *,
+    characters: bool,
+) -> None:
+    columns = [*keys, *_SUM_COLUMNS] + (["characters"] if characters else [])
+    updates = [f"{c} = {c} + excluded.{c}" for c in _SUM_COLUMNS]
+    if characters:
+        updates.append("characters = merge_characters(characters, excluded.characters)")
+    placeholders = ", ".join("?" for _ in columns)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}",
+        rows,
+    )
+
+
+def _recompute_characters(conn: sqlite3.Connection, keys: List[Tuple[Any, ...]]) -> None:
+    """取り消したグループのプレイヤーだけ、残っている部分和からキャラ一覧を作り直す。"""
+    for player_name, team_name in keys:
+        values = conn.execute(
+            "SELECT characters FROM player_partials WHERE player_name = ? AND team_name = ? ORDER BY seq",
+            (player_name, team_name),
+        ).fetchall()
+        conn.execute(
+            "UPDATE player_totals SET characters = ? WHERE player_name = ? AND team_name = ?",
+            (_merge_all(v for (v,) in values), player_name, team_name),
+        )
+
+
+def _finish(df: pd.DataFrame) -> pd.DataFrame:
+    for column in _SUM_COLUMNS:
+        df[column] = pd.to_numeric(df[column]).astype("float64" if column == "placement_sum" else "int64")
+    add_rate_columns(df)
+    count = df["placement_count"]
+    df["placement_avg"] = (df["placement_sum"] / count).where(count > 0).astype("float64").round(2)
+    return df
+
+
+def rebuild_from_archive(store: SeasonStore, archive: BucketArchive, *, max_games: int = 6) -> List[IngestRecord]:
+    """
+    アーカイブに残っている GetBucket 応答（グループごとに最新のもの）からシーズン集計を作り直す。
+
+    取り込み済みの内容はいったん消す。デコードできない応答は警告を出して飛ばす。
+    """
+    latest: Dict[Tuple[str, str], str] = {}
+    for entry in archive.entries():
+        if entry.endpoint == BUCKET_ENDPOINT and entry.scrim_uuid and entry.group_uuid:
+            latest[(entry.scrim_uuid, entry.group_uuid)] = entry.hash  # index は古い順
+
+    store.clear()
+    records: List[IngestRecord] = []
+    for (scrim_uuid, group_uuid), digest in latest.items():
+        try:
+            payload = decode_bucket_payload(archive.read(digest))
+            if payload is None:
+                raise ValueError("GetBucket の value がありません")
+            label = format_group_label(group_num_from_bucket(payload))
+            df = extract_dataframe_from_bucket(payload, scrim_uuid, label, max_games=max_games)
+        except (ESCLAPIError, ValueError, RuntimeError) as exc:
+            logger.warning("アーカイブの bucket を読めませんでした: %s/%s (%s)", scrim_uuid, group_uuid, exc)
+            continue
+        records.append(store.ingest(df, scrim_uuid=scrim_uuid, group_uuid=group_uuid, group_label=label))
+    return records
+
+
+def build_season_xlsx(standings: ScrimTotals) -> bytes:
+    """シーズン通算の Excel（SEASON_PLAYERS / SEASON_TEAMS）。"""
+    with WorkbookWriter() as book:
+        book.write_frame("SEASON_PLAYERS", standings.players)
+        book.write_frame("SEASON_TEAMS", standings.teams)
+    return book.getvalue()
@@ -0,0 +1,45 @@
+"""Coalesce concurrent calls that would do the same work (single-flight)."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+__all__ = ["SingleFlight"]
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    同じキーの処理が実行中なら、新しく始めずにその結果を待つ。
+
+    最初の呼び出しが build() をタスクとして起動し、完了までに来た同じキーの呼び出しは
+    同じタスクを待つ（例外も全員に届く）。完了したキーはすぐ忘れるので、結果の再利用は
+    TTLCache / ArtifactCache の役目。待っている側がキャンセルされてもタスクは止めない
+    （Discord の応答期限切れなどで 1 人が抜けても、ほかの呼び出しは結果を受け取れる）。
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, asyncio.Future[Any]] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, build: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(build())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._forget(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    def _forget(self, key: Hashable, flight: asyncio.Future[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # 誰も待っていなかった場合の "exception was never retrieved" を抑える
@@ -0,0 +1,5 @@
+"""Bot version string, kept free of imports so every entry point can report it cheaply."""
+
+__all__ = ["__BOT_VERSION__"]
+
+__BOT_VERSION__ = "ESCL-Bot v2.1-cli"
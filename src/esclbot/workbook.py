@@ -0,0 +1,118 @@
+"""Constant-memory xlsx writer shared by the scrim workbook exports."""
+from __future__ import annotations
+
+import io
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from .reports import ScrimTotals, aggregate_totals
+
+__all__ = [
+    "WorkbookWriter",
+    "build_group_xlsx",
+    "game_sheet_indices",
+]
+
+# DataFrame.to_excel の見出しと同じ見た目（太字・細枠・中央揃え）
+_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """列を Python の値のリストにする（欠損は None = 空セル）。"""
+    if series.dtype == np.float32:
+        # そのまま tolist() すると 33.33 が 33.33000183... になるので、float32 の精度の最短表記から float64 に戻す
+        series = pd.Series(series.to_numpy().astype(str), index=series.index).astype("float64")
+    if pd.api.types.is_numeric_dtype(series) and not series.hasnans and not isinstance(
+        series.dtype, pd.api.extensions.ExtensionDtype
+    ):
+        return series.tolist()
+    values = series.astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+class WorkbookWriter:
+    """
+    xlsxwriter の constant_memory モードでシートを書くライター。
+
+    行は書いた順にテンポラリファイルへ流れるため、シートを何枚書いてもメモリは
+    DataFrame 本体（列バッファ）以上に増えない。DataFrame.to_excel と違って
+    セルごとの書式オブジェクトも作らない。
+
+        with WorkbookWriter() as book:
+            book.write_frame("GAME1", df)
+        data = book.getvalue()
+    """
+
+    def __init__(self) -> None:
+        self._buffer = io.BytesIO()
+        self._book = xlsxwriter.Workbook(self._buffer, {"constant_memory": True})
+        self._header = self._book.add_format(_HEADER_FORMAT)
+        self._closed = False
+
+    def __enter__(self) -> "WorkbookWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def write_frame(self, sheet_name: str, df: pd.DataFrame, rows: Optional[Sequence[int]] = None) -> None:
+        """
+        df を 1 枚のシートとして書く（index なし・1 行目が見出し）。
+
+        rows を渡すとその位置の行だけを書く（試合ごとのシートを、DataFrame を切り出さずに書くため）。
+        """
+        columns = [_column_values(df[column]) for column in df.columns]
+        self.write_rows(sheet_name, [str(column) for column in df.columns], columns, rows)
+
+    def write_rows(
+        self,
+        sheet_name: str,
+        header: Sequence[str],
+        columns: Sequence[List[Any]],
+        rows: Optional[Sequence[int]] = None,
+    ) -> None:
+        sheet = self._book.add_worksheet(sheet_name)
+        sheet.write_row(0, 0, header, self._header)
+        records = zip(*columns) if rows is None else (tuple(column[i] for column in columns) for i in rows)
+        for excel_row, record in enumerate(records, start=1):
+            sheet.write_row(excel_row, 0, record)
+
+    def close(self) -> None:
+        if not self._closed:
+            self._book.close()
+            self._closed = True
+
+    def getvalue(self) -> bytes:
+        self.close()
+        return self._buffer.getvalue()
+
+
+def game_sheet_indices(df: pd.DataFrame) -> Dict[int, Any]:
+    """game 列を 1 回の groupby で分け、{試合番号: 行位置の配列} を試合番号順に返す。"""
+    if "game" not in df.columns or df.empty:
+        return {}
+    games = pd.to_numeric(df["game"], errors="coerce").reset_index(drop=True)
+    indices = games.groupby(games, sort=True).indices
+    return {int(game): positions for game, positions in indices.items()}
+
+
+def build_group_xlsx(df_all: pd.DataFrame, totals: Optional[ScrimTotals] = None) -> bytes:
+    """
+    1 グループ分の Excel。
+
+    - GAME1..n: 試合ごとの生データ
+    - ALL_GAMES: プレイヤー合計
+    - TEAM_TOTALS: チーム合計
+    """
+    totals = totals or aggregate_totals(df_all)
+    with WorkbookWriter() as book:
+        header = [str(column) for column in df_all.columns]
+        columns = [_column_values(df_all[column]) for column in df_all.columns]
+        for game, positions in game_sheet_indices(df_all).items():
+            book.write_rows(f"GAME{game}", header, columns, positions)
+        book.write_frame("ALL_GAMES", totals.players)
+        book.write_frame("TEAM_TOTALS", totals.teams)
+    return book.getvalue()
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from src.esclbot.api_scraper import (
+    CAND,
+    compile_key_plan,
+    extract_rows_games_teams_players,
+    extract_table_like_from_inner,
+    key_spec,
+)
+from src.esclbot.reports import aggregate_player_totals, aggregate_team_totals
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+
+
+def _bucket():
+    return json.loads(json.loads(BUCKET_DUMP.read_text(encoding="utf-8"))["value"])
+
+
+def test_compile_key_plan_matches_case_insensitively_in_candidate_order() -> None:
+    spec = key_spec(CAND["team_name"], CAND["kills"], CAND["assists"])
+    plan = compile_key_plan(frozenset({"TeamName", "elims", "kills"}), spec)
+    assert plan == ("TeamName", "kills", None)
+
+
+def test_extract_rows_from_dump_bucket() -> None:
+    df = extract_rows_games_teams_players(_bucket(), "G5", "scrim")
+
+    assert len(df) == 320
+    assert set(df["game"]) == {1, 2, 3, 4, 5, 6}
+    assert df["game"].tolist() == sorted(df["game"].tolist())
+    first = df.iloc[0]
+    assert first["placement"] == 1
+    assert first["team_name"] == "コイキング"
+
+
+def test_players_under_unknown_key_are_located_once_per_team_shape() -> None:
+    bucket = {
+        "games": [
+            {
+                "teams": [
+                    {"team_name": f"T{n}", "placement": n, "detail": {"lineup_stats": [
+                        {"player_name": f"P{n}-{i}", "kills": i, "damage": 100 * i} for i in range(3)
+                    ]}}
+                    for n in (2, 1)
+                ]
+            }
+        ]
+    }
+
+    df = extract_rows_games_teams_players(bucket, "G1", "scrim")
+
+    assert df["player_name"].tolist() == ["P1-0", "P1-1", "P1-2", "P2-0", "P2-1", "P2-2"]
+
+
+def test_empty_player_list_does_not_hide_later_teams_of_the_same_shape() -> None:
+    bucket = {
+        "games": [
+            {
+                "teams": [
+                    {"team_name": "T1", "placement": 1, "detail": {"lineup_stats": []}},
+                    {"team_name": "T2", "placement": 2, "detail": {"lineup_stats": [
+                        {"player_name": "P2-0", "kills": 1, "damage": 100},
+                    ]}},
+                ]
+            }
+        ]
+    }
+
+    df = extract_rows_games_teams_players(bucket, "G1", "scrim")
+
+    assert df["player_name"].tolist() == ["P2-0"]
+    assert df["team_name"].tolist() == ["T2"]
+
+
+def test_team_num_and_survival_time_keep_api_values() -> None:
+    bucket = {
+        "games": [
+            {
+                "teams": [
+                    {"team_name": "alpha", "team_num": "A", "placement": 1, "players": [
+                        {"player_name": "a1", "kills": 2, "survival_time": 123.6},
+                    ]},
+                    {"team_name": "beta", "team_num": 7, "placement": 2, "players": [
+                        {"player_name": "b1", "kills": 1, "survival_time": "12:34"},
+                    ]},
+                ]
+            }
+        ]
+    }
+
+    df = extract_rows_games_teams_players(bucket, "G1", "scrim")
+
+    assert df["team_num"].tolist() == ["A", "7"]
+    assert df["survival_time"].dtype == "float64"
+    assert df.loc[0, "survival_time"] == 123.6
+    assert pd.isna(df.loc[1, "survival_time"])
+    assert sorted(aggregate_team_totals(df)["team_name"]) == ["alpha", "beta"]
+
+
+def test_missing_rates_are_derived_from_counts() -> None:
+    bucket = {
+        "games": [
+            {
+                "teams": [
+                    {"team_name": "alpha", "placement": 1, "players": [
+                        {"player_name": "a1", "shots": 40, "hits": 10, "headshots": 4},
+                        {"player_name": "a2", "shots": 0, "hits": 0, "headshots": 0},
+                        {"player_name": "a3", "shots": 10, "hits": 5, "headshots_accuracy": 12.5},
+                    ]},
+                ]
+            }
+        ]
+    }
+
+    df = extract_rows_games_teams_players(bucket, "G1", "scrim")
+
+    assert df["accuracy"].tolist() == [25.0, 0.0, 50.0]
+    assert df["headshots_accuracy"].tolist() == [40.0, 0.0, 12.5]
+
+
+def test_table_like_fallback_picks_best_player_list() -> None:
+    game = {
+        "meta": [{"name": "only-name"}],
+        "rows": [
+            {"player_name": "A", "team_name": "T", "kills": 1, "damage": 10, "shots": 10, "hits": 5},
+            {"player_name": "B", "team_name": "T", "kills": 2, "damage": 20},
+        ],
+    }
+
+    df = extract_table_like_from_inner(game)
+
+    assert df is not None
+    assert df["player_name"].tolist() == ["A", "B"]
+    assert df.loc[0, "accuracy"] == 50.0
+
+
+def test_extracted_rows_use_typed_columns_and_aggregate_without_copies() -> None:
+    df = extract_rows_games_teams_players(_bucket(), "G5", "scrim")
+
+    assert str(df["kills"].dtype) == "Int32"
+    assert str(df["damage"].dtype) == "Int32"
+    assert df["accuracy"].dtype == "float64"
+    assert isinstance(df["team_name"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["character"].dtype, pd.CategoricalDtype)
+
+    before = df.copy()
+    teams = aggregate_team_totals(df)
+    players = aggregate_player_totals(df)
+
+    pd.testing.assert_frame_equal(df, before)
+    assert teams["kills"].sum() == df["kills"].sum()
+    assert players["games_played"].sum() == len(df)
+    assert teams["team_name"].dtype != "category"
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Any, Optional
+
+import pytest
+
+from src.esclbot import api_scraper
+from src.esclbot.artifact_cache import ArtifactCache, artifact_key, export_group_artifact
+from src.esclbot.bucket_stream import decode_bucket_payload
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUP_UUID = "77cc0dae-6970-444c-ab30-3905e690e57d"
+
+
+class FakeClient:
+    def __init__(self, payload: Any, content_hash: Optional[str]) -> None:
+        self.payload = payload
+        self.content_hash = content_hash
+
+    async def get_group_bucket_payload(self, scrim_uuid: str, group_uuid: str) -> Any:
+        return self.payload
+
+    def bucket_content_hash(self, scrim_uuid: str, group_uuid: str) -> Optional[str]:
+        return self.content_hash
+
+
+def test_artifact_key_covers_every_component() -> None:
+    base = dict(content_hashes=["h1"], fmt="csv", labels=["G1"], scrim_uuid="s", version="v1")
+    keys = {
+        artifact_key(**base),
+        artifact_key(**{**base, "content_hashes": ["h2"]}),
+        artifact_key(**{**base, "fmt": "xlsx"}),
+        artifact_key(**{**base, "labels": ["G2"]}),
+        artifact_key(**{**base, "version": "v2"}),
+    }
+    assert len(keys) == 5
+
+
+def test_disk_tier_survives_restart_and_prunes_oldest(tmp_path: Path) -> None:
+    now = [1000.0]
+    cache = ArtifactCache(tmp_path, max_disk_bytes=25, clock=lambda: now[0])
+    cache.put("aa01", b"x" * 10)
+    cache.put("bb02", b"y" * 10)
+
+    reopened = ArtifactCache(tmp_path, max_disk_bytes=25, clock=lambda: now[0])
+    now[0] = 2000.0
+    assert reopened.get("aa01") == b"x" * 10  # 読むと最終アクセスが新しくなる
+    assert reopened.disk_hits == 1
+    reopened.put("cc03", b"z" * 10)
+
+    assert (tmp_path / "aa" / "aa01").exists()
+    assert not (tmp_path / "bb" / "bb02").exists()
+    assert reopened.snapshot()["disk_bytes"] == 20
+
+
+def test_export_group_artifact_skips_extraction_on_hit(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    payload = decode_bucket_payload(BUCKET_DUMP.read_bytes())
+    calls = []
+    extract = api_scraper.extract_dataframe_from_bucket
+
+    def counting_extract(*args: Any, **kwargs: Any) -> Any:
+        calls.append(args[2])
+        return extract(*args, **kwargs)
+
+    monkeypatch.setattr(api_scraper, "extract_dataframe_from_bucket", counting_extract)
+    cache = ArtifactCache(tmp_path)
+    kwargs = dict(scrim_uuid=SCRIM_UUID, group_uuid=GROUP_UUID, group_label="G5", fmt="csv")
+
+    async def scenario() -> list:
+        client = FakeClient(payload, "hash-1")
+        first = await export_group_artifact(client, cache, **kwargs)
+        second = await export_group_artifact(client, cache, **kwargs)
+        with_frame = await export_group_artifact(client, cache, need_frame=True, **kwargs)
+        changed = await export_group_artifact(FakeClient(payload, "hash-2"), cache, **kwargs)
+        return [first, second, with_frame, changed]
+
+    first, second, with_frame, changed = asyncio.run(scenario())
+
+    assert not first.cached and first.frame is not None
+    assert second.cached and second.frame is None and second.data == first.data
+    assert with_frame.cached and with_frame.frame is not None
+    assert not changed.cached
+    assert len(calls) == 3  # 2 回目だけ抽出しない
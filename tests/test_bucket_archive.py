@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import pandas as pd
+import pytest
+
+from src.esclbot.bucket_archive import BucketArchive, BucketArchiveMiss
+from src.esclbot.escl_api import BASE_URL
+from src.esclbot.public_api import ESCLPublicApiClient
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUP_UUID = "77cc0dae-6970-444c-ab30-3905e690e57d"
+PARENT_URL = f"https://fightnt.escl.co.jp/scrims/{SCRIM_UUID}/{GROUP_UUID}"
+
+
+def _routes(requests: List[str]):
+    body = BUCKET_DUMP.read_bytes()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.lstrip("/")
+        requests.append(path)
+        if path == "public.v1.PublicBucketService/GetBucket":
+            return httpx.Response(200, content=body, headers={"content-type": "application/json"})
+        if path == "public.v1.PublicScrimService/GetScrim":
+            return httpx.Response(200, json={"scrim": {"name": "CLスクリム#547", "finished": False}})
+        return httpx.Response(404, json={"message": "not found"})
+
+    return handler
+
+
+async def _collect(client: ESCLPublicApiClient) -> Dict[str, Any]:
+    async with client:
+        df = await client.collect_csv_from_parent_url(PARENT_URL, "G5", 6)
+        name = await client.get_scrim_name(SCRIM_UUID)
+    return {"df": df, "name": name}
+
+
+def _online(archive: BucketArchive, requests: List[str]) -> ESCLPublicApiClient:
+    http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(_routes(requests)))
+    return ESCLPublicApiClient(client=http, archive=archive)
+
+
+def test_fetched_responses_are_archived_by_content(tmp_path: Path) -> None:
+    archive = BucketArchive(tmp_path)
+    requests: List[str] = []
+
+    asyncio.run(_collect(_online(archive, requests)))
+    asyncio.run(_collect(_online(archive, requests)))
+
+    entries = list(archive.entries())
+    buckets = [e for e in entries if e.endpoint.endswith("GetBucket")]
+    assert len(buckets) == 2
+    assert buckets[0].hash == buckets[1].hash
+    assert buckets[0].key == f"{SCRIM_UUID}/{GROUP_UUID}.json"
+    assert len(list((tmp_path / "objects").rglob("*.json.gz"))) == 2  # bucket + scrim
+    assert archive.read(buckets[0].hash) == BUCKET_DUMP.read_bytes()
+
+
+def test_offline_replay_matches_live_fetch_without_network(tmp_path: Path) -> None:
+    archive = BucketArchive(tmp_path)
+    requests: List[str] = []
+    live = asyncio.run(_collect(_online(archive, requests)))
+
+    offline_requests: List[str] = []
+    http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(_routes(offline_requests)))
+    replay = asyncio.run(_collect(ESCLPublicApiClient(client=http, archive=BucketArchive(tmp_path), offline=True)))
+
+    assert offline_requests == []
+    assert replay["name"] == live["name"] == "CLスクリム#547"
+    pd.testing.assert_frame_equal(replay["df"], live["df"])
+
+
+def test_offline_miss_raises(tmp_path: Path) -> None:
+    async def run():
+        async with ESCLPublicApiClient(archive=BucketArchive(tmp_path), offline=True) as client:
+            return await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+
+    with pytest.raises(BucketArchiveMiss):
+        asyncio.run(run())
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from src.esclbot.api_scraper import extract_dataframe_from_bucket, group_num_from_bucket
+from src.esclbot.bucket_stream import BucketDecodeError, decode_bucket_payload
+
+
+def _game(num: int) -> dict:
+    return {
+        "game_num": num,
+        "teams": [{"team_name": "T1", "placement": 1, "players": [{"player_name": f"P{num}", "kills": num}]}],
+    }
+
+
+def _body(inner: str) -> bytes:
+    return json.dumps({"value": inner}).encode("utf-8")
+
+
+def test_games_are_decoded_one_at_a_time() -> None:
+    games = ",".join(json.dumps(_game(n)) for n in (1, 2))
+    # 3 試合目は壊れているが、max_games=2 ならそこまで読まない
+    inner = '{"group_num": 3, "games": [' + games + ', {"game_num": 3, "teams": [BROKEN'
+
+    payload = decode_bucket_payload(_body(inner))
+    df = extract_dataframe_from_bucket(payload, "scrim", "G3", max_games=2)
+
+    assert df["player_name"].tolist() == ["P1", "P2"]
+    with pytest.raises(BucketDecodeError):
+        list(payload.iter_games())
+
+
+def test_header_skips_games_and_matches_dict_decode() -> None:
+    inner = json.dumps({"scrim_id": 9, "games": [_game(1)], "group_num": 5})
+
+    payload = decode_bucket_payload(_body(inner))
+
+    assert payload is not None
+    assert payload.header == {"scrim_id": 9, "group_num": 5}
+    assert group_num_from_bucket(payload) == 5
+    assert payload.to_dict() == json.loads(inner)
+
+
+def test_missing_or_object_value() -> None:
+    assert decode_bucket_payload(b'{"other": [1, 2]}') is None
+    payload = decode_bucket_payload(json.dumps({"value": {"games": []}}).encode("utf-8"))
+    assert payload is not None
+    assert list(payload.iter_games()) == []
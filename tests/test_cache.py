@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from src.esclbot.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl_unless_pinned() -> None:
+    clock = FakeClock()
+    cache: TTLCache[str] = TTLCache(ttl=10.0, clock=clock)
+    cache.put("a", "live")
+    cache.put("b", "final", pinned=True)
+
+    clock.now = 11.0
+
+    assert cache.get("a") is None
+    assert cache.peek("a") is not None
+    assert cache.get("b") is not None
+
+
+def test_lru_eviction_prefers_unpinned_entries() -> None:
+    cache: TTLCache[int] = TTLCache(max_entries=2)
+    cache.put("pinned", 1, pinned=True)
+    cache.put("old", 2)
+    cache.get("pinned")
+    cache.put("new", 3)
+
+    assert "pinned" in cache
+    assert "old" not in cache
+    assert "new" in cache
+    assert cache.stats.evictions == 1
+
+
+def test_max_bytes_bounds_cache_size() -> None:
+    cache: TTLCache[bytes] = TTLCache(max_bytes=100)
+    cache.put("a", b"x" * 60, size=60)
+    cache.put("b", b"y" * 60, size=60)
+
+    assert "a" not in cache
+    assert cache.total_bytes == 60
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from src.esclbot.api_scraper import BUCKET_ENDPOINT
+from src.esclbot.bucket_archive import BucketArchive
+from src.esclbot.cli import ClientPool, main, serve_lines
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUP_UUID = "77cc0dae-6970-444c-ab30-3905e690e57d"
+PARENT_URL = f"https://fightnt.escl.co.jp/scrims/{SCRIM_UUID}/{GROUP_UUID}"
+
+
+def _archive(tmp_path: Path) -> Path:
+    archive = BucketArchive(tmp_path / "archive")
+    archive.put(BUCKET_ENDPOINT, BUCKET_DUMP.read_bytes(), scrim_uuid=SCRIM_UUID, group_uuid=GROUP_UUID)
+    return tmp_path / "archive"
+
+
+def _run(capsys: pytest.CaptureFixture[str], tmp_path: Path, *extra: str) -> Dict[str, Any]:
+    argv: List[str] = ["csv", PARENT_URL, "--group", "G5", "--offline", "--no-season"]
+    argv += ["--artifact-dir", str(tmp_path / "artifacts")]
+    with pytest.raises(SystemExit) as exit_info:
+        main([*argv, "--archive-dir", str(_archive(tmp_path)), *extra])
+    assert exit_info.value.code == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_output_dir_hands_off_the_file_instead_of_base64(capsys: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    inline = _run(capsys, tmp_path)
+    handoff = _run(capsys, tmp_path, "--output-dir", str(tmp_path / "out"))
+
+    assert "content" not in handoff
+    assert handoff["filename"] == inline["filename"] == "ESCL_Scrim_G5.csv"
+    path = Path(handoff["path"])
+    assert path.parent == (tmp_path / "out").resolve()
+    assert path.read_bytes() == base64.b64decode(inline["content"])
+    assert handoff["size"] == path.stat().st_size
+    assert [p.name for p in path.parent.iterdir()] == [path.name]  # 書きかけのファイルは残らない
+    assert not inline["cached"] and handoff["cached"]  # 2 回目はディスク層の成果物を返す
+
+
+def test_serve_lines_answers_each_request_by_id(tmp_path: Path) -> None:
+    archive_dir = _archive(tmp_path)
+    offline = ["--offline", "--no-season", "--archive-dir", str(archive_dir), "--output-dir", str(tmp_path / "out")]
+    offline += ["--artifact-dir", str(tmp_path / "artifacts")]
+    requests = [
+        {"id": 1, "argv": ["csv", PARENT_URL, "--group", "G5", *offline]},
+        {"id": 2, "argv": ["version"]},
+        {"id": 3, "argv": ["xlsx", PARENT_URL, *offline]},
+        {"id": 4, "argv": ["serve"]},
+        {"id": 5, "argv": ["no-such-command"]},
+    ]
+
+    async def scenario() -> List[Dict[str, Any]]:
+        reader = asyncio.StreamReader()
+        for request in requests:
+            reader.feed_data(json.dumps(request).encode("utf-8") + b"\n")
+        reader.feed_data(b"not json\n")
+        reader.feed_eof()
+        lines: List[bytes] = []
+
+        async def write(data: bytes) -> None:
+            lines.append(data)
+
+        pool = ClientPool(persistent=True)
+        try:
+            await serve_lines(reader, write, pool)
+        finally:
+            await pool.aclose()
+        return [json.loads(line) for line in lines]
+
+    responses = {response["id"]: response for response in asyncio.run(scenario())}
+
+    assert responses[1]["ok"] and Path(responses[1]["path"]).name == "ESCL_Scrim_G5.csv"
+    assert responses[2]["ok"] and responses[2]["version"]
+    assert responses[3]["ok"] and Path(responses[3]["path"]).exists()
+    assert not responses[4]["ok"] and not responses[5]["ok"]
+    assert not responses[None]["ok"]  # 解析できない行にも 1 行で答える
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+import pytest
+
+from src.esclbot import columnar
+from src.esclbot.columnar import ColumnarUnavailableError, encode_frame
+from src.esclbot.frame_builder import apply_raw_dtypes, concat_raw_frames
+
+
+def _raw(group: str, characters: list) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "game": [1, 1, 2],
+            "team_num": [1, 2, 1],
+            "team_name": ["alpha", "beta", "alpha"],
+            "player_name": ["a1", "b1", "a1"],
+            "character": characters,
+            "placement": [1, 2, None],
+            "kills": [3, 1, 0],
+            "accuracy": [12.5, None, 30.0],
+        }
+    )
+    return apply_raw_dtypes(df.assign(group=group, scrim_id="s"))
+
+
+def test_concat_raw_frames_keeps_typed_columns() -> None:
+    df = concat_raw_frames([_raw("G1", ["Wraith", None, "Alter"]), _raw("G2", [None, None, None])])
+
+    assert len(df) == 6
+    assert isinstance(df["group"].dtype, pd.CategoricalDtype)
+    assert list(df["group"].cat.categories) == ["G1", "G2"]
+    assert set(df["character"].cat.categories) == {"Wraith", "Alter"}
+    assert str(df["kills"].dtype) == "Int32"
+    assert str(df["game"].dtype) == "int32"
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_encode_frame_round_trips_dtypes(fmt: str) -> None:
+    pa = pytest.importorskip("pyarrow")
+    df = _raw("G1", ["Wraith", None, "Alter"])
+
+    data = encode_frame(df, fmt)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(pa.BufferReader(data))
+    else:
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    restored = table.to_pandas()
+
+    for column in ("game", "kills", "placement", "accuracy", "group", "team_name", "character"):
+        assert restored[column].dtype == df[column].dtype, column
+    assert restored["kills"].tolist() == df["kills"].tolist()
+    assert restored["character"].isna().sum() == 1
+
+
+def test_encode_frame_reports_missing_pyarrow(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(columnar, "columnar_available", lambda: False)
+    df = _raw("G1", ["Wraith", None, "Alter"])
+
+    with pytest.raises(ColumnarUnavailableError):
+        encode_frame(df, "parquet")
+    assert pd.read_csv(io.BytesIO(encode_frame(df, "csv")))["kills"].tolist() == [3, 1, 0]
+    with pytest.raises(ValueError):
+        encode_frame(df, "feather")
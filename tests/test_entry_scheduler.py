@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import date, datetime, time
+import time as monotonic_time
+from datetime import date, datetime, time, timedelta
+from email.utils import formatdate
 from typing import List
 
+import httpx
+
 import pytest
 
 from src.esclbot.entry_scheduler import (
@@ -12,7 +16,8 @@ from src.esclbot.entry_scheduler import (
     EntryScheduler,
     compute_run_at,
 )
-from src.esclbot.escl_api import ESCLResponse
+from src.esclbot.escl_api import ClockProbe, ESCLApiClient, ESCLResponse
+from src.esclbot.rate_limit import RetryPolicy
 
 
 class FakeApiClient:
@@ -145,6 +150,33 @@ def test_execute_attempts_handles_429_backoff() -> None:
     assert sleeper.calls == [1.0, 0.5]
 
 
+def test_execute_attempts_follows_retry_after_with_job_policy() -> None:
+    now = _now_jst()
+    client = FakeApiClient(
+        [
+            ESCLResponse(status_code=429, payload=None, text="rate", headers={"retry-after": "3"}),
+            ESCLResponse(status_code=429, payload=None, text="rate"),
+            ESCLResponse(status_code=200, payload=None, text="ok"),
+        ]
+    )
+    sleeper = FakeSleeper()
+    scheduler = EntryScheduler(client, sleep_coro=sleeper.sleep)
+    policy = RetryPolicy(max_attempts=4, interval=0.2, backoff_after_429=1.0, multiplier=2.0, jitter=0.0)
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def run() -> EntryJobResult:
+        return await scheduler._execute_attempts(_meta(now), log_hook=log_hook, policy=policy)  # noqa: SLF001
+
+    result = asyncio.run(run())
+
+    assert result.ok is True
+    assert result.attempts == 3
+    # Retry-After の 3 秒、ヘッダーの無い 2 回目の 429 は 1.0 × 2
+    assert sleeper.calls == [3.0, 0.2, 2.0, 0.2]
+
+
 def test_run_entry_immediately_success() -> None:
     now = _now_jst()
     client = FakeApiClient([ESCLResponse(status_code=200, payload={"message": "ok"}, text="ok")])
@@ -201,3 +233,365 @@ def test_run_entry_immediately_failure_uses_single_attempt() -> None:
     assert result.attempts == 1
     assert client.calls == 1
     assert any("受付開始前" in log or "status=422" in log for log in logs)
+
+
+def test_scheduled_jobs_share_one_timer_and_fire_due_jobs_together() -> None:
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 31, 12, 0, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=200, payload=None, text="ok")])
+    scheduler = EntryScheduler(client, sleep_coro=FakeSleeper().sleep, clock=lambda: current[0], max_wait=0.01)
+    results: List[EntryJobResult] = []
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def result_hook(result: EntryJobResult) -> None:
+        results.append(result)
+
+    async def run() -> tuple:
+        for i in range(100):
+            await scheduler.schedule_entry(
+                user_id=i,
+                scrim_id=i,
+                team_id=i,
+                entry_date=date(2025, 1, 2) if i < 3 else date(2025, 1, 9),
+                log_hook=log_hook,
+                result_hook=result_hook,
+            )
+        timers = [t for t in asyncio.all_tasks() if t.get_name().startswith("entry-")]
+        await asyncio.sleep(0.03)
+        before = len(results)
+        current[0] = compute_run_at(date(2025, 1, 2))  # 1/1 0:00 の 3 件だけ期限が来る
+        for _ in range(100):
+            if len(results) >= 3:
+                break
+            await asyncio.sleep(0.01)
+        remaining = await scheduler.list_jobs()
+        await scheduler.shutdown()
+        return len(timers), before, remaining
+
+    timers, before, remaining = asyncio.run(run())
+
+    assert timers == 1
+    assert before == 0
+    assert len(results) == 3 and all(r.ok for r in results)
+    assert len(remaining) == 97 and {m.entry_date for m in remaining} == {date(2025, 1, 9)}
+
+
+def test_jobs_sharing_run_at_stagger_their_retries() -> None:
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 31, 12, 0, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=422, payload=None, text="not yet")])
+    sleeper = FakeSleeper()
+    scheduler = EntryScheduler(client, sleep_coro=sleeper.sleep, clock=lambda: current[0], max_wait=0.01)
+    results: List[tuple] = []
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def run() -> None:
+        for team_id in (1, 2, 3):
+
+            async def result_hook(result: EntryJobResult, team_id: int = team_id) -> None:
+                results.append((team_id, result))
+
+            await scheduler.schedule_entry(
+                user_id=1, scrim_id=10, team_id=team_id, entry_date=date(2025, 1, 2),
+                log_hook=log_hook, result_hook=result_hook,
+            )
+        current[0] = compute_run_at(date(2025, 1, 2))
+        for _ in range(100):
+            if len(results) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.shutdown()
+
+    asyncio.run(run())
+
+    assert sorted(team_id for team_id, _ in results) == [1, 2, 3]
+    assert all(not r.ok and r.attempts == 3 for _, r in results)
+    # 初回の再試行だけ 0.5 / 3 秒ずつずらし、以降は同じ間隔を保つ
+    assert sorted(sleeper.calls) == pytest.approx(sorted([0.5, 0.5 + 0.5 / 3, 0.5 + 1.0 / 3] + [0.5] * 3))
+
+
+def test_retry_stagger_spans_the_longest_job_policy_interval() -> None:
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 31, 12, 0, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=422, payload=None, text="not yet")])
+    sleeper = FakeSleeper()
+    scheduler = EntryScheduler(client, sleep_coro=sleeper.sleep, clock=lambda: current[0], max_wait=0.01)
+    slow = RetryPolicy(max_attempts=2, interval=1.5, jitter=0.0)
+    results: List[EntryJobResult] = []
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def result_hook(result: EntryJobResult) -> None:
+        results.append(result)
+
+    async def run() -> None:
+        for team_id, policy in [(1, None), (2, slow), (3, slow)]:
+            await scheduler.schedule_entry(
+                user_id=1, scrim_id=10, team_id=team_id, entry_date=date(2025, 1, 2),
+                log_hook=log_hook, result_hook=result_hook, retry_policy=policy,
+            )
+        current[0] = compute_run_at(date(2025, 1, 2))
+        for _ in range(100):
+            if len(results) == 3:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.shutdown()
+
+    asyncio.run(run())
+
+    assert len(results) == 3
+    # 既定の 0.5 秒ではなく、グループで最も長い 1.5 秒を 3 等分した 0.5 秒ずつずらす
+    assert sorted(sleeper.calls) == pytest.approx([0.5, 0.5, 1.5 + 0.5, 1.5 + 1.0])
+
+
+def test_list_and_cancel_pending_jobs() -> None:
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 1, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=200, payload=None, text="ok")])
+    scheduler = EntryScheduler(client, clock=lambda: current[0])
+    logs: List[str] = []
+
+    async def log_hook(message: str) -> None:
+        logs.append(message)
+
+    async def run() -> tuple:
+        jobs = []
+        for user_id, scrim_id, day in [(1, 10, 2), (1, 11, 3), (2, 10, 2)]:
+            jobs.append(
+                await scheduler.schedule_entry(
+                    user_id=user_id, scrim_id=scrim_id, team_id=5, entry_date=date(2025, 1, day), log_hook=log_hook
+                )
+            )
+        by_user = await scheduler.list_jobs(user_id=1)
+        by_scrim_and_date = await scheduler.list_jobs(scrim_id=10, entry_date=date(2025, 1, 2))
+        cancelled = await scheduler.cancel_job(jobs[0].job_id)
+        missing = await scheduler.cancel_job("no-such-job")
+        after = await scheduler.list_jobs(user_id=1)
+        meta = await scheduler.get_metadata(jobs[0].job_id)
+        await scheduler.shutdown()
+        return jobs, by_user, by_scrim_and_date, cancelled, missing, after, meta
+
+    jobs, by_user, by_scrim_and_date, cancelled, missing, after, meta = asyncio.run(run())
+
+    assert [m.job_id for m in by_user] == [jobs[0].job_id, jobs[1].job_id]  # run_at 順
+    assert {m.job_id for m in by_scrim_and_date} == {jobs[0].job_id, jobs[2].job_id}
+    assert cancelled and not missing and meta is None
+    assert [m.job_id for m in after] == [jobs[1].job_id]
+    assert logs.count("応募ジョブがキャンセルされました。") == 3  # 取り消し 1 件 + shutdown 時の 2 件
+    assert client.calls == 0
+
+
+def test_close_hook_runs_once_however_the_job_ends() -> None:
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 31, 12, 0, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=200, payload=None, text="ok")])
+    scheduler = EntryScheduler(client, sleep_coro=FakeSleeper().sleep, clock=lambda: current[0], max_wait=0.01)
+    closed: List[int] = []
+    results: List[EntryJobResult] = []
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def result_hook(result: EntryJobResult) -> None:
+        results.append(result)
+
+    async def run() -> None:
+        jobs = []
+        for team_id, day in [(1, 2), (2, 9), (3, 9)]:
+
+            async def close_hook(team_id: int = team_id) -> None:
+                await asyncio.sleep(0)
+                closed.append(team_id)
+
+            jobs.append(
+                await scheduler.schedule_entry(
+                    user_id=1, scrim_id=10, team_id=team_id, entry_date=date(2025, 1, day),
+                    log_hook=log_hook, result_hook=result_hook, close_hook=close_hook,
+                )
+            )
+        await scheduler.cancel_job(jobs[1].job_id)
+        current[0] = compute_run_at(date(2025, 1, 2))  # team 1 だけ送信される
+        for _ in range(100):
+            if 1 in closed:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.shutdown()  # team 3 は待機中のまま停止
+
+    asyncio.run(run())
+
+    assert len(results) == 1 and results[0].ok
+    assert sorted(closed) == [1, 2, 3]
+
+
+def test_journaled_jobs_survive_restart(tmp_path) -> None:
+    from src.esclbot.entry_journal import EntryJournal
+
+    tz = compute_run_at(date(2025, 1, 2)).tzinfo
+    current = [datetime(2024, 12, 20, 12, 0, tzinfo=tz)]
+    client = FakeApiClient([ESCLResponse(status_code=200, payload=None, text="ok")])
+    restored_logs: List[str] = []
+    results: List[EntryJobResult] = []
+
+    async def quiet(message: str) -> None:
+        pass
+
+    def hooks(meta: EntryJobMetadata, context: dict):
+        assert context == {"channel_ids": [meta.scrim_id]}
+
+        async def log_hook(message: str) -> None:
+            restored_logs.append(f"{meta.job_id}: {message}")
+
+        async def result_hook(result: EntryJobResult) -> None:
+            results.append(result)
+
+        return log_hook, result_hook, None
+
+    def scheduler(journal: EntryJournal) -> EntryScheduler:
+        return EntryScheduler(client, clock=lambda: current[0], max_wait=0.01, journal=journal)
+
+    async def before_restart(journal: EntryJournal) -> None:
+        first = scheduler(journal)
+        for job_id, day in [("keep", date(2025, 1, 2)), ("cancel", date(2025, 1, 2)), ("later", date(2025, 1, 9)),
+                            ("stale", date(2024, 12, 31))]:
+            await first.schedule_entry(
+                user_id=1, scrim_id=day.day, team_id=5, entry_date=day, job_id=job_id,
+                log_hook=quiet, context={"channel_ids": [day.day]},
+                retry_policy=RetryPolicy(max_attempts=5) if job_id == "later" else None,
+            )
+        await first.cancel_job("cancel")
+        await first.shutdown()
+
+    async def after_restart(journal: EntryJournal) -> list:
+        current[0] = datetime(2025, 1, 1, 0, 5, tzinfo=tz)  # 停止中に "keep" の送信時刻を過ぎた
+        second = scheduler(journal)
+        restored = await second.rehydrate(hooks)
+        for _ in range(100):
+            if len(results) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        pending = await second.list_jobs()
+        await second.shutdown()
+        return [meta.job_id for meta in restored], [meta.job_id for meta in pending]
+
+    with EntryJournal(tmp_path / "journal.sqlite3") as journal:
+        asyncio.run(before_restart(journal))
+        restored, pending = asyncio.run(after_restart(journal))
+        remaining = [(job.meta.job_id, job.retry_policy) for job in journal.pending()]
+
+    assert restored == ["keep", "later"]
+    assert pending == ["later"]
+    assert client.calls == 1  # "keep" だけを送信。"stale" は開催日を過ぎているので送らない
+    assert sorted(r.ok for r in results) == [False, True]
+    assert remaining == [("later", RetryPolicy(max_attempts=5))]
+    assert any(log.startswith("keep: 予定時刻を過ぎている") for log in restored_logs)
+
+
+def test_warmup_dispatch_probes_once_and_fires_on_server_clock() -> None:
+    run_at = compute_run_at(date(2025, 1, 2))
+    started = monotonic_time.monotonic()
+    # 壁時計は run_at の 0.3 秒前から進む。サーバーは 50 ms 進んでいるので、送信は 0.25 秒後
+    start_wall = run_at - timedelta(seconds=0.3)
+
+    def clock() -> datetime:
+        return start_wall + timedelta(seconds=monotonic_time.monotonic() - started)
+
+    events: List[str] = []
+    sent_at: List[datetime] = []
+
+    class ProbingClient(FakeApiClient):
+        async def probe_clock(self, *, connections: int = 1) -> ClockProbe:
+            events.append(f"probe x{connections}")
+            return ClockProbe(offset=0.05, uncertainty=0.01, rtt=0.01)
+
+        async def create_application(self, *, scrim_id: int, team_id: int) -> ESCLResponse:
+            events.append("send")
+            sent_at.append(clock())
+            return await super().create_application(scrim_id=scrim_id, team_id=team_id)
+
+    client = ProbingClient([ESCLResponse(status_code=200, payload=None, text="ok")])
+    scheduler = EntryScheduler(client, clock=clock, warmup_lead=0.2)
+    results: List[EntryJobResult] = []
+
+    async def log_hook(message: str) -> None:
+        pass
+
+    async def result_hook(result: EntryJobResult) -> None:
+        results.append(result)
+
+    async def run() -> None:
+        for scrim_id in (1, 2):
+            await scheduler.schedule_entry(
+                user_id=1, scrim_id=scrim_id, team_id=5, entry_date=date(2025, 1, 2),
+                log_hook=log_hook, result_hook=result_hook,
+            )
+        for _ in range(200):
+            if len(results) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.shutdown()
+
+    asyncio.run(run())
+
+    assert events == ["probe x2", "send", "send"]  # 同じ run_at の 2 件は 1 グループ
+    assert scheduler.clock_offset == 0.05
+    assert all(r.ok and r.send_error is not None and abs(r.send_error) < 0.02 for r in results)
+    local_lead = (run_at - sent_at[0]).total_seconds()
+    assert 0.03 < local_lead < 0.07
+
+
+def test_probe_clock_estimates_server_offset_from_date_header() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.method == "HEAD"
+        return httpx.Response(404, headers={"Date": formatdate(monotonic_time.time() + 3.0, usegmt=True)})
+
+    async def run() -> ClockProbe:
+        http = httpx.AsyncClient(base_url="https://escl.test", transport=httpx.MockTransport(handler))
+        client = ESCLApiClient(lambda: "jwt", client=http)
+        try:
+            return await client.probe_clock(samples=3, spacing=0.0)
+        finally:
+            await http.aclose()
+
+    probe = asyncio.run(run())
+    assert probe.uncertainty <= 0.51
+    assert abs(probe.offset - 3.0) <= probe.uncertainty + 0.01
+
+
+def test_hedged_create_application_takes_first_settled_answer() -> None:
+    delays: List[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        first = not delays
+        delays.append(0.0)
+        if first:
+            await asyncio.sleep(first_delay)  # 最初の送信だけ遅らせる
+            return httpx.Response(200, json={})
+        return httpx.Response(409, json={"message": "already applied"})
+
+    async def run(hedge_after: float) -> tuple:
+        delays.clear()
+        http = httpx.AsyncClient(base_url="https://escl.test", transport=httpx.MockTransport(handler))
+        client = ESCLApiClient(lambda: "jwt", client=http)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            response = await client.create_application(scrim_id=1, team_id=2, hedge_after=hedge_after)
+        finally:
+            await http.aclose()
+        return response, loop.time() - started, client.hedge_stats
+
+    first_delay = 0.3
+    response, elapsed, stats = asyncio.run(run(0.02))
+    assert response.status_code == 409  # 予備の送信が先に「応募済み」で決着した
+    assert elapsed < 0.2
+    assert (stats.requests, stats.hedged, stats.hedge_wins, stats.hedge_rate) == (1, 1, 1, 1.0)
+
+    first_delay = 0.0
+    response, _, stats = asyncio.run(run(0.2))
+    assert response.status_code == 200
+    assert (stats.requests, stats.hedged, stats.hedge_wins) == (1, 0, 0)
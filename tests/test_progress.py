@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from src.esclbot.progress import ProgressReporter
+
+
+class FakeChannel:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls: List[Tuple[str, int, str]] = []
+        self._next_id = 0
+
+    async def send(self, text: str) -> Optional[int]:
+        await asyncio.sleep(self.delay)
+        self._next_id += 1
+        self.calls.append(("send", self._next_id, text))
+        return self._next_id
+
+    async def edit(self, message_id: int, text: str) -> None:
+        await asyncio.sleep(self.delay)
+        self.calls.append(("edit", message_id, text))
+
+
+def test_post_returns_immediately_and_lines_coalesce_into_one_message() -> None:
+    channel = FakeChannel(delay=0.05)
+    reporter: ProgressReporter[int] = ProgressReporter(channel.send, channel.edit, interval=0.01)
+
+    async def run() -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(5):
+            await reporter.log(f"line {i}")
+        elapsed = loop.time() - started
+        await asyncio.sleep(0)
+        reporter.post("late")
+        reporter.post_message("result")
+        await reporter.aclose()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+
+    assert elapsed < 0.01  # Discord への送信（0.05 秒）を待たない
+    assert channel.calls == [
+        ("send", 1, "line 0\nline 1\nline 2\nline 3\nline 4"),
+        ("edit", 1, "line 0\nline 1\nline 2\nline 3\nline 4\nlate"),
+        ("send", 2, "result"),
+    ]
+    assert reporter.stats.lines == 6 and reporter.stats.sent == 2 and reporter.stats.edited == 1
+
+
+def test_status_message_rolls_over_at_max_length() -> None:
+    channel = FakeChannel()
+    reporter: ProgressReporter[int] = ProgressReporter(channel.send, channel.edit, interval=0.0, max_length=12)
+
+    async def run() -> None:
+        for text in ("aaaa", "bbbb", "cccc"):
+            reporter.post(text)
+        await reporter.aclose()
+
+    asyncio.run(run())
+
+    assert channel.calls == [("send", 1, "aaaa\nbbbb"), ("send", 2, "cccc")]
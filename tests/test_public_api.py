@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+
+from src.esclbot import public_api
+from src.esclbot.cache import TTLCache
+from src.esclbot.escl_api import BASE_URL
+from src.esclbot.public_api import ESCLPublicApiClient
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUP_UUID = "77cc0dae-6970-444c-ab30-3905e690e57d"
+PARENT_URL = f"https://fightnt.escl.co.jp/scrims/{SCRIM_UUID}/{GROUP_UUID}"
+
+
+def _bucket_response() -> Dict[str, Any]:
+    # 実 API と同じく value が JSON 文字列になっているダンプ
+    return json.loads(BUCKET_DUMP.read_text(encoding="utf-8"))
+
+
+class FakeTransport:
+    def __init__(self, routes: Dict[str, Any]) -> None:
+        self._routes = routes
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        handler = self._routes.get(request.url.path.lstrip("/"))
+        if handler is None:
+            return httpx.Response(404, json={"message": "not found"})
+        return handler(json.loads(request.content))
+
+
+def _client(transport: FakeTransport, cache: Optional[TTLCache[Any]] = None) -> ESCLPublicApiClient:
+    http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(transport))
+    return ESCLPublicApiClient(client=http, cache=cache)
+
+
+def test_collect_csv_from_parent_url_uses_bucket(monkeypatch: pytest.MonkeyPatch) -> None:
+    threads = []
+    extract = public_api.extract_dataframe_from_bucket
+
+    def recording_extract(*args: Any, **kwargs: Any) -> Any:
+        threads.append(threading.current_thread())
+        return extract(*args, **kwargs)
+
+    monkeypatch.setattr(public_api, "extract_dataframe_from_bucket", recording_extract)
+    transport = FakeTransport(
+        {
+            "public.v1.PublicBucketService/GetBucket": lambda body: httpx.Response(
+                200, json=_bucket_response()
+            ),
+        }
+    )
+
+    async def run():
+        async with _client(transport) as client:
+            return await client.collect_csv_from_parent_url(PARENT_URL, "G5", 6)
+
+    df = asyncio.run(run())
+
+    assert len(transport.requests) == 1
+    assert set(df["game"]) == {1, 2, 3, 4, 5, 6}
+    assert (df["group"] == "G5").all()
+    assert (df["scrim_id"] == SCRIM_UUID).all()
+    assert threads and threads[0] is not threading.main_thread()  # 抽出はイベントループの外で動く
+
+
+def test_get_group_bucket_falls_back_to_key_without_extension() -> None:
+    keys: List[str] = []
+
+    def bucket(body: Dict[str, Any]) -> httpx.Response:
+        keys.append(body["key"])
+        if body["key"].endswith(".json"):
+            return httpx.Response(404, json={"message": "missing"})
+        return httpx.Response(200, json={"value": json.dumps({"games": []})})
+
+    transport = FakeTransport({"public.v1.PublicBucketService/GetBucket": bucket})
+
+    async def run():
+        async with _client(transport) as client:
+            return await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+
+    result = asyncio.run(run())
+
+    assert result == {"games": []}
+    assert keys == [f"{SCRIM_UUID}/{GROUP_UUID}.json", f"{SCRIM_UUID}/{GROUP_UUID}"]
+
+
+def test_get_scrim_name_returns_none_on_error() -> None:
+    transport = FakeTransport({})
+
+    async def run():
+        async with _client(transport) as client:
+            return await client.get_scrim_name(SCRIM_UUID)
+
+    assert asyncio.run(run()) is None
+
+
+def _scrim_route(finished: bool):
+    return lambda body: httpx.Response(
+        200, json={"scrim": {"uuid": body["uuid"], "name": "CLスクリム#547", "finished": finished}}
+    )
+
+
+def test_finished_scrim_is_served_from_cache() -> None:
+    transport = FakeTransport(
+        {
+            "public.v1.PublicBucketService/GetBucket": lambda body: httpx.Response(
+                200, json=_bucket_response()
+            ),
+            "public.v1.PublicScrimService/GetScrim": _scrim_route(finished=True),
+        }
+    )
+
+    now = [0.0]
+    cache: TTLCache[Any] = TTLCache(ttl=60.0, clock=lambda: now[0])
+
+    async def run():
+        async with _client(transport, cache) as client:
+            await client.collect_csv_from_parent_url(PARENT_URL, "G5", 6)
+            await client.get_scrim_name(SCRIM_UUID)
+            labels = await client.get_scrim_and_group_labels(PARENT_URL)
+            # TTL を過ぎても pin 済みなので再取得しない
+            now[0] = 3600.0
+            await client.collect_csv_from_parent_url(PARENT_URL, "G5", 6)
+            return labels
+
+    labels = asyncio.run(run())
+
+    assert labels == ("CLスクリム#547", "G5")
+    assert len(transport.requests) == 2
+
+
+def test_stale_bucket_is_revalidated_by_content_hash() -> None:
+    transport = FakeTransport(
+        {
+            "public.v1.PublicBucketService/GetBucket": lambda body: httpx.Response(
+                200, json={"value": json.dumps({"games": []})}
+            ),
+        }
+    )
+    now = [0.0]
+    cache: TTLCache[Any] = TTLCache(ttl=60.0, clock=lambda: now[0])
+
+    async def run():
+        async with _client(transport, cache) as client:
+            first = await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+            cached = await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+            now[0] = 3600.0
+            revalidated = await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+            return first, cached, revalidated, client.cache.stats
+
+    first, cached, revalidated, stats = asyncio.run(run())
+
+    assert len(transport.requests) == 2
+    assert first is cached is revalidated
+    assert stats.revalidated == 1
+
+
+def test_concurrent_bucket_requests_share_one_fetch() -> None:
+    transport = FakeTransport(
+        {
+            "public.v1.PublicBucketService/GetBucket": lambda body: httpx.Response(
+                200, json=_bucket_response()
+            ),
+        }
+    )
+
+    async def run():
+        async with _client(transport) as client:
+            return await asyncio.gather(*(client.get_group_bucket_payload(SCRIM_UUID, GROUP_UUID) for _ in range(5)))
+
+    payloads = asyncio.run(run())
+
+    assert len(transport.requests) == 1
+    assert all(payload is payloads[0] for payload in payloads)
+
+
+def _bucket_only_without_extension(keys: List[str]):
+    def bucket(body: Dict[str, Any]) -> httpx.Response:
+        keys.append(body["key"])
+        if body["key"].endswith(".json"):
+            return httpx.Response(404, json={"message": "missing"})
+        return httpx.Response(200, json={"value": json.dumps({"games": []})})
+
+    return bucket
+
+
+def test_successful_key_format_is_tried_first_next_time() -> None:
+    keys: List[str] = []
+    transport = FakeTransport(
+        {"public.v1.PublicBucketService/GetBucket": _bucket_only_without_extension(keys)}
+    )
+    other_group = "11111111-2222-3333-4444-555555555555"
+
+    async def run():
+        async with _client(transport) as client:
+            await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+            await client.get_group_bucket(SCRIM_UUID, other_group)
+
+    asyncio.run(run())
+
+    assert keys == [
+        f"{SCRIM_UUID}/{GROUP_UUID}.json",
+        f"{SCRIM_UUID}/{GROUP_UUID}",
+        f"{SCRIM_UUID}/{other_group}",
+    ]
+
+
+def test_race_key_formats_returns_first_success() -> None:
+    keys: List[str] = []
+    transport = FakeTransport(
+        {
+            "public.v1.PublicBucketService/GetBucket": _bucket_only_without_extension(keys),
+            "public.v1.PublicGroupService/GetGroupByUUID": lambda body: httpx.Response(
+                200, json={"group": {"id": 749}}
+            ),
+        }
+    )
+
+    async def run():
+        http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(transport))
+        async with ESCLPublicApiClient(client=http, race_key_formats=True) as client:
+            return await client.get_group_bucket(SCRIM_UUID, GROUP_UUID)
+
+    assert asyncio.run(run()) == {"games": []}
+    assert f"{SCRIM_UUID}/{GROUP_UUID}" in keys
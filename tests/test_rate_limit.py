@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from email.utils import formatdate
+from typing import List
+
+from src.esclbot.rate_limit import (
+    Priority,
+    RateLimit,
+    RateLimitGovernor,
+    RetryPolicy,
+    retry_after_seconds,
+)
+
+
+def test_retry_after_seconds_reads_retry_after_and_ratelimit_headers() -> None:
+    now = 1_700_000_000.0
+    assert retry_after_seconds({"Retry-After": "2"}, now=now) == 2.0
+    assert retry_after_seconds({"retry-after": formatdate(now + 5, usegmt=True)}, now=now) == 5.0
+    assert retry_after_seconds({"RateLimit-Remaining": "0", "RateLimit-Reset": "3"}, now=now) == 3.0
+    assert retry_after_seconds({"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(now + 4)}, now=now) == 4.0
+    assert retry_after_seconds({"RateLimit-Remaining": "7", "RateLimit-Reset": "3"}, now=now) is None
+    assert retry_after_seconds({}, now=now) is None
+
+
+def test_retry_policy_backs_off_on_repeated_429() -> None:
+    policy = RetryPolicy(backoff_after_429=1.0, multiplier=2.0, max_delay=3.0, jitter=0.0)
+    rng = random.Random(0)
+    assert [policy.throttle_delay(n, None, rng) for n in (1, 2, 3)] == [1.0, 2.0, 3.0]
+    assert policy.throttle_delay(1, 2.5, rng) == 2.5
+    jittered = RetryPolicy(interval=1.0, jitter=0.5)
+    assert all(0.5 <= jittered.retry_delay(rng) <= 1.5 for _ in range(50))
+    assert RetryPolicy.from_dict(policy.to_dict()) == policy
+
+
+def test_entry_priority_goes_before_waiting_reports() -> None:
+    governor = RateLimitGovernor(host=RateLimit(rate=50.0, burst=1.0))
+    order: List[str] = []
+
+    async def send(name: str, priority: Priority) -> None:
+        await governor.acquire(name, priority)
+        order.append(name)
+
+    async def run() -> None:
+        await governor.acquire("warm", Priority.REPORT)  # burst を使い切る
+        reports = [asyncio.create_task(send(f"report-{i}", Priority.REPORT)) for i in range(2)]
+        await asyncio.sleep(0)
+        entry = asyncio.create_task(send("entry", Priority.ENTRY))
+        await asyncio.gather(entry, *reports)
+
+    asyncio.run(run())
+
+    assert order[0] == "entry"
+    assert sorted(order[1:]) == ["report-0", "report-1"]
+    assert governor.stats.preempted >= 1
+
+
+def test_preempt_window_holds_reports_and_429_pauses_endpoint() -> None:
+    governor = RateLimitGovernor()
+    order: List[str] = []
+
+    async def report() -> None:
+        await governor.acquire("public.v1.PublicBucketService/GetBucket", Priority.REPORT)
+        order.append("report")
+
+    async def run() -> float:
+        async with governor.preempt(Priority.ENTRY):
+            waiting = asyncio.create_task(report())
+            await asyncio.sleep(0.02)
+            await governor.acquire("/user.v1.UserApplicationService/CreateApplication", Priority.ENTRY)
+            order.append("entry")
+        await waiting
+
+        paused = governor.observe("/user.v1.UserApplicationService/CreateApplication", 429, {"Retry-After": "0.05"})
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await governor.acquire("user.v1.UserApplicationService/CreateApplication", Priority.ENTRY)
+        assert paused == 0.05
+        return loop.time() - started
+
+    waited = asyncio.run(run())
+
+    assert order == ["entry", "report"]
+    assert waited >= 0.04
+    snapshot = governor.snapshot()
+    assert snapshot["throttled"] == 1
+    assert snapshot["throttled_by_endpoint"] == {"user.v1.UserApplicationService/CreateApplication": 1}
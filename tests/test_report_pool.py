@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.esclbot.artifact_cache import build_group_report
+from src.esclbot.bucket_stream import decode_bucket_payload
+from src.esclbot.report_pool import ReportPool, ReportPoolBusy
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+
+
+def test_rejects_jobs_beyond_workers_plus_queue() -> None:
+    pool = ReportPool(1, max_queue=1, processes=False)
+    release = threading.Event()
+    try:
+        running = pool.submit(release.wait)
+        waiting = pool.submit(release.wait)
+        assert pool.queued == 1
+        with pytest.raises(ReportPoolBusy):
+            pool.submit(release.wait)
+        release.set()
+        assert running.result(timeout=5) and waiting.result(timeout=5)
+    finally:
+        pool.shutdown()
+
+    stats = pool.snapshot()
+    assert (stats["submitted"], stats["completed"], stats["rejected"]) == (2, 2, 1)
+    assert (stats["in_flight"], stats["queued"], stats["peak_queued"]) == (0, 0, 1)
+
+
+def test_group_report_runs_in_worker_process() -> None:
+    pool = ReportPool(1, preload=())
+    payload = decode_bucket_payload(BUCKET_DUMP.read_bytes())
+    try:
+        data, df = pool.submit(build_group_report, payload, SCRIM_UUID, "G5", "csv").result(timeout=60)
+    finally:
+        pool.shutdown()
+
+    assert b"game" in data.splitlines()[0]
+    assert (df["group"] == "G5").all() and set(df["game"]) == {1, 2, 3, 4, 5, 6}
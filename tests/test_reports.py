@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from src.esclbot.frame_builder import apply_raw_dtypes
+from src.esclbot.reports import aggregate_player_totals, aggregate_team_totals, aggregate_totals
+
+
+def _raw() -> pd.DataFrame:
+    rows = [
+        # game, team_num, team_name, player, character, placement, kills, shots, hits
+        (1, 2, "beta", "b1", "Wraith", 1, 3, 100, 40),
+        (1, 1, "alpha", "a1", "Bangalore", 2, 1, 50, 10),
+        (1, 1, "alpha", "a2", None, 2, 0, 0, 0),
+        (2, 1, "alpha", "a1", "Wraith", 1, 2, 50, 30),
+        (2, 2, "beta", "b1", " ", None, 5, 100, 60),
+        (3, 1, "alpha", "a1", "Bangalore", 3, 4, 100, 20),
+    ]
+    df = pd.DataFrame(
+        rows,
+        columns=["game", "team_num", "team_name", "player_name", "character", "placement", "kills", "shots", "hits"],
+    )
+    return df.assign(group="G1", scrim_id="s", assists=0, damage=100, headshots=0, survival_time=60)
+
+
+def test_aggregate_totals_builds_both_tables_in_one_pass() -> None:
+    totals = aggregate_totals(apply_raw_dtypes(_raw()))
+
+    players = totals.players.set_index("player_name")
+    assert list(totals.players["player_name"]) == ["a1", "a2", "b1"]
+    assert players.loc["a1", "characters"] == "Bangalore, Wraith"
+    assert pd.isna(players.loc["a2", "characters"])
+    assert players.loc["b1", "characters"] == "Wraith"
+    assert players.loc["a1", "games_played"] == 3
+    assert players.loc["b1", "placement_avg"] == 1.0  # 欠損の placement は平均に含めない
+    assert players.loc["a1", "accuracy"] == 30.0
+
+    teams = totals.teams.set_index("team_name")
+    assert list(totals.teams["team_num"]) == [1, 2]
+    assert teams.loc["alpha", "kills"] == 7
+    assert teams.loc["beta", "shots"] == 200
+    assert teams.loc["beta", "accuracy"] == 50.0
+
+
+def test_aggregate_totals_matches_single_table_functions_for_untyped_frames() -> None:
+    df = _raw().astype({"team_num": object, "kills": object})
+    df.loc[0, "kills"] = "3"
+
+    totals = aggregate_totals(df)
+
+    pd.testing.assert_frame_equal(totals.players, aggregate_player_totals(df))
+    pd.testing.assert_frame_equal(totals.teams, aggregate_team_totals(df))
+    assert totals.teams["kills"].tolist() == [7, 8]
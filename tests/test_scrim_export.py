@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import zipfile
+from pathlib import Path
+from typing import Any, Dict
+
+import httpx
+import pytest
+
+from src.esclbot import scrim_export
+from src.esclbot.artifact_cache import ArtifactCache, export_scrim_artifact
+from src.esclbot.escl_api import BASE_URL
+from src.esclbot.public_api import ESCLPublicApiClient
+from src.esclbot.report_pool import ReportPool
+from src.esclbot.scrim_export import build_scrim_xlsx, export_scrim, parse_group_urls, split_group_urls
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUPS = {
+    "11111111-1111-4111-8111-111111111111": 3,
+    "22222222-2222-4222-8222-222222222222": 1,
+    "33333333-3333-4333-8333-333333333333": 2,
+}
+
+
+def _url(group_uuid: str) -> str:
+    return f"https://fightnt.escl.co.jp/scrims/{SCRIM_UUID}/{group_uuid}"
+
+
+class ScrimTransport:
+    def __init__(self, missing: str = "") -> None:
+        bucket = json.loads(json.loads(BUCKET_DUMP.read_text(encoding="utf-8"))["value"])
+        bucket["games"] = bucket["games"][:2]
+        self._bucket = bucket
+        self._missing = missing
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        body: Dict[str, Any] = json.loads(request.content)
+        path = request.url.path.lstrip("/")
+        if path == "public.v1.PublicScrimService/GetScrim":
+            return httpx.Response(200, json={"scrim": {"name": "CLスクリム#547", "groups": 4}})
+        if path != "public.v1.PublicBucketService/GetBucket":
+            return httpx.Response(404, json={"message": "not found"})
+
+        group_uuid = body["key"].split("/")[1].removesuffix(".json")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if group_uuid == self._missing:
+            return httpx.Response(404, json={"message": "missing"})
+        bucket = dict(self._bucket, group_num=GROUPS[group_uuid])
+        return httpx.Response(200, json={"value": json.dumps(bucket)})
+
+
+def _export(transport: ScrimTransport, **kwargs: Any):
+    async def run():
+        http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(transport))
+        async with ESCLPublicApiClient(client=http) as client:
+            return await export_scrim(client, [_url(g) for g in GROUPS], **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_export_scrim_fetches_groups_with_bounded_concurrency() -> None:
+    transport = ScrimTransport()
+
+    export = _export(transport, max_concurrency=2)
+
+    assert [group.label for group in export.groups] == ["G1", "G2", "G3"]
+    assert transport.max_in_flight == 2
+    assert export.title == "CLスクリム#547"
+    assert export.warnings() == ["4 グループ中 3 グループのみ出力しました。"]
+
+    with zipfile.ZipFile(io.BytesIO(build_scrim_xlsx(export))) as book:
+        workbook = book.read("xl/workbook.xml").decode("utf-8")
+    for sheet in ("G1", "G2", "G3", "ALL_GAMES", "TEAM_TOTALS"):
+        assert f'name="{sheet}"' in workbook
+
+
+def test_export_scrim_keeps_going_when_one_group_fails() -> None:
+    missing = "22222222-2222-4222-8222-222222222222"
+    transport = ScrimTransport(missing=missing)
+
+    export = _export(transport)
+
+    assert [group.label for group in export.groups] == ["G2", "G3"]
+    assert list(export.failures) == [missing]
+
+
+def test_export_scrim_waits_for_a_full_report_pool() -> None:
+    pool = ReportPool(1, max_queue=0, processes=False)
+    try:
+        export = _export(ScrimTransport(), max_concurrency=3, executor=pool)
+    finally:
+        pool.shutdown()
+
+    assert [group.label for group in export.groups] == ["G1", "G2", "G3"]
+    assert not export.failures
+    assert pool.stats.rejected == 0
+
+
+def test_repeat_scrim_artifact_skips_extraction(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    calls = []
+    extract = scrim_export.extract_dataframe_from_bucket
+
+    def counting_extract(*args: Any) -> Any:
+        calls.append(args[2])
+        return extract(*args)
+
+    monkeypatch.setattr(scrim_export, "extract_dataframe_from_bucket", counting_extract)
+    cache = ArtifactCache(tmp_path)
+    urls = [_url(g) for g in GROUPS]
+
+    async def needs_g1(scrim_uuid: str, group_uuid: str) -> bool:
+        return GROUPS[group_uuid] == 1
+
+    async def run() -> list:
+        http = httpx.AsyncClient(base_url=BASE_URL, transport=httpx.MockTransport(ScrimTransport()))
+        async with ESCLPublicApiClient(client=http) as client:
+            first = await export_scrim_artifact(client, cache, urls, "xlsx")
+            second = await export_scrim_artifact(client, cache, urls, "xlsx")
+            third = await export_scrim_artifact(client, cache, urls, "xlsx", need_frame=needs_g1)
+            return [first, second, third]
+
+    first, second, third = asyncio.run(run())
+
+    assert not first.cached and all(group.df is not None for group in first.export.groups)
+    assert second.cached and second.data == first.data
+    assert all(group.df is None and group.payload is None for group in second.export.groups)
+    assert third.cached and [group.label for group in third.export.groups if group.df is not None] == ["G1"]
+    assert sorted(calls) == ["G1", "G1", "G2", "G3"]  # 1 回目の全グループと、3 回目の G1 だけ
+
+
+def test_parse_group_urls_rejects_other_scrims() -> None:
+    urls = split_group_urls(f"{_url('11111111-1111-4111-8111-111111111111')},\n{_url('11111111-1111-4111-8111-111111111111')}")
+    assert parse_group_urls(urls) == (SCRIM_UUID, ["11111111-1111-4111-8111-111111111111"])
+
+    other = "https://fightnt.escl.co.jp/scrims/aaaaaaaa-aaaa-4aaa-8aaa-aaaaaaaaaaaa/22222222-2222-4222-8222-222222222222"
+    with pytest.raises(ValueError):
+        parse_group_urls(urls + [other])
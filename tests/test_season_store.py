@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from src.esclbot.api_scraper import BUCKET_ENDPOINT, extract_dataframe_from_bucket
+from src.esclbot.bucket_archive import BucketArchive
+from src.esclbot.reports import aggregate_totals
+from src.esclbot.season_store import SeasonStore, rebuild_from_archive
+
+RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "escl" / "raw"
+BUCKET_DUMP = RAW_DIR / "20250823-154719_core-api-prod.escl.workers.dev_public.v1.PublicBucketService_GetBucket.json"
+SCRIM_UUID = "36db0e63-5188-4ab7-b7ce-5fe1a9fb58d4"
+GROUP_UUID = "77cc0dae-6970-444c-ab30-3905e690e57d"
+
+
+def _group_frame(games: slice) -> pd.DataFrame:
+    bucket = json.loads(json.loads(BUCKET_DUMP.read_text(encoding="utf-8"))["value"])
+    bucket["games"] = bucket["games"][games]
+    return extract_dataframe_from_bucket(bucket, SCRIM_UUID, "G5", max_games=6)
+
+
+def test_ingest_updates_season_totals_incrementally(tmp_path: Path) -> None:
+    first, second = _group_frame(slice(0, 3)), _group_frame(slice(3, 6))
+
+    with SeasonStore(tmp_path / "season.sqlite3", clock=lambda: 100.0) as store:
+        store.ingest(first, scrim_uuid=SCRIM_UUID, group_uuid="g-1")
+        store.ingest(second, scrim_uuid=SCRIM_UUID, group_uuid="g-2")
+        store.ingest(second, scrim_uuid=SCRIM_UUID, group_uuid="g-2")  # 出し直しは置き換え
+        standings = store.standings()
+        assert [(r.group_uuid, r.group_label, r.rows) for r in store.ingests()] == [
+            ("g-1", "G5", len(first)),
+            ("g-2", "G5", len(second)),
+        ]
+
+    expected = aggregate_totals(pd.concat([first, second], ignore_index=True))
+    players = standings.players.set_index("player_name").sort_index()
+    reference = expected.players.set_index("player_name").sort_index()
+    for column in ("games_played", "kills", "damage", "shots", "hits", "accuracy", "placement_avg"):
+        assert players[column].tolist() == reference[column].tolist(), column
+    assert players["scrims"].max() == 2
+
+    teams = standings.teams.set_index("team_name").sort_index()
+    reference_teams = expected.teams.set_index("team_name").sort_index()
+    assert teams["kills"].tolist() == reference_teams["kills"].tolist()
+    assert set(teams["games_played"]) == {6}
+    assert standings.teams["kills"].is_monotonic_decreasing
+
+
+def test_rebuild_from_archive_replaces_store_contents(tmp_path: Path) -> None:
+    archive = BucketArchive(tmp_path / "archive")
+    archive.put(BUCKET_ENDPOINT, BUCKET_DUMP.read_bytes(), scrim_uuid=SCRIM_UUID, group_uuid=GROUP_UUID)
+
+    with SeasonStore(tmp_path / "season.sqlite3") as store:
+        store.ingest(_group_frame(slice(0, 1)), scrim_uuid="stale", group_uuid="stale")
+        records = rebuild_from_archive(store, archive)
+        standings = store.standings()
+
+    assert [(r.scrim_uuid, r.group_uuid, r.group_label) for r in records] == [(SCRIM_UUID, GROUP_UUID, "G5")]
+    assert standings.players["games_played"].max() == 6
+    assert standings.players["kills"].sum() == _group_frame(slice(0, 6))["kills"].sum()
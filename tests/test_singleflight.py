@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List
+
+import pytest
+
+from src.esclbot.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_flight() -> None:
+    flights = SingleFlight()
+    calls: List[str] = []
+
+    async def build(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def scenario() -> List[str]:
+        results = await asyncio.gather(
+            flights.do("a", lambda: build("a")),
+            flights.do("a", lambda: build("a")),
+            flights.do("b", lambda: build("b")),
+        )
+        # 完了したキーは忘れるので、次の呼び出しはもう一度実行する
+        results.append(await flights.do("a", lambda: build("a")))
+        return results
+
+    assert asyncio.run(scenario()) == ["A", "A", "B", "A"]
+    assert calls == ["a", "b", "a"]
+    assert (flights.started, flights.coalesced, len(flights)) == (3, 1, 0)
+
+
+def test_errors_reach_every_waiter() -> None:
+    flights = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario() -> List[BaseException]:
+        return await asyncio.gather(flights.do("k", fail), flights.do("k", fail), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["boom", "boom"]
+
+
+def test_cancelled_waiter_does_not_cancel_the_flight() -> None:
+    flights = SingleFlight()
+
+    async def build() -> str:
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario() -> str:
+        first = asyncio.create_task(flights.do("k", build))
+        second = asyncio.create_task(flights.do("k", build))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
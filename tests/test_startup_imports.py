@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ("pandas", "numpy", "httpx", "discord", "dotenv", "requests", "xlsxwriter")
+
+
+def _loaded_after_import(module: str) -> List[str]:
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout)
+
+
+@pytest.mark.parametrize(
+    ("module", "allowed"),
+    [
+        ("src.esclbot.cli", []),
+        ("src.esclbot.entry_scheduler", []),
+        ("src.esclbot.bot", ["discord"]),
+    ],
+)
+def test_entry_points_defer_heavy_imports(module: str, allowed: List[str]) -> None:
+    # 時間の予算は scripts/escl/bench_import.py で測る。ここでは重いモジュールを読まないことだけを固定する
+    assert _loaded_after_import(module) == allowed
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import io
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from src.esclbot.frame_builder import apply_raw_dtypes
+from src.esclbot.workbook import WorkbookWriter, build_group_xlsx, game_sheet_indices
+
+
+def _raw() -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "game": [2, 1, 2, 1, 1],
+            "team_num": [1, 1, 2, 2, 1],
+            "team_name": ["alpha", "alpha", "beta", "beta", "alpha"],
+            "player_name": ["a1", "a1", "b1", "b1", "a2"],
+            "character": ["Wraith", None, "Alter", "Alter", "Horizon"],
+            "placement": [1, 2, 2, 1, 2],
+            "kills": [3, 1, 0, 2, 4],
+        }
+    )
+    return apply_raw_dtypes(df.assign(group="G1", scrim_id="s"))
+
+
+def _sheets(data: bytes) -> dict:
+    with zipfile.ZipFile(io.BytesIO(data)) as book:
+        names = re.findall(r'<sheet name="([^"]+)"', book.read("xl/workbook.xml").decode("utf-8"))
+        return {name: book.read(f"xl/worksheets/sheet{i}.xml").decode("utf-8") for i, name in enumerate(names, 1)}
+
+
+def test_build_group_xlsx_splits_games_with_one_groupby() -> None:
+    df = _raw()
+
+    assert {game: list(rows) for game, rows in game_sheet_indices(df).items()} == {1: [1, 3, 4], 2: [0, 2]}
+
+    sheets = _sheets(build_group_xlsx(df))
+    assert list(sheets) == ["GAME1", "GAME2", "ALL_GAMES", "TEAM_TOTALS"]
+    assert sheets["GAME1"].count("<row ") == 4  # 見出し + 3 行
+    assert sheets["GAME2"].count("<row ") == 3
+    assert 't="inlineStr"' in sheets["GAME1"]  # constant_memory は共有文字列表を作らない
+
+
+def test_workbook_writer_leaves_missing_values_blank() -> None:
+    df = pd.DataFrame({"name": ["x", None], "score": [1.5, float("nan")], "n": pd.array([1, None], dtype="Int32")})
+
+    with WorkbookWriter() as book:
+        book.write_frame("SHEET", df)
+    sheet = _sheets(book.getvalue())["SHEET"]
+
+    assert sheet.count("<c ") == 3 + 3  # 見出し 3 セル + 欠損以外の 3 セル
+    assert "nan" not in sheet.lower()
+
+
+def test_workbook_writer_writes_float32_at_source_precision() -> None:
+    df = pd.DataFrame({"accuracy": np.array([33.33, float("nan")], dtype=np.float32)})
+
+    with WorkbookWriter() as book:
+        book.write_frame("SHEET", df)
+    sheet = _sheets(book.getvalue())["SHEET"]
+
+    assert "<v>33.33</v>" in sheet
+    assert sheet.count("<c ") == 2